@@ -5,7 +5,8 @@ Optimized settings for production and development environments
 import os
 from pathlib import Path
 from typing import Optional
-from pydantic import BaseSettings, Field
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 
 ROOT_DIR = Path(__file__).parent
@@ -17,56 +18,89 @@ class Settings(BaseSettings):
     # Application
     app_name: str = "Hospital Totem API"
     app_version: str = "1.0.0"
-    debug: bool = Field(default=False, env="DEBUG")
-    environment: str = Field(default="production", env="ENVIRONMENT")
+    debug: bool = Field(default=False)
+    environment: str = Field(default="production")
     
     # Server
-    host: str = Field(default="0.0.0.0", env="HOST")
-    port: int = Field(default=8001, env="PORT")
-    reload: bool = Field(default=False, env="RELOAD")
+    host: str = Field(default="0.0.0.0")
+    port: int = Field(default=8001)
+    reload: bool = Field(default=False)
     
     # Database
-    mongo_url: str = Field(..., env="MONGO_URL")
-    db_name: str = Field(..., env="DB_NAME")
-    db_max_connections: int = Field(default=100, env="DB_MAX_CONNECTIONS")
-    db_min_connections: int = Field(default=10, env="DB_MIN_CONNECTIONS")
+    mongo_url: str = Field(...)
+    db_name: str = Field(...)
+    db_max_connections: int = Field(default=100)
+    db_min_connections: int = Field(default=10)
+    db_max_idle_time_ms: int = Field(default=300000)  # Close pooled connections idle for 5 minutes
+    db_wait_queue_timeout_ms: int = Field(default=5000)  # Fail fast when the pool is exhausted
     
     # Security
-    allowed_hosts: list = Field(default=["*"], env="ALLOWED_HOSTS")
-    cors_origins: list = Field(default=["*"], env="CORS_ORIGINS")
-    rate_limit_per_minute: int = Field(default=100, env="RATE_LIMIT_PER_MINUTE")
-    burst_limit: int = Field(default=20, env="BURST_LIMIT")
+    allowed_hosts: list = Field(default=["*"])
+    cors_origins: list = Field(default=["*"])
+    rate_limit_per_minute: int = Field(default=100)
+    burst_limit: int = Field(default=20)
     
     # Caching
-    cache_ttl: int = Field(default=300, env="CACHE_TTL")  # 5 minutes
-    enable_caching: bool = Field(default=True, env="ENABLE_CACHING")
+    cache_ttl: int = Field(default=300)  # 5 minutes
+    enable_caching: bool = Field(default=True)
+    # Known-documentos Bloom filter: new patients are added every sync,
+    # the whole filter is rebuilt (and resized) every rebuild interval
+    document_filter_sync_seconds: float = Field(default=2)
+    document_filter_rebuild_seconds: int = Field(default=600)
+    # Day snapshot mode: today's turnos served from memory; the timezone
+    # decides what "today" means for turno.fecha
+    day_snapshot_enabled: bool = Field(default=False)
+    day_snapshot_timezone: str = Field(default="America/Argentina/Buenos_Aires")
+    day_snapshot_refresh_seconds: int = Field(default=60)
     
     # Logging
-    log_level: str = Field(default="INFO", env="LOG_LEVEL")
+    log_level: str = Field(default="INFO")
     log_format: str = Field(
-        default="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        env="LOG_FORMAT"
-    )
+        default="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
     
     # Performance
-    worker_connections: int = Field(default=1000, env="WORKER_CONNECTIONS")
-    max_requests: int = Field(default=10000, env="MAX_REQUESTS")
-    timeout_keep_alive: int = Field(default=5, env="TIMEOUT_KEEP_ALIVE")
+    worker_connections: int = Field(default=1000)
+    max_requests: int = Field(default=10000)
+    timeout_keep_alive: int = Field(default=5)
     
     # Monitoring
-    enable_metrics: bool = Field(default=True, env="ENABLE_METRICS")
-    health_check_interval: int = Field(default=30, env="HEALTH_CHECK_INTERVAL")
+    enable_metrics: bool = Field(default=True)
+    health_check_interval: int = Field(default=30)
+    slow_query_threshold_ms: float = Field(default=100)
+    slow_query_log_size: int = Field(default=200)
     
     # API Keys (for admin endpoints)
-    admin_api_keys: Optional[str] = Field(default=None, env="ADMIN_API_KEYS")
+    admin_api_keys: Optional[str] = Field(default=None)
+    
+    # Service log write-behind queue: flush when a batch is full or after
+    # flush_interval_ms; enqueue waits up to enqueue_timeout when the queue is full
+    service_log_batch_size: int = Field(default=200)
+    service_log_flush_interval_ms: float = Field(default=5)
+    service_log_queue_size: int = Field(default=10000)
+    service_log_enqueue_timeout: float = Field(default=2)
+    # On-disk spool used while MongoDB is unreachable (one worker-N subdirectory per process)
+    service_log_spool_dir: str = Field(default=str(ROOT_DIR / "spool" / "service_logs"))
+    spool_segment_max_bytes: int = Field(default=8 * 1024 * 1024)
+    spool_fsync_interval_ms: float = Field(default=20)
+    spool_drain_interval_seconds: float = Field(default=5)
     
     # Data retention
-    service_logs_retention_days: int = Field(default=90, env="SERVICE_LOGS_RETENTION_DAYS")
-    auto_cleanup_enabled: bool = Field(default=True, env="AUTO_CLEANUP_ENABLED")
+    service_logs_retention_days: int = Field(default=90)
+    # "standard": one mutable document per service in service_logs
+    # "timeseries": immutable versions in service_events + pending services in service_state
+    service_logs_storage: str = Field(default="standard")
+    # Tiered retention (opt-in): logs past the retention window are archived to
+    # Parquet and only then deleted by the archive job; without it a TTL expires them
+    service_logs_archive_enabled: bool = Field(default=False)
+    service_logs_archive_dir: str = Field(default=str(ROOT_DIR / "archive" / "service_logs"))
+    auto_cleanup_enabled: bool = Field(default=True)
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    # Field names match the environment variables (case-insensitive)
+    model_config = SettingsConfigDict(
+        env_file=ROOT_DIR / ".env",
+        case_sensitive=False,
+        extra="ignore"
+    )
 
 # Global settings instance
 settings = Settings()
@@ -112,6 +146,8 @@ def get_mongo_connection_params() -> dict:
     return {
         "maxPoolSize": settings.db_max_connections,
         "minPoolSize": settings.db_min_connections,
+        "maxIdleTimeMS": settings.db_max_idle_time_ms,
+        "waitQueueTimeoutMS": settings.db_wait_queue_timeout_ms,
         "serverSelectionTimeoutMS": 5000,
         "connectTimeoutMS": 10000,
         "socketTimeoutMS": 30000,
@@ -119,6 +155,12 @@ def get_mongo_connection_params() -> dict:
         "retryReads": True
     }
 
+def get_service_logs_ttl_seconds() -> Optional[int]:
+    """Expiry of live service logs; None with archiving, whose job deletes archived days"""
+    if settings.service_logs_archive_enabled:
+        return None
+    return settings.service_logs_retention_days * 86400
+
 # Logging configuration
 def get_logging_config() -> dict:
     """Get logging configuration"""
@@ -1,5 +1,15 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from typing import Dict, Optional
+from datetime import datetime
+import asyncio
 import os
+import threading
+
+from config import get_mongo_connection_params
+from utils.command_monitor import command_monitor
+from indexes import provision_indexes
+from services.service_log_timeseries import TIMESERIES_ENABLED, ensure_timeseries_collections
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
@@ -9,58 +19,171 @@ load_dotenv(ROOT_DIR / '.env')
 
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool usage from driver events (called from driver threads)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.created = 0
+        self.closed = 0
+        self.checkout_failures = 0
+        self.clears = 0
+    
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+    
+    def connection_created(self, event):
+        self._add(open=1, created=1)
+    
+    def connection_closed(self, event):
+        self._add(open=-1, closed=1)
+    
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+    
+    def connection_checked_out(self, event):
+        self._add(checked_out=1, waiting=-1)
+    
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+    
+    def connection_check_out_failed(self, event):
+        self._add(checkout_failures=1, waiting=-1)
+    
+    def pool_cleared(self, event):
+        # Open connections are closed and reported individually through connection_closed
+        self._add(clears=1)
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "waiting": self.waiting,
+            "created": self.created,
+            "closed": self.closed,
+            "checkout_failures": self.checkout_failures,
+            "clears": self.clears,
+            "max_pool_size": connection_params["maxPoolSize"],
+            "min_pool_size": connection_params["minPoolSize"]
+        }
+
+# Global pool statistics, exported at /api/metrics
+pool_stats = PoolStats()
+
+# MongoDB connection, created by connect_database() in the application lifespan
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+connection_params = get_mongo_connection_params()
+client: Optional[AsyncIOMotorClient] = None
+db: Optional[AsyncIOMotorDatabase] = None
 
-async def get_database() -> AsyncIOMotorDatabase:
-    """Get database instance"""
+def connect_database() -> AsyncIOMotorDatabase:
+    """Create the client with the configured pool, timeouts and event listeners"""
+    global client, db
+    if client is None:
+        client = AsyncIOMotorClient(
+            mongo_url,
+            event_listeners=[pool_stats, command_monitor],
+            **connection_params
+        )
+        db = client[os.environ['DB_NAME']]
     return db
 
-async def init_database():
-    """Initialize database with indexes for optimal performance"""
+async def get_database() -> AsyncIOMotorDatabase:
+    """Get database instance (connecting on first use outside the server, e.g. scripts)"""
+    return db if db is not None else connect_database()
+
+async def is_database_healthy() -> bool:
+    """Check that the database answers a ping"""
+    try:
+        await (await get_database()).command("ping")
+        return True
+    except Exception as e:
+        logger.error(f"Database health check failed: {e}")
+        return False
+
+async def backfill_deleted_flag(db: AsyncIOMotorDatabase):
+    """Give service logs written without the soft-delete flag deleted: False (runs once)"""
+    if await db.migrations.find_one({"_id": "service_logs_deleted_flag"}):
+        return
+    result = await db.service_logs.update_many(
+        {"deleted": {"$exists": False}},
+        {"$set": {"deleted": False}}
+    )
+    await db.migrations.insert_one({
+        "_id": "service_logs_deleted_flag",
+        "applied_at": datetime.utcnow(),
+        "modified": result.modified_count
+    })
+    logger.info(f"✅ Backfilled deleted flag on {result.modified_count} service logs")
+
+async def init_database(force_indexes: bool = False):
+    """Run pending migrations and provision the indexes declared in indexes.INDEX_MANIFEST"""
     try:
         logger.info("🔧 Initializing database indexes...")
+        db = await get_database()
         
-        # Create indexes for patients collection
-        patients_collection = db.patients
-        await patients_collection.create_index("documento", unique=True)
-        await patients_collection.create_index("turno.confirmado")
-        await patients_collection.create_index("created_at")
-        await patients_collection.create_index([("documento", 1), ("turno.confirmado", 1)])
-        
-        # Create indexes for service_logs collection
-        service_logs_collection = db.service_logs
-        await service_logs_collection.create_index("documento")
-        await service_logs_collection.create_index("secretaria")
-        await service_logs_collection.create_index("timestamp")
-        await service_logs_collection.create_index("estado")
-        await service_logs_collection.create_index([("documento", 1), ("timestamp", -1)])
-        await service_logs_collection.create_index([("secretaria", 1), ("timestamp", -1)])
+        # Partial service_logs indexes only cover logs carrying the deleted flag
+        await backfill_deleted_flag(db)
         
-        # Create TTL index for old service logs (auto-delete after 90 days)
-        await service_logs_collection.create_index(
-            "timestamp", 
-            expireAfterSeconds=7776000  # 90 days
-        )
+        # service_events must exist as a time-series collection before its indexes
+        if TIMESERIES_ENABLED:
+            await ensure_timeseries_collections(db)
         
-        logger.info("✅ Database indexes created successfully")
+        result = await provision_indexes(db, force=force_indexes)
+        if result.get("failed"):
+            logger.error("❌ Some database indexes could not be created, will retry on next start")
+        elif not result["skipped"]:
+            logger.info("✅ Database indexes created successfully")
+        return result
         
     except Exception as e:
         logger.error(f"❌ Error creating database indexes: {e}")
 
 async def close_database():
     """Close database connection"""
+    global client, db
     try:
-        client.close()
+        if client is not None:
+            client.close()
+            client = db = None
         logger.info("✅ Database connection closed")
     except Exception as e:
         logger.error(f"❌ Error closing database: {e}")
 
 # Connection pooling configuration
 async def configure_connection_pool():
-    """Configure MongoDB connection pool for optimal performance"""
-    # Motor automatically handles connection pooling
-    # These settings are configured via the connection string
-    pass
\ No newline at end of file
+    """
+    Warm up minPoolSize connections before serving traffic, so the first
+    requests after a deploy do not pay for TCP/TLS handshakes and auth.
+    Pool size, idle time and wait queue timeout come from
+    config.get_mongo_connection_params().
+    """
+    database = await get_database()
+    min_pool_size = connection_params["minPoolSize"]
+    try:
+        # Concurrent pings each check out their own connection
+        await database.command("ping")
+        await asyncio.gather(*(database.command("ping") for _ in range(min_pool_size)))
+        logger.info(
+            f"✅ Connection pool warmed up: {pool_stats.open} open "
+            f"(min {min_pool_size}, max {connection_params['maxPoolSize']})"
+        )
+    except Exception as e:
+        logger.error(f"❌ Error warming up connection pool: {e}")
@@ -0,0 +1,277 @@
+"""
+Declarative index manifest and idempotent provisioning for MongoDB
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from config import get_service_logs_ttl_seconds
+from services.service_log_timeseries import TIMESERIES_ENABLED, SERVICE_EVENTS_COLLECTION, SERVICE_STATE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# Partial filter of the service_logs indexes; queries must include it verbatim
+ACTIVE_SERVICE_LOGS = {"deleted": False}
+
+# Index options that make two indexes with the same keys different
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+# TTL option of the live service log indexes: none when the archive job is
+# the only thing deleting logs (config.get_service_logs_ttl_seconds)
+SERVICE_LOGS_EXPIRY = {"expireAfterSeconds": get_service_logs_ttl_seconds()} if get_service_logs_ttl_seconds() else {}
+
+# Marker document in the migrations collection holding the applied manifest hash
+MANIFEST_MARKER = "index_manifest"
+
+# collection -> {index name: (keys, options)}
+INDEX_MANIFEST: Dict[str, Dict[str, Tuple[List[Tuple[str, int]], Dict[str, Any]]]] = {
+    "patients": {
+        "documento_1": ([("documento", 1)], {"unique": True}),
+        "turno.confirmado_1": ([("turno.confirmado", 1)], {}),
+        # Keyset pagination order (also serves created_at range queries)
+        "created_at_1_documento_1": ([("created_at", 1), ("documento", 1)], {}),
+        # Day snapshot refresh watermark
+        "updated_at_1": ([("updated_at", 1)], {}),
+        "turno.fecha_1": ([("turno.fecha", 1)], {})
+    },
+    "service_logs": {
+        # Status updates and deletes by application-level id
+        "id_1": ([("id", 1)], {"unique": True}),
+        # Timestamp range queries and archiving; also the expiry without archiving
+        "timestamp_1": ([("timestamp", 1)], SERVICE_LOGS_EXPIRY),
+        # Hot query shapes on active logs, newest first
+        "active_timestamp": ([("timestamp", -1)], {"partialFilterExpression": ACTIVE_SERVICE_LOGS}),
+        "active_documento_timestamp": (
+            [("documento", 1), ("timestamp", -1)], {"partialFilterExpression": ACTIVE_SERVICE_LOGS}
+        ),
+        "active_secretaria_timestamp": (
+            [("secretaria", 1), ("timestamp", -1)], {"partialFilterExpression": ACTIVE_SERVICE_LOGS}
+        ),
+        "active_estado_timestamp": (
+            [("estado", 1), ("timestamp", -1)], {"partialFilterExpression": ACTIVE_SERVICE_LOGS}
+        )
+    },
+    # Materialized per-day counters served by /api/services/stats
+    "service_stats_daily": {
+        "dia_1_secretaria_1_estado_1": ([("dia", 1), ("secretaria", 1), ("estado", 1)], {"unique": True})
+    },
+    # Spool replay ledger: only needed until the replayed segment is deleted
+    "service_stats_spool_ledger": {
+        "counted_at_1": ([("counted_at", 1)], {"expireAfterSeconds": 7 * 86400})
+    }
+}
+
+# settings.service_logs_storage == "timeseries" collections
+TIMESERIES_INDEX_MANIFEST = {
+    # Time-series collection (created by ensure_timeseries_collections);
+    # retention is the collection's expireAfterSeconds, not a TTL index
+    SERVICE_EVENTS_COLLECTION: {
+        # Created automatically from MongoDB 6.3
+        "secretaria_1_timestamp_1": ([("secretaria", 1), ("timestamp", 1)], {}),
+        "timestamp_1": ([("timestamp", 1)], {}),
+        # Latest version of a service
+        "id_1_updated_at_-1": ([("id", 1), ("updated_at", -1)], {}),
+        "documento_1_timestamp_-1": ([("documento", 1), ("timestamp", -1)], {})
+    },
+    # Pending services only, so no partial filters
+    SERVICE_STATE_COLLECTION: {
+        "id_1": ([("id", 1)], {"unique": True}),
+        "timestamp_1": ([("timestamp", 1)], SERVICE_LOGS_EXPIRY),
+        "documento_1_timestamp_-1": ([("documento", 1), ("timestamp", -1)], {}),
+        "secretaria_1_timestamp_-1": ([("secretaria", 1), ("timestamp", -1)], {})
+    }
+}
+
+if TIMESERIES_ENABLED:
+    INDEX_MANIFEST.update(TIMESERIES_INDEX_MANIFEST)
+
+def manifest_hash(manifest: Dict = INDEX_MANIFEST) -> str:
+    """Stable hash of the manifest; unchanged hash means nothing to provision"""
+    canonical = json.dumps(manifest, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _normalize_keys(keys) -> Tuple[Tuple[str, Any], ...]:
+    """Index keys as a hashable tuple; list_indexes may report directions as floats"""
+    pairs = keys.items() if isinstance(keys, dict) else keys
+    return tuple(
+        (field, int(direction) if isinstance(direction, (int, float)) else direction)
+        for field, direction in pairs
+    )
+
+def _normalize_options(options: Dict) -> Dict:
+    normalized = {name: options[name] for name in COMPARED_OPTIONS if options.get(name) not in (None, False)}
+    if "expireAfterSeconds" in normalized:
+        normalized["expireAfterSeconds"] = int(normalized["expireAfterSeconds"])
+    return normalized
+
+def _spec(keys, options: Dict) -> Tuple:
+    return (_normalize_keys(keys), json.dumps(_normalize_options(options), sort_keys=True, default=str))
+
+async def diff_indexes(collection: AsyncIOMotorCollection, wanted: Dict) -> Dict[str, List[str]]:
+    """Compare a collection's indexes with its manifest entry"""
+    existing = {index["name"]: index async for index in collection.list_indexes()}
+    existing_specs = {_spec(index["key"], index): name for name, index in existing.items()}
+
+    missing, changed, renamed = [], [], []
+    for name, (keys, options) in wanted.items():
+        spec = _spec(keys, options)
+        if name in existing:
+            if _spec(existing[name]["key"], existing[name]) != spec:
+                changed.append(name)
+        elif spec in existing_specs:
+            # Same index under another name: building it again would fail
+            renamed.append(name)
+        else:
+            missing.append(name)
+
+    managed_specs = {_spec(keys, options) for keys, options in wanted.values()}
+    unmanaged = [
+        name for name, index in existing.items()
+        if name != "_id_" and name not in wanted and _spec(index["key"], index) not in managed_specs
+    ]
+    return {"missing": missing, "changed": changed, "renamed": renamed, "unmanaged": unmanaged}
+
+async def _retune_ttl(db: AsyncIOMotorDatabase, collection_name: str, name: str, spec: Tuple) -> bool:
+    """Change only the expireAfterSeconds of an existing TTL index with collMod"""
+    keys, options = spec
+    existing = {index["name"]: index async for index in db[collection_name].list_indexes()}.get(name)
+    if existing is None or "expireAfterSeconds" not in existing or "expireAfterSeconds" not in options:
+        return False
+    if _spec(existing["key"], {**existing, "expireAfterSeconds": options["expireAfterSeconds"]}) != _spec(keys, options):
+        return False
+    await db.command({
+        "collMod": collection_name,
+        "index": {"name": name, "expireAfterSeconds": options["expireAfterSeconds"]}
+    })
+    logger.info(f"🔧 {collection_name}.{name} expireAfterSeconds set to {options['expireAfterSeconds']}")
+    return True
+
+async def provision_collection(db: AsyncIOMotorDatabase, collection_name: str, wanted: Dict) -> Dict[str, Any]:
+    """Build only missing or changed indexes of one collection, in one createIndexes call"""
+    collection = db[collection_name]
+    result: Dict[str, Any] = {"collection": collection_name, "created": [], "retuned": [], "errors": {}}
+    try:
+        diff = await diff_indexes(collection, wanted)
+        result.update(diff)
+
+        rebuild = []
+        for name in diff["changed"]:
+            if await _retune_ttl(db, collection_name, name, wanted[name]):
+                result["retuned"].append(name)
+                continue
+            # Other option changes cannot be altered in place: drop and build again
+            logger.info(f"🔧 Rebuilding index {collection_name}.{name} (options changed)")
+            await collection.drop_index(name)
+            rebuild.append(name)
+
+        to_build = diff["missing"] + rebuild
+        models = [IndexModel(wanted[name][0], name=name, **wanted[name][1]) for name in to_build]
+        if not models:
+            return result
+
+        try:
+            result["created"] = await collection.create_indexes(models)
+        except OperationFailure:
+            # One bad index (e.g. duplicates under a unique index) fails the whole
+            # command; build them one by one to report which
+            for model in models:
+                name = model.document["name"]
+                try:
+                    await collection.create_indexes([model])
+                    result["created"].append(name)
+                except OperationFailure as e:
+                    result["errors"][name] = str(e)
+    except Exception as e:
+        result["errors"]["*"] = str(e)
+
+    for name, error in result["errors"].items():
+        logger.error(f"❌ Index {collection_name}.{name}: {error}")
+    if result["created"]:
+        logger.info(f"✅ Built indexes on {collection_name}: {', '.join(result['created'])}")
+    return result
+
+async def provision_indexes(db: AsyncIOMotorDatabase, force: bool = False) -> Dict[str, Any]:
+    """
+    Apply INDEX_MANIFEST. Skipped entirely when the stored manifest hash
+    matches, unless forced; collections are provisioned concurrently.
+    """
+    current_hash = manifest_hash()
+    marker = await db.migrations.find_one({"_id": MANIFEST_MARKER})
+    if not force and marker and marker.get("hash") == current_hash:
+        logger.info("✅ Index manifest unchanged, skipping index provisioning")
+        return {"skipped": True, "hash": current_hash}
+
+    results = await asyncio.gather(*(
+        provision_collection(db, collection_name, wanted)
+        for collection_name, wanted in INDEX_MANIFEST.items()
+    ))
+
+    failed = any(result["errors"] for result in results)
+    if not failed:
+        await db.migrations.update_one(
+            {"_id": MANIFEST_MARKER},
+            {"$set": {"hash": current_hash, "applied_at": datetime.utcnow()}},
+            upsert=True
+        )
+    for result in results:
+        if result.get("unmanaged"):
+            logger.warning(f"⚠️ Indexes on {result['collection']} not in the manifest: {', '.join(result['unmanaged'])}")
+    return {"skipped": False, "hash": current_hash, "failed": failed, "collections": results}
+
+def _redundant_with(keys: Tuple, index: Dict, others: Dict[str, Dict]) -> Optional[str]:
+    """Name of another index that makes this one unnecessary (its keys are a prefix of it)"""
+    if index.get("unique") or "expireAfterSeconds" in index or index["name"] == "_id_":
+        return None
+    for name, other in others.items():
+        if name == index["name"]:
+            continue
+        other_keys = _normalize_keys(other["key"])
+        if (len(other_keys) >= len(keys) and other_keys[:len(keys)] == keys
+                and other.get("partialFilterExpression") == index.get("partialFilterExpression")
+                and (len(other_keys) > len(keys) or name < index["name"])):
+            return name
+    return None
+
+async def index_report(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """Usage ($indexStats), drift against the manifest and redundant or unused indexes"""
+    report = {}
+    for collection_name, wanted in INDEX_MANIFEST.items():
+        collection = db[collection_name]
+        indexes = {index["name"]: index async for index in collection.list_indexes()}
+        usage = {
+            stats["name"]: stats
+            async for stats in collection.aggregate([{"$indexStats": {}}])
+        }
+
+        entries = []
+        for name, index in indexes.items():
+            keys = _normalize_keys(index["key"])
+            accesses = usage.get(name, {}).get("accesses", {})
+            entries.append({
+                "name": name,
+                "keys": keys,
+                "ops": accesses.get("ops", 0),
+                "since": accesses.get("since"),
+                "managed": name in wanted or name == "_id_",
+                "redundant_with": _redundant_with(keys, index, indexes)
+            })
+
+        report[collection_name] = {
+            "indexes": entries,
+            # Unique and TTL indexes enforce constraints even when no query uses them
+            "unused": [
+                entry["name"] for entry in entries
+                if entry["ops"] == 0 and not indexes[entry["name"]].get("unique")
+                and "expireAfterSeconds" not in indexes[entry["name"]] and entry["name"] != "_id_"
+            ],
+            "redundant": [entry["name"] for entry in entries if entry["redundant_with"]],
+            "drift": await diff_indexes(collection, wanted)
+        }
+    return report
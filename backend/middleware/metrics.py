@@ -0,0 +1,30 @@
+import logging
+
+from monitoring import health_monitor
+from utils.prometheus import registry
+
+logger = logging.getLogger(__name__)
+
+# Requests that matched no route share one label so scanners cannot inflate cardinality
+UNMATCHED_ROUTE = "unmatched"
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by method, route template and status", ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency in seconds", ("method", "route")
+)
+http_requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+def record_request_metrics(scope, status_code: int, duration: float, monitor=health_monitor):
+    """Record one finished request into the health monitor and the Prometheus registry"""
+    # The router stores the matched route in the shared scope, its path is the template
+    route = scope.get("route")
+    route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+    method = scope["method"]
+    try:
+        monitor.record_request(duration, status_code >= 500, route_path, status_code)
+        http_requests_total.labels(method, route_path, status_code).inc()
+        http_request_duration_seconds.labels(method, route_path).observe(duration)
+    except Exception as e:
+        logger.error(f"Error recording request metrics: {e}")
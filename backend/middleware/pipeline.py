@@ -0,0 +1,74 @@
+from fastapi import status
+from fastapi.responses import JSONResponse
+import time
+import logging
+
+from middleware.metrics import http_requests_in_flight, record_request_metrics
+from middleware.security import SECURITY_HEADERS
+from utils.rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+_SECURITY_HEADERS = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in SECURITY_HEADERS.items()]
+
+class RequestPipelineMiddleware:
+    """
+    Pure ASGI middleware doing timing (X-Process-Time), security headers,
+    rate limiting and metrics in one pass.
+
+    Headers are appended to the `http.response.start` message, the response
+    body passes through untouched and no extra task or stream is created, unlike
+    stacked BaseHTTPMiddleware / @app.middleware("http") layers.
+    """
+
+    def __init__(self, app, rate_limiter: RateLimiter):
+        self.app = app
+        self.rate_limiter = rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+        rate_limit_headers = []
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.extend(_SECURITY_HEADERS)
+                headers.extend(rate_limit_headers)
+                headers.append((b"x-process-time", f"{time.perf_counter() - start_time:.4f}".encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            client = scope.get("client")
+            client_ip = client[0] if client else "unknown"
+            allowed, limiter, remaining, retry_after = self.rate_limiter.check(client_ip, scope["path"])
+
+            if not allowed:
+                response = JSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content={
+                        "detail": {
+                            "error": "rate_limit_exceeded",
+                            "message": "Rate limit exceeded",
+                            "code": "RATE_LIMIT_EXCEEDED"
+                        }
+                    },
+                    headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+                )
+                await response(scope, receive, send_wrapper)
+                return
+
+            rate_limit_headers.append((b"x-ratelimit-limit", str(limiter.per_minute).encode("latin-1")))
+            rate_limit_headers.append((b"x-ratelimit-remaining", str(remaining).encode("latin-1")))
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            record_request_metrics(scope, status_code, time.perf_counter() - start_time)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import uuid
 
@@ -37,4 +37,10 @@ class PatientResponse(BaseModel):
 class AppointmentConfirmation(BaseModel):
     documento: str
     confirmado: bool = True
-    fecha_confirmacion: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    fecha_confirmacion: datetime = Field(default_factory=datetime.utcnow)
+
+# Largest batch accepted by POST /api/patients/lookup
+MAX_BATCH_LOOKUP = 200
+
+class PatientBatchLookup(BaseModel):
+    documentos: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_LOOKUP)
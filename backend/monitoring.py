@@ -3,17 +3,112 @@ Monitoring and health check utilities for Hospital Totem API
 """
 import asyncio
 import psutil
+import threading
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from config import settings, PERFORMANCE_THRESHOLDS
 from database import get_database
+from utils.histogram import SlidingHistogram
+from utils.command_monitor import command_monitor
 
 logger = logging.getLogger(__name__)
 
+# System sampling: one sample every SYSTEM_SAMPLE_INTERVAL seconds, the last
+# SYSTEM_SAMPLE_HISTORY samples kept for trends (5 minutes by default)
+SYSTEM_SAMPLE_INTERVAL = 5
+SYSTEM_SAMPLE_HISTORY = 60
+
+class SystemSampler:
+    """Samples CPU, memory, disk and network in a background thread"""
+    
+    def __init__(self, interval: float = SYSTEM_SAMPLE_INTERVAL, history: int = SYSTEM_SAMPLE_HISTORY):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=history)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_network = None
+        # Prime cpu_percent so the first non-blocking reading is meaningful
+        psutil.cpu_percent(interval=None)
+    
+    def sample(self) -> Dict[str, Any]:
+        """Take one sample without blocking (cpu_percent since the previous call)"""
+        now = time.time()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        network = psutil.net_io_counters()
+        
+        sent_rate = recv_rate = 0.0
+        if self._last_network is not None:
+            previous_time, previous = self._last_network
+            elapsed = now - previous_time
+            if elapsed > 0:
+                sent_rate = (network.bytes_sent - previous.bytes_sent) / elapsed
+                recv_rate = (network.bytes_recv - previous.bytes_recv) / elapsed
+        self._last_network = (now, network)
+        
+        sample = {
+            "timestamp": now,
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": memory.percent,
+            "memory_available": memory.available,
+            "disk_percent": disk.percent,
+            "disk_free": disk.free,
+            "bytes_sent": network.bytes_sent,
+            "bytes_recv": network.bytes_recv,
+            "packets_sent": network.packets_sent,
+            "packets_recv": network.packets_recv,
+            "sent_bytes_per_second": round(sent_rate, 2),
+            "recv_bytes_per_second": round(recv_rate, 2)
+        }
+        # deque.append is atomic, readers on the event loop never see a partial sample
+        self.samples.append(sample)
+        return sample
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"System sampler error: {e}")
+    
+    def start(self):
+        """Start the sampler thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+        logger.info(f"System sampler started (every {self.interval}s)")
+    
+    def stop(self):
+        """Stop the sampler thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+    
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Most recent sample, if any"""
+        return self.samples[-1] if self.samples else None
+    
+    def trends(self) -> Dict[str, List]:
+        """Short time series of the buffered samples, oldest first"""
+        samples = list(self.samples)
+        return {
+            "timestamps": [round(sample["timestamp"], 1) for sample in samples],
+            "cpu_percent": [sample["cpu_percent"] for sample in samples],
+            "memory_percent": [sample["memory_percent"] for sample in samples],
+            "disk_percent": [sample["disk_percent"] for sample in samples],
+            "sent_bytes_per_second": [sample["sent_bytes_per_second"] for sample in samples],
+            "recv_bytes_per_second": [sample["recv_bytes_per_second"] for sample in samples]
+        }
+
 class HealthMonitor:
     """Health monitoring and metrics collection"""
     
@@ -21,44 +116,46 @@ class HealthMonitor:
         self.start_time = time.time()
         self.request_count = 0
         self.error_count = 0
-        self.response_times = []
-        self.db_query_times = []
+        # Fixed-memory rolling latency histograms (1m/5m/1h)
+        self.response_times = SlidingHistogram()
+        self.route_response_times: Dict[Tuple[str, int], SlidingHistogram] = {}
+        self.db_query_times = SlidingHistogram()
+        # Database timings arrive from the driver's threads
+        self._db_lock = threading.Lock()
+        self.system_sampler = SystemSampler()
         
-    def record_request(self, response_time: float, is_error: bool = False):
-        """Record request metrics"""
+    def record_request(self, response_time: float, is_error: bool = False,
+                       route: Optional[str] = None, status_code: Optional[int] = None):
+        """Record request metrics (O(1))"""
         self.request_count += 1
         if is_error:
             self.error_count += 1
         
-        # Keep only last 1000 response times for memory efficiency
-        self.response_times.append(response_time)
-        if len(self.response_times) > 1000:
-            self.response_times = self.response_times[-1000:]
+        now = time.time()
+        self.response_times.record(response_time, now)
+        if route is not None:
+            key = (route, status_code or 0)
+            histogram = self.route_response_times.get(key)
+            if histogram is None:
+                histogram = self.route_response_times[key] = SlidingHistogram()
+            histogram.record(response_time, now)
     
     def record_db_query(self, query_time: float):
-        """Record database query time"""
-        self.db_query_times.append(query_time)
-        if len(self.db_query_times) > 1000:
-            self.db_query_times = self.db_query_times[-1000:]
+        """Record database query time (thread-safe)"""
+        with self._db_lock:
+            self.db_query_times.record(query_time)
     
     async def get_system_metrics(self) -> Dict[str, Any]:
-        """Get system performance metrics"""
+        """Get system performance metrics from the latest background sample"""
         try:
-            # CPU usage
-            cpu_percent = psutil.cpu_percent(interval=1)
-            
-            # Memory usage
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
-            memory_available = memory.available / (1024 ** 3)  # GB
+            sample = self.system_sampler.latest()
+            if sample is None:
+                # Sampler not started (e.g. scripts): take one non-blocking sample
+                sample = self.system_sampler.sample()
             
-            # Disk usage
-            disk = psutil.disk_usage('/')
-            disk_percent = disk.percent
-            disk_free = disk.free / (1024 ** 3)  # GB
-            
-            # Network stats
-            network = psutil.net_io_counters()
+            cpu_percent = sample["cpu_percent"]
+            memory_percent = sample["memory_percent"]
+            disk_percent = sample["disk_percent"]
             
             return {
                 "cpu": {
@@ -67,20 +164,24 @@ class HealthMonitor:
                 },
                 "memory": {
                     "usage_percent": memory_percent,
-                    "available_gb": round(memory_available, 2),
+                    "available_gb": round(sample["memory_available"] / (1024 ** 3), 2),
                     "status": "healthy" if memory_percent < 80 else "warning" if memory_percent < 90 else "critical"
                 },
                 "disk": {
                     "usage_percent": disk_percent,
-                    "free_gb": round(disk_free, 2),
+                    "free_gb": round(sample["disk_free"] / (1024 ** 3), 2),
                     "status": "healthy" if disk_percent < 80 else "warning" if disk_percent < 90 else "critical"
                 },
                 "network": {
-                    "bytes_sent": network.bytes_sent,
-                    "bytes_recv": network.bytes_recv,
-                    "packets_sent": network.packets_sent,
-                    "packets_recv": network.packets_recv
-                }
+                    "bytes_sent": sample["bytes_sent"],
+                    "bytes_recv": sample["bytes_recv"],
+                    "packets_sent": sample["packets_sent"],
+                    "packets_recv": sample["packets_recv"],
+                    "sent_bytes_per_second": sample["sent_bytes_per_second"],
+                    "recv_bytes_per_second": sample["recv_bytes_per_second"]
+                },
+                "sampled_at": sample["timestamp"],
+                "trends": self.system_sampler.trends()
             }
         except Exception as e:
             logger.error(f"Error getting system metrics: {e}")
@@ -131,26 +232,15 @@ class HealthMonitor:
     def get_api_metrics(self) -> Dict[str, Any]:
         """Get API performance metrics"""
         uptime = time.time() - self.start_time
+        now = time.time()
         
-        # Calculate response time statistics
-        if self.response_times:
-            avg_response_time = sum(self.response_times) / len(self.response_times)
-            max_response_time = max(self.response_times)
-            min_response_time = min(self.response_times)
-            
-            # Calculate percentiles
-            sorted_times = sorted(self.response_times)
-            p95_index = int(len(sorted_times) * 0.95)
-            p99_index = int(len(sorted_times) * 0.99)
-            
-            p95_response_time = sorted_times[p95_index] if p95_index < len(sorted_times) else max_response_time
-            p99_response_time = sorted_times[p99_index] if p99_index < len(sorted_times) else max_response_time
-        else:
-            avg_response_time = 0
-            max_response_time = 0
-            min_response_time = 0
-            p95_response_time = 0
-            p99_response_time = 0
+        # Percentiles come from the 5 minute window; reading is a scan of a few buckets
+        recent = self.response_times.window("5m", now)
+        recent_summary = recent.summary()
+        avg_response_time = recent_summary["average_ms"] / 1000
+        
+        with self._db_lock:
+            db_query_times = self.db_query_times.summary(now)
         
         error_rate = (self.error_count / self.request_count) * 100 if self.request_count > 0 else 0
         requests_per_second = self.request_count / uptime if uptime > 0 else 0
@@ -163,12 +253,18 @@ class HealthMonitor:
             "error_rate_percent": round(error_rate, 2),
             "requests_per_second": round(requests_per_second, 2),
             "response_times": {
-                "average_ms": round(avg_response_time * 1000, 2),
-                "min_ms": round(min_response_time * 1000, 2),
-                "max_ms": round(max_response_time * 1000, 2),
-                "p95_ms": round(p95_response_time * 1000, 2),
-                "p99_ms": round(p99_response_time * 1000, 2)
+                "average_ms": recent_summary["average_ms"],
+                "min_ms": round((self.response_times.min or 0) * 1000, 2),
+                "max_ms": round((self.response_times.max or 0) * 1000, 2),
+                "p95_ms": recent_summary["p95_ms"],
+                "p99_ms": recent_summary["p99_ms"],
+                "windows": self.response_times.summary(now)
+            },
+            "routes": {
+                f"{route} {status_code}": histogram.window("5m", now).summary()
+                for (route, status_code), histogram in self.route_response_times.items()
             },
+            "db_query_times": db_query_times,
             "status": self._get_api_status(avg_response_time, error_rate)
         }
     
@@ -189,11 +285,12 @@ class HealthMonitor:
         """Get comprehensive health check results"""
         try:
             # Gather all metrics concurrently
-            system_metrics, db_health, api_metrics = await asyncio.gather(
+            system_metrics, db_health = await asyncio.gather(
                 self.get_system_metrics(),
-                self.get_database_health(),
-                asyncio.to_thread(self.get_api_metrics)
+                self.get_database_health()
             )
+            # Histogram reads are cheap and must stay on the event loop thread
+            api_metrics = self.get_api_metrics()
             
             # Determine overall status
             statuses = [
@@ -241,12 +338,15 @@ class HealthMonitor:
         """Reset collected metrics"""
         self.request_count = 0
         self.error_count = 0
-        self.response_times = []
-        self.db_query_times = []
+        self.response_times = SlidingHistogram()
+        self.route_response_times = {}
+        with self._db_lock:
+            self.db_query_times = SlidingHistogram()
         logger.info("Metrics reset completed")
 
-# Global health monitor instance
+# Global health monitor instance, fed with every MongoDB command duration
 health_monitor = HealthMonitor()
+command_monitor.add_listener(health_monitor.record_db_query)
 
 async def run_health_checks():
     """Run periodic health checks"""
@@ -265,8 +365,15 @@ async def run_health_checks():
             logger.error(f"Health check loop error: {e}")
             await asyncio.sleep(60)  # Wait 1 minute on error
 
-def start_health_monitoring():
-    """Start background health monitoring"""
+def start_health_monitoring() -> Optional[asyncio.Task]:
+    """Start background health monitoring, returning the health check task"""
     if settings.enable_metrics:
-        asyncio.create_task(run_health_checks())
-        logger.info("Health monitoring started")
\ No newline at end of file
+        health_monitor.system_sampler.start()
+        task = asyncio.create_task(run_health_checks())
+        logger.info("Health monitoring started")
+        return task
+    return None
+
+def stop_health_monitoring():
+    """Stop the system sampler thread"""
+    health_monitor.system_sampler.stop()
\ No newline at end of file
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File, status
 from fastapi.responses import JSONResponse
-from services.patient_service import PatientService
-from models.patient import PatientResponse, AppointmentConfirmation, PatientCreate
+from services.patient_service import PatientService, encode_cursor
+from services.agenda_import import AgendaImporter
+from middleware.security import require_api_key
+from models.patient import PatientResponse, AppointmentConfirmation, PatientCreate, PatientBatchLookup
 from database import get_database
+from utils.validation import validate_documento, normalize_documento
 from typing import List, Optional
+from datetime import datetime
+import io
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/patients", tags=["patients"])
@@ -15,20 +19,6 @@ async def get_patient_service():
     db = await get_database()
     return PatientService(db)
 
-def validate_documento(documento: str) -> bool:
-    """Validate document number format"""
-    if not documento:
-        return False
-    
-    # Remove any non-digit characters
-    clean_doc = re.sub(r'\D', '', documento)
-    
-    # Check length (between 7 and 10 digits)
-    if len(clean_doc) < 7 or len(clean_doc) > 10:
-        return False
-    
-    return True
-
 @router.get("/{documento}", response_model=dict)
 async def get_patient_by_document(
     documento: str,
@@ -51,7 +41,7 @@ async def get_patient_by_document(
         )
     
     # Clean document number
-    clean_documento = re.sub(r'\D', '', documento)
+    clean_documento = normalize_documento(documento)
     
     try:
         patient = await patient_service.find_by_document(clean_documento)
@@ -93,7 +83,7 @@ async def get_patient_by_document(
                 "apellido": patient.apellido,
                 "turno": patient.turno
             },
-            "timestamp": patient.updated_at
+            "timestamp": datetime.utcnow()
         }
         
     except HTTPException:
@@ -110,6 +100,69 @@ async def get_patient_by_document(
             }
         )
 
+@router.post("/lookup", response_model=dict)
+async def lookup_patients(
+    lookup: PatientBatchLookup,
+    patient_service: PatientService = Depends(get_patient_service)
+):
+    """
+    Buscar varios pacientes por documento en una sola consulta (pantallas de recepción)
+    
+    - **documentos**: Lista de números de documento (máximo 200)
+    
+    Cada resultado indica `found`, `no_appointment`, `not_found` o `invalid`,
+    con los mismos códigos que la búsqueda individual.
+    """
+    cleaned = {
+        documento: normalize_documento(documento)
+        for documento in lookup.documentos
+        if validate_documento(documento)
+    }
+    
+    try:
+        patients = await patient_service.find_many_by_document(list(cleaned.values()))
+    except Exception as e:
+        logger.error(f"Unexpected error in batch patient lookup: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": "internal_error",
+                "message": "Error interno del sistema",
+                "code": "INTERNAL_SERVER_ERROR"
+            }
+        )
+    
+    results = []
+    for documento in lookup.documentos:
+        if documento not in cleaned:
+            results.append({"documento": documento, "status": "invalid", "code": "INVALID_DOCUMENT_FORMAT"})
+            continue
+        
+        patient = patients.get(cleaned[documento])
+        if not patient:
+            results.append({"documento": cleaned[documento], "status": "not_found", "code": "PATIENT_NOT_FOUND"})
+        elif not patient.turno or not patient.turno.medico:
+            results.append({"documento": cleaned[documento], "status": "no_appointment", "code": "NO_APPOINTMENT_SCHEDULED"})
+        else:
+            results.append({
+                "documento": cleaned[documento],
+                "status": "found",
+                "data": {
+                    "documento": patient.documento,
+                    "nombre": patient.nombre,
+                    "apellido": patient.apellido,
+                    "turno": patient.turno
+                }
+            })
+    
+    return {
+        "status": "success",
+        "data": results,
+        "count": len(results),
+        "found": sum(1 for result in results if result["status"] == "found"),
+        "timestamp": datetime.utcnow()
+    }
+
 @router.post("/confirm", response_model=dict)
 async def confirm_appointment(
     confirmation: AppointmentConfirmation,
@@ -130,11 +183,11 @@ async def confirm_appointment(
             }
         )
     
-    clean_documento = re.sub(r'\D', '', confirmation.documento)
+    clean_documento = normalize_documento(confirmation.documento)
     
     try:
-        success = await patient_service.confirm_appointment(clean_documento)
-        if not success:
+        patient = await patient_service.confirm_appointment(clean_documento)
+        if not patient:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail={
@@ -149,7 +202,8 @@ async def confirm_appointment(
             "status": "success",
             "message": "Turno confirmado exitosamente", 
             "documento": clean_documento,
-            "confirmed_at": confirmation.fecha_confirmacion
+            "confirmed_at": patient.turno.fecha_confirmacion,
+            "turno": patient.turno
         }
         
     except HTTPException:
@@ -169,6 +223,8 @@ async def confirm_appointment(
 async def get_all_patients(
     page: int = Query(1, ge=1, description="Número de página"),
     limit: int = Query(50, ge=1, le=100, description="Límite de resultados por página"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco (next_cursor) de la página anterior"),
+    include_total: bool = Query(False, description="Incluir el total aproximado en modo cursor"),
     patient_service: PatientService = Depends(get_patient_service)
 ):
     """
@@ -176,8 +232,36 @@ async def get_all_patients(
     
     - **page**: Número de página (inicio en 1)
     - **limit**: Cantidad de resultados por página (máximo 100)
+    - **cursor**: Si se envía, pagina por cursor (keyset) e ignora `page`
+    - **include_total**: En modo cursor, agrega el total aproximado
     """
     try:
+        if cursor:
+            try:
+                patients, next_cursor = await patient_service.get_patients_after_cursor(cursor, limit)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail={
+                        "error": "invalid_cursor",
+                        "message": "Cursor de paginación inválido",
+                        "code": "INVALID_CURSOR"
+                    }
+                )
+            
+            pagination = {
+                "limit": limit,
+                "next_cursor": next_cursor
+            }
+            if include_total:
+                pagination["total"] = await patient_service.count_patients()
+            
+            return {
+                "status": "success",
+                "data": patients,
+                "pagination": pagination
+            }
+        
         skip = (page - 1) * limit
         patients, total = await patient_service.get_all_patients_paginated(skip, limit)
         
@@ -188,10 +272,14 @@ async def get_all_patients(
                 "page": page,
                 "limit": limit,
                 "total": total,
-                "pages": (total + limit - 1) // limit
+                "pages": (total + limit - 1) // limit,
+                # Lets clients switch to cursor mode from any page
+                "next_cursor": encode_cursor(patients[-1]) if len(patients) == limit else None
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting patients: {e}")
         raise HTTPException(
@@ -252,7 +340,7 @@ async def create_patient(
     
     # Clean and validate data
     clean_data = patient_data.dict()
-    clean_data["documento"] = re.sub(r'\D', '', clean_data["documento"])
+    clean_data["documento"] = normalize_documento(clean_data["documento"])
     
     try:
         patient = await patient_service.create_patient(clean_data)
@@ -285,4 +373,43 @@ async def create_patient(
                 "message": "Error interno al crear paciente",
                 "code": "INTERNAL_SERVER_ERROR"
             }
-        )
\ No newline at end of file
+        )
+
+@router.post("/import", response_model=dict, dependencies=[Depends(require_api_key)])
+async def import_agenda(
+    file: UploadFile = File(..., description="Agenda en CSV (con encabezado) o NDJSON"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Formato; por defecto según la extensión"),
+):
+    """
+    Importar la agenda de turnos (carga nocturna) con upserts masivos por documento
+    
+    - **file**: CSV con columnas documento, nombre, apellido, medico, hora, piso,
+      fecha, especialidad, consultorio; o NDJSON con las mismas claves (o `turno` anidado)
+    - **format**: `csv` o `ndjson`
+    
+    Las filas inválidas se informan individualmente sin abortar la importación.
+    """
+    format = format or ("ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    
+    try:
+        db = await get_database()
+        # Starlette spools uploads to disk past 1 MB; rows are read from it in chunks
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        report = await AgendaImporter(db).import_stream(stream, format)
+        
+        return {
+            "status": "success" if report["failed"] == 0 else "partial",
+            "format": format,
+            "data": report
+        }
+        
+    except Exception as e:
+        logger.error(f"Error importing agenda: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": "internal_error",
+                "message": "Error interno al importar la agenda",
+                "code": "INTERNAL_SERVER_ERROR"
+            }
+        )
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, status
-from services.service_log_service import ServiceLogService
+from fastapi.responses import StreamingResponse
+from services.service_log_service import ServiceLogService, create_service_log_service
+from services.service_log_archive import get_historical_stats
+from services.service_log_writer import OUTCOME_COMMITTED, ServiceLogQueueFull
 from models.service import ServiceLogCreate, ServiceStats
 from database import get_database
+from utils.validation import validate_documento, normalize_documento
+from utils.export import ndjson_chunks, csv_chunks, gzip_chunks
 from typing import Optional
+from datetime import date, datetime, timedelta, timezone
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/services", tags=["services"])
@@ -12,21 +17,7 @@ router = APIRouter(prefix="/api/services", tags=["services"])
 async def get_service_log_service():
     """Dependency to get service log service instance"""
     db = await get_database()
-    return ServiceLogService(db)
-
-def validate_documento(documento: str) -> bool:
-    """Validate document number format"""
-    if not documento:
-        return False
-    
-    # Remove any non-digit characters
-    clean_doc = re.sub(r'\D', '', documento)
-    
-    # Check length (between 7 and 10 digits)
-    if len(clean_doc) < 7 or len(clean_doc) > 10:
-        return False
-    
-    return True
+    return create_service_log_service(db)
 
 def validate_secretaria(secretaria: str) -> bool:
     """Validate secretaria value"""
@@ -36,6 +27,7 @@ def validate_secretaria(secretaria: str) -> bool:
 @router.post("/log", response_model=dict)
 async def log_service_request(
     log_data: ServiceLogCreate,
+    wait: bool = Query(False, description="Esperar a que el registro quede escrito en la base de datos"),
     service_log_service: ServiceLogService = Depends(get_service_log_service)
 ):
     """
@@ -44,6 +36,11 @@ async def log_service_request(
     - **documento**: Número de documento del paciente
     - **secretaria**: Código de secretaría (pb, pp, 2p, 3p)
     - **piso**: Piso donde se encuentra la secretaría
+    - **wait**: Si es true, responde recién cuando el lote fue escrito
+      (o guardado en el spool local si MongoDB no responde)
+    
+    `outcome` indica dónde quedó el registro: queued, committed o spooled.
+    Con la cola de escritura llena responde 503 con Retry-After.
     """
     # Enhanced validation
     if not validate_documento(log_data.documento):
@@ -68,12 +65,15 @@ async def log_service_request(
     
     # Clean and normalize data
     clean_data = log_data.dict()
-    clean_data["documento"] = re.sub(r'\D', '', clean_data["documento"])
+    clean_data["documento"] = normalize_documento(clean_data["documento"])
     clean_data["secretaria"] = clean_data["secretaria"].lower()
     
     try:
-        service_log = await service_log_service.log_service_request(ServiceLogCreate(**clean_data))
-        if not service_log:
+        logged = await service_log_service.log_service_request(
+            ServiceLogCreate(**clean_data),
+            wait_for_commit=wait
+        )
+        if not logged:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail={
@@ -82,6 +82,7 @@ async def log_service_request(
                     "code": "SERVICE_REGISTRATION_FAILED"
                 }
             )
+        service_log, outcome = logged
         
         logger.info(f"Service request logged: {clean_data['documento']} -> {clean_data['secretaria']}")
         return {
@@ -94,9 +95,24 @@ async def log_service_request(
                 "piso": service_log.piso,
                 "timestamp": service_log.timestamp,
                 "estado": service_log.estado
-            }
+            },
+            # queued: accepted by the write-behind queue; committed: written to
+            # MongoDB; spooled: on the local disk spool until MongoDB is back
+            "outcome": outcome,
+            "committed": outcome == OUTCOME_COMMITTED
         }
         
+    except ServiceLogQueueFull as e:
+        # Backpressure: the kiosk should retry, the request itself was valid
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "error": "service_log_queue_full",
+                "message": "Servicio ocupado, reintente en unos segundos",
+                "code": "SERVICE_LOG_QUEUE_FULL"
+            },
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -139,6 +155,59 @@ async def get_service_stats(
             }
         )
 
+@router.get("/stats/history", response_model=dict)
+async def get_historical_service_stats(
+    start: date = Query(..., description="Desde (YYYY-MM-DD, UTC)"),
+    end: date = Query(..., description="Hasta (YYYY-MM-DD, UTC, inclusive)"),
+    secretaria: Optional[str] = Query(None, description="Filtrar por secretaría")
+):
+    """
+    Obtener estadísticas de cualquier período, incluidos días ya archivados
+    
+    - **start** / **end**: Rango de días; los días archivados se leen de los
+      archivos Parquet y el resto de los contadores diarios
+    - **secretaria**: Filtrar por secretaría específica
+    """
+    if secretaria and not validate_secretaria(secretaria):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": "invalid_secretaria",
+                "message": "Secretaría inválida para filtro",
+                "code": "INVALID_FILTER_SECRETARIA"
+            }
+        )
+    
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": "invalid_date_range",
+                "message": "La fecha inicial debe ser anterior a la final",
+                "code": "INVALID_DATE_RANGE"
+            }
+        )
+    
+    try:
+        db = await get_database()
+        stats = await get_historical_stats(db, start, end, secretaria.lower() if secretaria else None)
+        return {
+            "status": "success",
+            "data": stats,
+            "period": {"start": start.isoformat(), "end": end.isoformat()}
+        }
+        
+    except Exception as e:
+        logger.error(f"Error getting historical service stats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": "internal_error",
+                "message": "Error interno al obtener estadísticas históricas",
+                "code": "INTERNAL_SERVER_ERROR"
+            }
+        )
+
 @router.get("/recent", response_model=dict)
 async def get_recent_services(
     limit: int = Query(50, ge=1, le=200, description="Límite de resultados"),
@@ -205,6 +274,85 @@ async def get_recent_services(
             }
         )
 
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+EXPORT_FIELDS = ["id", "documento", "secretaria", "piso", "estado", "timestamp", "created_at", "updated_at"]
+
+@router.get("/export")
+async def export_services(
+    start_date: Optional[datetime] = Query(None, description="Desde (por defecto, últimas 24 horas)"),
+    end_date: Optional[datetime] = Query(None, description="Hasta (por defecto, ahora)"),
+    secretaria: Optional[str] = Query(None, description="Filtrar por secretaría"),
+    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Formato: ndjson o csv"),
+    gzip: bool = Query(False, description="Comprimir la respuesta con gzip"),
+    service_log_service: ServiceLogService = Depends(get_service_log_service)
+):
+    """
+    Exportar servicios por rango de fechas como NDJSON o CSV, en streaming
+    
+    - **start_date** / **end_date**: Rango de fechas (ISO 8601)
+    - **secretaria**: Filtrar por secretaría específica
+    - **estado**: Filtrar por estado específico
+    - **format**: `ndjson` (un documento JSON por línea) o `csv`
+    - **gzip**: Comprimir el stream (Content-Encoding: gzip)
+    """
+    if secretaria and not validate_secretaria(secretaria):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": "invalid_secretaria",
+                "message": "Secretaría inválida para filtro",
+                "code": "INVALID_FILTER_SECRETARIA"
+            }
+        )
+    
+    if estado and estado not in ['pendiente', 'atendido', 'cancelado']:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": "invalid_estado",
+                "message": "Estado inválido para filtro",
+                "code": "INVALID_FILTER_ESTADO"
+            }
+        )
+    
+    end_date = to_naive_utc(end_date) or datetime.utcnow()
+    start_date = to_naive_utc(start_date) or end_date - timedelta(days=1)
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error": "invalid_date_range",
+                "message": "La fecha inicial debe ser anterior a la final",
+                "code": "INVALID_DATE_RANGE"
+            }
+        )
+    
+    services = service_log_service.iter_services(
+        start_date,
+        end_date,
+        secretaria=secretaria.lower() if secretaria else None,
+        estado=estado
+    )
+    if format == "csv":
+        chunks, media_type = csv_chunks(services, EXPORT_FIELDS), "text/csv; charset=utf-8"
+    else:
+        chunks, media_type = ndjson_chunks(services), "application/x-ndjson"
+    
+    filename = f"servicios_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        # Already encoded, so GZipMiddleware passes it through untouched
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
 @router.put("/{service_id}/status", response_model=dict)
 async def update_service_status(
     service_id: str,
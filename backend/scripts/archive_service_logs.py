@@ -0,0 +1,46 @@
+import asyncio
+import sys
+import json
+import argparse
+from pathlib import Path
+from datetime import date
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_database, close_database
+from services.service_log_archive import (
+    ServiceLogArchive, acquire_archive_lease, archive_expired_logs, archive_owner, get_historical_stats, release_archive_lease
+)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Archive service logs past retention to Parquet, or query the archive")
+    parser.add_argument("--dir", help="Archive directory (defaults to SERVICE_LOGS_ARCHIVE_DIR)")
+    parser.add_argument("--stats", nargs=2, metavar=("START", "END"), help="Print stats for a day range instead (YYYY-MM-DD)")
+    parser.add_argument("--secretaria", help="With --stats, only this secretaria")
+    args = parser.parse_args()
+
+    archive = ServiceLogArchive(args.dir) if args.dir else ServiceLogArchive()
+    db = await get_database()
+    try:
+        if args.stats:
+            start, end = (date.fromisoformat(value) for value in args.stats)
+            stats = await get_historical_stats(db, start, end, args.secretaria, archive=archive)
+            print(json.dumps(stats, indent=2, ensure_ascii=False))
+            return
+
+        owner = archive_owner()
+        if not await acquire_archive_lease(db, owner):
+            print("⏳ Another process is archiving service logs, try again later")
+            return
+        try:
+            print(f"📦 Archiving service logs to {archive.directory}...")
+            report = await archive_expired_logs(db, archive=archive)
+            print(f"✅ {report['rows']} logs from {report['days']} days archived, {report['deleted']} deleted from MongoDB")
+        finally:
+            await release_archive_lease(db, owner)
+    finally:
+        await close_database()
+
+if __name__ == "__main__":
+    asyncio.run(main())
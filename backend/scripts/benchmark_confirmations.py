@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_database
+from services.patient_service import PatientService
+from datetime import datetime
+
+BENCHMARK_COLLECTION = "benchmark_patients"
+
+async def legacy_confirm(collection, documento: str) -> bool:
+    """Previous two round-trip confirmation (find_one + update_one)"""
+    existing_patient = await collection.find_one(
+        {
+            "documento": documento,
+            "turno.medico": {"$exists": True, "$ne": None}
+        }
+    )
+    if not existing_patient:
+        return False
+
+    result = await collection.update_one(
+        {"documento": documento},
+        {
+            "$set": {
+                "turno.confirmado": True,
+                "turno.fecha_confirmacion": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }
+        }
+    )
+    return result.modified_count > 0
+
+async def reset_patients(collection, patients: int):
+    """Create a fresh set of unconfirmed patients"""
+    await collection.drop()
+    await collection.create_index("documento", unique=True)
+    await collection.insert_many([
+        {
+            "documento": str(10000000 + i),
+            "nombre": "Paciente",
+            "apellido": f"Benchmark {i}",
+            "turno": {
+                "medico": "Dr. Benchmark",
+                "hora": "10:00",
+                "piso": "Planta Baja",
+                "confirmado": False
+            },
+            "updated_at": datetime.utcnow()
+        }
+        for i in range(patients)
+    ])
+
+async def run_kiosks(confirm, patients: int, kiosks: int) -> float:
+    """Confirm every patient from concurrent kiosks and return confirmations/second"""
+    queue = asyncio.Queue()
+    for i in range(patients):
+        queue.put_nowait(str(10000000 + i))
+
+    async def kiosk():
+        while not queue.empty():
+            await confirm(queue.get_nowait())
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(kiosk() for _ in range(kiosks)))
+    return patients / (time.perf_counter() - start_time)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark appointment confirmations")
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--kiosks", type=int, default=20)
+    args = parser.parse_args()
+
+    db = await get_database()
+    collection = db[BENCHMARK_COLLECTION]
+
+    # PatientService pointed at the benchmark collection
+    service = PatientService(db)
+    service.collection = collection
+
+    try:
+        await reset_patients(collection, args.patients)
+        legacy_rate = await run_kiosks(
+            lambda documento: legacy_confirm(collection, documento), args.patients, args.kiosks
+        )
+
+        await reset_patients(collection, args.patients)
+        atomic_rate = await run_kiosks(service.confirm_appointment, args.patients, args.kiosks)
+
+        print(f"👥 {args.patients} confirmations from {args.kiosks} concurrent kiosks")
+        print(f"⏱️  find_one + update_one:   {legacy_rate:8.0f} confirmations/s")
+        print(f"⚡ find_one_and_update:     {atomic_rate:8.0f} confirmations/s")
+        print(f"📈 Speedup: {atomic_rate / legacy_rate:.2f}x")
+    finally:
+        await collection.drop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
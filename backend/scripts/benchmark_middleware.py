@@ -0,0 +1,158 @@
+import asyncio
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware.metrics import http_requests_in_flight, record_request_metrics
+from middleware.pipeline import RequestPipelineMiddleware
+from middleware.security import SECURITY_HEADERS
+from models.patient import PatientResponse, Appointment
+from routes.patients import router as patients_router
+from utils.cache import patient_cache
+from utils.rate_limit import RateLimiter
+
+DOCUMENTO = "12345678"
+
+class LegacySecurityMiddleware(BaseHTTPMiddleware):
+    """Previous middleware.security.SecurityMiddleware"""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        for name, value in SECURITY_HEADERS.items():
+            response.headers[name] = value
+        return response
+
+class LegacyMetricsMiddleware:
+    """Previous pure ASGI metrics middleware"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        start_time = time.perf_counter()
+        status_code = 500
+        http_requests_in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            record_request_metrics(scope, status_code, time.perf_counter() - start_time)
+
+def unlimited_rate_limiter() -> RateLimiter:
+    return RateLimiter(endpoint_limits={}, default_per_minute=10 ** 9, default_burst=10 ** 9)
+
+def legacy_app() -> FastAPI:
+    """Stack as it was: security headers, timing and rate limiting as HTTP middleware"""
+    app = FastAPI()
+    app.include_router(patients_router)
+    rate_limiter = unlimited_rate_limiter()
+
+    @app.middleware("http")
+    async def add_process_time_header(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = str(f"{time.time() - start_time:.4f}")
+        return response
+
+    @app.middleware("http")
+    async def rate_limit_middleware(request: Request, call_next):
+        client_ip = request.client.host if request.client else "unknown"
+        allowed, limiter, remaining, retry_after = rate_limiter.check(client_ip, request.url.path)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(limiter.per_minute)
+        response.headers["X-RateLimit-Remaining"] = str(remaining)
+        return response
+
+    app.add_middleware(LegacySecurityMiddleware)
+    app.add_middleware(LegacyMetricsMiddleware)
+    return app
+
+def fused_app() -> FastAPI:
+    """Single RequestPipelineMiddleware"""
+    app = FastAPI()
+    app.include_router(patients_router)
+    app.add_middleware(RequestPipelineMiddleware, rate_limiter=unlimited_rate_limiter())
+    return app
+
+async def call(app, path: str) -> int:
+    """Drive the ASGI app directly, without a network or HTTP client in the way"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"testserver")],
+        "client": ("10.0.0.1", 50000), "server": ("testserver", 80)
+    }
+    status_code = 0
+    request_sent = False
+    response_complete = asyncio.Event()
+
+    async def receive():
+        # Like a server: the (empty) body once, then block until the response is done
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_complete.set()
+
+    await app(scope, receive, send)
+    return status_code
+
+async def measure(app, requests: int):
+    path = f"/api/patients/{DOCUMENTO}"
+    assert await call(app, path) == 200
+    latencies = []
+    for _ in range(requests):
+        start_time = time.perf_counter()
+        await call(app, path)
+        latencies.append(time.perf_counter() - start_time)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1_000_000, latencies[int(len(latencies) * 0.99)] * 1_000_000
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the middleware stack on /api/patients/{documento}")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    # Served from the patient cache so MongoDB is not involved
+    patient_cache.set(DOCUMENTO, PatientResponse(
+        documento=DOCUMENTO, nombre="Juan", apellido="Pérez",
+        turno=Appointment(medico="Dra. García", hora="09:30", piso="2")
+    ))
+
+    apps = {"legacy": legacy_app(), "fused": fused_app()}
+    results = {name: [] for name in apps}
+    # Alternate stacks each round so drift affects both equally
+    for _ in range(args.rounds):
+        for name, app in apps.items():
+            results[name].append(await measure(app, args.requests))
+
+    print(f"📊 GET /api/patients/{{documento}} ({args.rounds} x {args.requests} requests, best round)")
+    for name, rounds in results.items():
+        p50, p99 = min(rounds)
+        print(f"  {name:>6}: p50 {p50:7.1f} µs   p99 {p99:7.1f} µs")
+
+if __name__ == "__main__":
+    asyncio.run(main())
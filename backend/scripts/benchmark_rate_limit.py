@@ -0,0 +1,67 @@
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.rate_limit import RateLimiter
+
+PATHS = ["/api/patients/12345678", "/api/services/log", "/api/services/stats", "/api/health", "/api/"]
+
+class SlidingWindowLimiter:
+    """Previous list-of-timestamps limiter from server.rate_limit_middleware"""
+
+    def __init__(self):
+        self.request_counts = {}
+
+    def check(self, client_ip: str, path: str) -> bool:
+        current_time = time.time()
+        self.request_counts[client_ip] = [
+            req_time for req_time in self.request_counts.get(client_ip, [])
+            if current_time - req_time < 60
+        ]
+        if len(self.request_counts.get(client_ip, [])) >= 100:
+            return False
+        self.request_counts.setdefault(client_ip, []).append(current_time)
+        return True
+
+def run(make_limiter, requests):
+    """Return (microseconds per request, KiB of limiter state retained)"""
+    check = make_limiter().check
+    start_time = time.perf_counter()
+    for client_ip, path in requests:
+        check(client_ip, path)
+    elapsed = time.perf_counter() - start_time
+
+    # Separate pass for memory so tracemalloc does not skew the timing
+    tracemalloc.start()
+    limiter = make_limiter()
+    for client_ip, path in requests:
+        limiter.check(client_ip, path)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / len(requests) * 1_000_000, retained / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rate limiter per-request overhead")
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    clients = [f"10.{i // 65536}.{(i // 256) % 256}.{i % 256}" for i in range(args.clients)]
+    requests = [(rng.choice(clients), rng.choice(PATHS)) for _ in range(args.requests)]
+
+    legacy_us, legacy_kib = run(SlidingWindowLimiter, requests)
+    gcra_us, gcra_kib = run(RateLimiter, requests)
+
+    print(f"👥 {args.requests} requests from {args.clients} distinct clients")
+    print(f"⏱️  sliding window lists: {legacy_us:6.2f} µs/request, state {legacy_kib:9.0f} KiB")
+    print(f"⚡ GCRA token buckets:   {gcra_us:6.2f} µs/request, state {gcra_kib:9.0f} KiB")
+
+if __name__ == "__main__":
+    main()
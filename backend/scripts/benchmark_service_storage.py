@@ -0,0 +1,166 @@
+import asyncio
+import sys
+import time
+import uuid
+import random
+import argparse
+import statistics
+from collections import Counter
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_database, close_database
+from indexes import INDEX_MANIFEST, TIMESERIES_INDEX_MANIFEST, provision_collection
+from services.service_log_service import ServiceLogService, TimeSeriesServiceLogService
+from services.service_log_timeseries import (
+    LATEST_VERSION_STAGES, SERVICE_EVENTS_COLLECTION, SERVICE_STATE_COLLECTION,
+    TimeSeriesServiceLogStore, ensure_timeseries_collections, event_version
+)
+from services.service_log_writer import SERVICE_LOG_BATCH_SIZE
+from services.service_stats_rollup import rollup_key
+
+BENCHMARK_LOGS = "benchmark_service_logs"
+BENCHMARK_EVENTS = "benchmark_service_events"
+BENCHMARK_STATE = "benchmark_service_state"
+BENCHMARK_ROLLUP = "benchmark_service_stats_daily"
+SECRETARIAS = ["pb", "pp", "2p", "3p"]
+
+def generate_logs(rows: int, days: int = 90) -> list:
+    """Pending service logs spread over the retention window, oldest first"""
+    start = datetime.utcnow() - timedelta(days=days)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "documento": str(10000000 + i % 200000),
+            "secretaria": SECRETARIAS[i % 4],
+            "piso": "Planta Baja",
+            "timestamp": start + timedelta(seconds=i * days * 86400 // rows),
+            "estado": "pendiente",
+            "created_at": start,
+            "updated_at": start,
+            "deleted": False
+        }
+        for i in range(rows)
+    ]
+
+async def time_inserts(target, documents: list, batch_size: int) -> float:
+    """Rows per second inserting in write-behind sized batches"""
+    start_time = time.perf_counter()
+    for offset in range(0, len(documents), batch_size):
+        await target.insert_many([dict(document) for document in documents[offset:offset + batch_size]], ordered=False)
+    return len(documents) / (time.perf_counter() - start_time)
+
+async def resolve(db, logs: list, resolved_ratio: float) -> list:
+    """Resolve most logs in both layouts, as reception does during the day (untimed)"""
+    resolved = random.sample(logs, int(len(logs) * resolved_ratio))
+    now = datetime.utcnow()
+    by_estado = {}
+    for log in resolved:
+        by_estado.setdefault(random.choice(["atendido", "cancelado"]), []).append(log)
+
+    for estado, group in by_estado.items():
+        ids = [log["id"] for log in group]
+        for offset in range(0, len(ids), 10000):
+            chunk = ids[offset:offset + 10000]
+            await db[BENCHMARK_LOGS].update_many({"id": {"$in": chunk}}, {"$set": {"estado": estado, "updated_at": now}})
+            await db[BENCHMARK_STATE].delete_many({"id": {"$in": chunk}})
+        for offset in range(0, len(group), 10000):
+            await db[BENCHMARK_EVENTS].insert_many(
+                [event_version(log, estado=estado, updated_at=now) for log in group[offset:offset + 10000]],
+                ordered=False
+            )
+        for log in group:
+            log["estado"] = estado
+    return logs
+
+async def storage(db, names: list) -> dict:
+    """Storage and index bytes summed over collections"""
+    totals = Counter()
+    for name in names:
+        stats = (await db[name].aggregate([{"$collStats": {"storageStats": {}}}]).to_list(length=1))[0]["storageStats"]
+        totals["storage_bytes"] += stats.get("storageSize", 0)
+        totals["index_bytes"] += stats.get("totalIndexSize", 0)
+    return totals
+
+async def time_calls(call, runs: int) -> tuple:
+    """(p50, p95) milliseconds"""
+    samples = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - start_time) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare the standard and time-series service log layouts")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=SERVICE_LOG_BATCH_SIZE, help="Rows per insert_many (write-behind batch)")
+    parser.add_argument("--resolved", type=float, default=0.95, help="Share of logs no longer pending")
+    parser.add_argument("--runs", type=int, default=50, help="Timed calls per query")
+    args = parser.parse_args()
+
+    db = await get_database()
+    names = (BENCHMARK_LOGS, BENCHMARK_EVENTS, BENCHMARK_STATE, BENCHMARK_ROLLUP)
+    try:
+        for name in names:
+            await db[name].drop()
+        await provision_collection(db, BENCHMARK_LOGS, INDEX_MANIFEST["service_logs"])
+        await ensure_timeseries_collections(db, BENCHMARK_EVENTS)
+        await provision_collection(db, BENCHMARK_EVENTS, TIMESERIES_INDEX_MANIFEST[SERVICE_EVENTS_COLLECTION])
+        await provision_collection(db, BENCHMARK_STATE, TIMESERIES_INDEX_MANIFEST[SERVICE_STATE_COLLECTION])
+
+        standard = ServiceLogService(db)
+        standard.collection = db[BENCHMARK_LOGS]
+        timeseries = TimeSeriesServiceLogService(db)
+        timeseries.collection = TimeSeriesServiceLogStore(db, BENCHMARK_EVENTS, BENCHMARK_STATE)
+        timeseries.events, timeseries.state = timeseries.collection.events, timeseries.collection.state
+        for service in (standard, timeseries):
+            service.rollup.collection = db[BENCHMARK_ROLLUP]
+
+        logs = generate_logs(args.rows)
+        print(f"📥 Inserting {args.rows} service logs in batches of {args.batch_size}...")
+        standard_rate = await time_inserts(standard.collection, logs, args.batch_size)
+        timeseries_rate = await time_inserts(timeseries.collection, logs, args.batch_size)
+
+        await resolve(db, logs, args.resolved)
+        # Both layouts read the same rollups
+        await standard.rollup.apply(Counter(rollup_key(log) for log in logs))
+
+        standard_size = await storage(db, [BENCHMARK_LOGS])
+        timeseries_size = await storage(db, [BENCHMARK_EVENTS, BENCHMARK_STATE])
+
+        # Uncached: the @cached wrapper would answer every call after the first
+        get_service_stats = ServiceLogService.get_service_stats.__wrapped__
+        standard_stats = await time_calls(lambda: get_service_stats(standard, 7), args.runs)
+        timeseries_stats = await time_calls(lambda: get_service_stats(timeseries, 7), args.runs)
+
+        # The 7-day counts computed from raw logs, i.e. without the rollups
+        since = datetime.utcnow() - timedelta(days=7)
+        group = {"$group": {"_id": {"secretaria": "$secretaria", "estado": "$estado"}, "count": {"$sum": 1}}}
+        standard_raw = await time_calls(lambda: db[BENCHMARK_LOGS].aggregate([
+            {"$match": {"timestamp": {"$gte": since}, "deleted": False}}, group
+        ]).to_list(length=None), max(args.runs // 5, 2))
+        timeseries_raw = await time_calls(lambda: db[BENCHMARK_EVENTS].aggregate([
+            {"$match": {"timestamp": {"$gte": since}}}, *LATEST_VERSION_STAGES, {"$match": {"deleted": False}}, group
+        ], allowDiskUse=True).to_list(length=None), max(args.runs // 5, 2))
+
+        mb = 1024 ** 2
+        print(f"📊 {args.rows} service logs, {args.resolved:.0%} resolved")
+        print(f"{'':<28}{'standard':>14}{'time-series':>14}")
+        print(f"{'insert rows/s':<28}{standard_rate:>14.0f}{timeseries_rate:>14.0f}")
+        print(f"{'storage MB':<28}{standard_size['storage_bytes'] / mb:>14.2f}{timeseries_size['storage_bytes'] / mb:>14.2f}")
+        print(f"{'index MB':<28}{standard_size['index_bytes'] / mb:>14.2f}{timeseries_size['index_bytes'] / mb:>14.2f}")
+        print(f"{'get_service_stats p50 ms':<28}{standard_stats[0]:>14.2f}{timeseries_stats[0]:>14.2f}")
+        print(f"{'get_service_stats p95 ms':<28}{standard_stats[1]:>14.2f}{timeseries_stats[1]:>14.2f}")
+        print(f"{'raw 7-day counts p50 ms':<28}{standard_raw[0]:>14.2f}{timeseries_raw[0]:>14.2f}")
+    finally:
+        for name in names:
+            await db[name].drop()
+        await close_database()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import asyncio
+import sys
+import time
+import uuid
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_database
+from indexes import INDEX_MANIFEST, provision_collection
+from services.service_log_service import ServiceLogService
+
+BENCHMARK_COLLECTION = "benchmark_service_logs"
+BENCHMARK_ROLLUP_COLLECTION = "benchmark_service_stats_daily"
+SECRETARIAS = ["pb", "pp", "2p", "3p"]
+
+async def load_logs(collection, rows: int, batch_size: int = 10000) -> list:
+    """Insert `rows` service logs spread over 90 days and return their ids"""
+    await collection.drop()
+    ids = []
+    start = datetime.utcnow() - timedelta(days=90)
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for i in range(offset, min(offset + batch_size, rows)):
+            service_id = str(uuid.uuid4())
+            ids.append(service_id)
+            batch.append({
+                "id": service_id,
+                "documento": str(10000000 + i % 200000),
+                "secretaria": SECRETARIAS[i % 4],
+                "piso": "Planta Baja",
+                "timestamp": start + timedelta(seconds=i * 90 * 86400 // rows),
+                "estado": "pendiente",
+                "deleted": False
+            })
+        await collection.insert_many(batch, ordered=False)
+    return ids
+
+async def time_updates(service: ServiceLogService, ids: list, operations: int) -> float:
+    """Average milliseconds per update_service_status on random ids"""
+    sample = random.sample(ids, operations)
+    start_time = time.perf_counter()
+    for service_id in sample:
+        await service.update_service_status(service_id, random.choice(["atendido", "pendiente", "cancelado"]))
+    return (time.perf_counter() - start_time) / operations * 1000
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark status updates by service id with and without the unique id index")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--scan-operations", type=int, default=20, help="Updates timed without the index (each one scans)")
+    parser.add_argument("--operations", type=int, default=2000, help="Updates timed with the index")
+    args = parser.parse_args()
+
+    db = await get_database()
+    collection = db[BENCHMARK_COLLECTION]
+
+    # ServiceLogService pointed at the benchmark collections
+    service = ServiceLogService(db)
+    service.collection = collection
+    service.rollup.collection = db[BENCHMARK_ROLLUP_COLLECTION]
+
+    try:
+        print(f"📥 Loading {args.rows} service logs...")
+        ids = await load_logs(collection, args.rows)
+
+        scan_ms = await time_updates(service, ids, args.scan_operations)
+
+        await provision_collection(db, BENCHMARK_COLLECTION, {"id_1": INDEX_MANIFEST["service_logs"]["id_1"]})
+        indexed_ms = await time_updates(service, ids, args.operations)
+
+        print(f"📊 update_service_status over {args.rows} logs")
+        print(f"⏱️  collection scan:  {scan_ms:9.2f} ms/update ({args.scan_operations} updates)")
+        print(f"⚡ unique id index: {indexed_ms:9.2f} ms/update ({args.operations} updates)")
+        print(f"📈 Speedup: {scan_ms / indexed_ms:.0f}x")
+    finally:
+        await collection.drop()
+        await db[BENCHMARK_ROLLUP_COLLECTION].drop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
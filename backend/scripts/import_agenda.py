@@ -0,0 +1,35 @@
+import asyncio
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_database, close_database
+from services.agenda_import import AgendaImporter, IMPORT_CHUNK_SIZE
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import a CSV or NDJSON appointment agenda into patients")
+    parser.add_argument("path", type=Path, help="Agenda file (.csv, .ndjson or .jsonl)")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    format = args.format or ("ndjson" if args.path.suffix.lower() in (".ndjson", ".jsonl") else "csv")
+    db = await get_database()
+    try:
+        with args.path.open(encoding="utf-8-sig", newline="") as stream:
+            report = await AgendaImporter(db, chunk_size=args.chunk_size).import_stream(stream, format)
+    finally:
+        await close_database()
+
+    print(f"📥 {report['rows']} rows in {report['elapsed_seconds']}s ({report['rows_per_second']} rows/s)")
+    print(f"✅ {report['inserted']} inserted, {report['updated']} updated, ❌ {report['failed']} failed")
+    for error in report["errors"]:
+        print(f"  row {error['row']}: {json.dumps(error, ensure_ascii=False)}")
+    sys.exit(1 if report["failed"] else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
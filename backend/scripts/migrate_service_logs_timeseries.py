@@ -0,0 +1,54 @@
+import asyncio
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_database, close_database
+from indexes import TIMESERIES_INDEX_MANIFEST, provision_collection
+from services.service_log_timeseries import (
+    SERVICE_EVENTS_COLLECTION, SERVICE_STATE_COLLECTION, TIMESERIES_ENABLED, migrate_service_logs
+)
+
+async def main():
+    """
+    Copy service_logs into the time-series layout. Run it with the API
+    stopped, then start the API with SERVICE_LOGS_STORAGE=timeseries.
+    service_logs is not modified, so switching back only needs the setting.
+    """
+    parser = argparse.ArgumentParser(description="Migrate service_logs to service_events (time-series) + service_state")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--restart", action="store_true", help="Drop service_events/service_state left by an earlier run")
+    args = parser.parse_args()
+
+    db = await get_database()
+    try:
+        if args.restart:
+            await db[SERVICE_EVENTS_COLLECTION].drop()
+            await db[SERVICE_STATE_COLLECTION].drop()
+        elif await db[SERVICE_EVENTS_COLLECTION].find_one({}, {"_id": 1}) is not None:
+            print(f"❌ {SERVICE_EVENTS_COLLECTION} already has documents, use --restart to migrate again")
+            sys.exit(1)
+
+        start_time = time.perf_counter()
+        total = await db.service_logs.estimated_document_count()
+        print(f"🔄 Migrating {total} service logs...")
+        async for counts in migrate_service_logs(db, batch_size=args.batch_size):
+            print(f"  {counts['copied']}/{total} copied, {counts['pending']} pending", end="\r")
+        elapsed = time.perf_counter() - start_time
+        print(f"\n✅ {counts['copied']} service logs migrated in {elapsed:.1f}s ({counts['pending']} pending)")
+
+        # The migrated services keep their rollup counters, only the indexes are needed
+        for name, wanted in TIMESERIES_INDEX_MANIFEST.items():
+            result = await provision_collection(db, name, wanted)
+            print(f"🔧 {name}: created {result['created'] or '-'}")
+        if not TIMESERIES_ENABLED:
+            print("➡️  Start the API with SERVICE_LOGS_STORAGE=timeseries to use the new layout")
+    finally:
+        await close_database()
+
+if __name__ == "__main__":
+    asyncio.run(main())
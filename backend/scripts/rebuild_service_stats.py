@@ -0,0 +1,25 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_database, close_database
+from services.service_stats_rollup import ServiceStatsRollup
+
+async def main():
+    """Rebuild the service_stats_daily rollups from service_logs"""
+    try:
+        db = await get_database()
+        print("🔄 Rebuilding service stats rollups from service_logs...")
+        buckets = await ServiceStatsRollup(db).rebuild()
+        print(f"✅ Rollups rebuilt: {buckets} day/secretaria/estado buckets")
+    except Exception as e:
+        print(f"❌ Error rebuilding rollups: {str(e)}")
+        sys.exit(1)
+    finally:
+        await close_database()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -103,7 +103,8 @@ async def setup_test_data():
             "secretaria": "pb",
             "piso": "Planta Baja",
             "timestamp": datetime.utcnow() - timedelta(hours=2),
-            "estado": "atendido"
+            "estado": "atendido",
+            "deleted": False
         },
         {
             "id": "service-002",
@@ -111,7 +112,8 @@ async def setup_test_data():
             "secretaria": "pp",
             "piso": "Primer Piso",
             "timestamp": datetime.utcnow() - timedelta(hours=1),
-            "estado": "pendiente"
+            "estado": "pendiente",
+            "deleted": False
         },
         {
             "id": "service-003",
@@ -119,7 +121,8 @@ async def setup_test_data():
             "secretaria": "2p", 
             "piso": "Segundo Piso",
             "timestamp": datetime.utcnow() - timedelta(minutes=30),
-            "estado": "pendiente"
+            "estado": "pendiente",
+            "deleted": False
         }
     ]
     
@@ -0,0 +1,53 @@
+import asyncio
+import sys
+import argparse
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from backend
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_database, close_database
+from indexes import provision_indexes, index_report
+
+async def main():
+    parser = argparse.ArgumentParser(description="Apply the index manifest and report unused or redundant indexes")
+    parser.add_argument("--force", action="store_true", help="Diff and provision even if the manifest hash matches")
+    parser.add_argument("--report", action="store_true", help="Only print the $indexStats report, build nothing")
+    args = parser.parse_args()
+
+    db = await get_database()
+    try:
+        failed = False
+        if not args.report:
+            result = await provision_indexes(db, force=args.force)
+            if result["skipped"]:
+                print(f"✅ Manifest {result['hash'][:12]} already applied (use --force to diff anyway)")
+            else:
+                failed = result["failed"]
+                for collection in result["collections"]:
+                    print(f"🔧 {collection['collection']}: created {collection['created'] or '-'}")
+                    for name, error in collection["errors"].items():
+                        print(f"  ❌ {name}: {error}")
+
+        report = await index_report(db)
+    finally:
+        await close_database()
+
+    for collection_name, entry in report.items():
+        print(f"\n📊 {collection_name}")
+        for index in entry["indexes"]:
+            flags = [] if index["managed"] else ["unmanaged"]
+            if index["redundant_with"]:
+                flags.append(f"prefix of {index['redundant_with']}")
+            print(f"  {index['name']:<36} {index['ops']:>10} ops  {' '.join(flags)}")
+        drift = entry["drift"]
+        for label in ("missing", "changed", "renamed"):
+            if drift[label]:
+                print(f"  ⚠️ {label}: {', '.join(drift[label])}")
+        if entry["unused"]:
+            print(f"  💤 unused since last restart: {', '.join(entry['unused'])}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
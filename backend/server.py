@@ -1,5 +1,6 @@
-from fastapi import FastAPI, APIRouter, Request, status
+from fastapi import FastAPI, APIRouter, Request, Depends, Query
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
@@ -14,7 +15,23 @@ from pathlib import Path
 # Import routes
 from routes.patients import router as patients_router
 from routes.services import router as services_router
-from database import close_database, init_database
+from config import settings
+from database import close_database, configure_connection_pool, connect_database, init_database, pool_stats
+from indexes import index_report, manifest_hash
+from monitoring import health_monitor, start_health_monitoring, stop_health_monitoring
+from middleware.pipeline import RequestPipelineMiddleware
+from middleware.security import require_api_key
+from utils.command_monitor import command_monitor
+from utils.cache import cache, patient_cache
+from utils.prometheus import registry, CONTENT_TYPE
+from utils.rate_limit import RateLimiter
+from utils.bloom import known_documents
+from services.service_log_writer import service_log_writer
+from services.service_log_spool import service_log_spool
+from services.service_stats_rollup import ServiceStatsRollup
+from services.service_log_timeseries import TIMESERIES_ENABLED, TimeSeriesServiceLogStore
+from services.service_log_archive import archive_loop
+from services.day_snapshot import day_snapshot, DAY_SNAPSHOT_ENABLED, DAY_SNAPSHOT_REFRESH_SECONDS
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -29,9 +46,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Global variables for database
-client = None
-db = None
+async def refresh_document_filter(db):
+    """
+    Keep the filter in step with patients inserted outside this process
+    (other workers, import scripts): incremental syncs every few seconds,
+    and a periodic full rebuild that also resizes it
+    """
+    while True:
+        await asyncio.sleep(settings.document_filter_sync_seconds)
+        if time.time() - (known_documents.last_rebuild or 0) >= settings.document_filter_rebuild_seconds:
+            await known_documents.rebuild(db.patients)
+        else:
+            await known_documents.sync(db.patients)
+
+async def refresh_day_snapshot(db):
+    """Periodically apply patients changed since the last snapshot load"""
+    while True:
+        await asyncio.sleep(DAY_SNAPSHOT_REFRESH_SECONDS)
+        await day_snapshot.refresh(db.patients)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -39,15 +71,51 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting Hospital Totem API...")
     
+    # Connect with the configured pool and open minPoolSize connections up front
+    db = connect_database()
+    await configure_connection_pool()
+    
     # Initialize database with indexes
     await init_database()
     
+    # Build the negative lookup filter before serving kiosk scans
+    await known_documents.rebuild(db.patients)
+    background_tasks = [asyncio.create_task(refresh_document_filter(db))]
+    
+    # Load today's turnos into memory when day snapshot mode is enabled
+    if DAY_SNAPSHOT_ENABLED:
+        await day_snapshot.load(db.patients)
+        background_tasks.append(asyncio.create_task(refresh_day_snapshot(db)))
+    
+    # Backfill the stats rollups the first time they are deployed
+    await ServiceStatsRollup(db).ensure_backfilled()
+    
+    # Batch service log inserts behind a bounded queue, spooling to disk
+    # while MongoDB is unreachable
+    service_logs = TimeSeriesServiceLogStore(db) if TIMESERIES_ENABLED else db.service_logs
+    service_log_spool.start(service_logs)
+    service_log_writer.start(service_logs)
+    
+    # Move service logs past the retention window to the Parquet archive
+    if settings.service_logs_archive_enabled:
+        background_tasks.append(asyncio.create_task(archive_loop(db)))
+    
+    # System sampler and periodic health checks (settings.enable_metrics)
+    health_task = start_health_monitoring()
+    if health_task:
+        background_tasks.append(health_task)
+    
     logger.info("✅ Hospital Totem API started successfully")
     
     yield
     
     # Shutdown
     logger.info("📴 Shutting down Hospital Totem API...")
+    for task in background_tasks:
+        task.cancel()
+    stop_health_monitoring()
+    await service_log_writer.stop()
+    await service_log_spool.stop()
     await close_database()
     logger.info("✅ Hospital Totem API shutdown complete")
 
@@ -68,44 +136,10 @@ app.add_middleware(
     allowed_hosts=["*"]  # In production, specify actual hosts
 )
 
-# Request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add processing time to response headers"""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(f"{process_time:.4f}")
-    return response
-
-# Rate limiting middleware (simple implementation)
-request_counts = {}
-
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    """Simple rate limiting"""
-    client_ip = request.client.host
-    current_time = time.time()
-    
-    # Clean old entries (older than 1 minute)
-    request_counts[client_ip] = [
-        req_time for req_time in request_counts.get(client_ip, [])
-        if current_time - req_time < 60
-    ]
-    
-    # Check rate limit (max 100 requests per minute)
-    if len(request_counts.get(client_ip, [])) >= 100:
-        from fastapi import HTTPException
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded"
-        )
-    
-    # Add current request
-    request_counts.setdefault(client_ip, []).append(current_time)
-    
-    response = await call_next(request)
-    return response
+# Timing, security headers, rate limiting (GCRA token buckets per route budget
+# and client IP) and metrics in a single pure ASGI middleware
+rate_limiter = RateLimiter()
+app.add_middleware(RequestPipelineMiddleware, rate_limiter=rate_limiter)
 
 # Create a router with the /api prefix for health checks
 api_router = APIRouter(prefix="/api")
@@ -124,15 +158,9 @@ async def root():
 @api_router.get("/health")
 async def health_check():
     """Comprehensive health check"""
-    try:
-        # Test database connection
-        from database import get_database
-        db = await get_database()
-        await db.command("ping")
-        db_status = "healthy"
-    except Exception as e:
-        logger.error(f"Database health check failed: {e}")
-        db_status = "unhealthy"
+    # Test database connection
+    from database import is_database_healthy
+    db_status = "healthy" if await is_database_healthy() else "unhealthy"
     
     return {
         "status": "healthy" if db_status == "healthy" else "degraded",
@@ -143,12 +171,105 @@ async def health_check():
         "uptime": time.time()
     }
 
+@api_router.get("/health/detailed")
+async def detailed_health_check():
+    """System, database and API health from the health monitor"""
+    return await health_monitor.get_comprehensive_health()
+
+# Gauges filled from component counters right before each scrape
+cache_lookups_total = registry.counter("cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+cache_hit_ratio = registry.gauge("cache_hit_ratio", "Lifetime cache hit ratio", ("cache",))
+cache_entries = registry.gauge("cache_entries", "Entries currently held in a cache", ("cache",))
+rate_limit_rejections_total = registry.counter(
+    "rate_limit_rejections_total", "Requests rejected with 429 by rate limit budget", ("budget",)
+)
+mongo_pool_connections = registry.gauge("mongo_pool_connections", "Open MongoDB pool connections")
+mongo_pool_checked_out = registry.gauge("mongo_pool_checked_out", "MongoDB connections currently checked out")
+mongo_pool_waiting = registry.gauge("mongo_pool_waiting", "Operations waiting to check out a MongoDB connection")
+mongo_pool_connections_created_total = registry.counter(
+    "mongo_pool_connections_created_total", "MongoDB connections created by the pool"
+)
+service_log_queue_depth = registry.gauge("service_log_queue_depth", "Service logs waiting in the write-behind queue")
+service_log_spool_depth = registry.gauge("service_log_spool_depth", "Service logs spooled to disk awaiting replay")
+service_log_spool_replayed_total = registry.counter(
+    "service_log_spool_replayed_total", "Spooled service logs replayed into MongoDB"
+)
+service_log_spool_replay_rate = registry.gauge(
+    "service_log_spool_replay_rate", "Records per second of the last spool replay"
+)
+patient_filter_false_positive_rate = registry.gauge(
+    "patient_filter_false_positive_rate", "Documento filter false positive rate", ("kind",)
+)
+patient_filter_memory_bytes = registry.gauge("patient_filter_memory_bytes", "Memory held by the documento filter bits")
+
+def collect_component_metrics():
+    for name, component in (("patient", patient_cache), ("default", cache), ("day_snapshot", day_snapshot)):
+        lookups = component.hits + component.misses
+        cache_lookups_total.labels(name, "hit").set(component.hits)
+        cache_lookups_total.labels(name, "miss").set(component.misses)
+        cache_hit_ratio.labels(name).set(round(component.hits / lookups, 4) if lookups else 0.0)
+    cache_entries.labels("patient").set(len(patient_cache.cache))
+    cache_entries.labels("default").set(len(cache.cache))
+    cache_entries.labels("day_snapshot").set(len(day_snapshot.records))
+    
+    for prefix, limiter in rate_limiter.routes:
+        rate_limit_rejections_total.labels(prefix).set(limiter.rejected)
+    rate_limit_rejections_total.labels("default").set(rate_limiter.default.rejected)
+    
+    mongo_pool_connections.set(pool_stats.open)
+    mongo_pool_checked_out.set(pool_stats.checked_out)
+    mongo_pool_waiting.set(pool_stats.waiting)
+    mongo_pool_connections_created_total.set(pool_stats.created)
+    
+    service_log_queue_depth.set(service_log_writer.queue.qsize() if service_log_writer.queue else 0)
+    service_log_spool_depth.set(service_log_spool.depth)
+    service_log_spool_replayed_total.set(service_log_spool.replayed)
+    service_log_spool_replay_rate.set(round(service_log_spool.last_replay_rate, 2))
+    
+    filter_stats = known_documents.stats()
+    if filter_stats["ready"]:
+        patient_filter_false_positive_rate.labels("estimated").set(filter_stats["estimated_false_positive_rate"])
+        patient_filter_false_positive_rate.labels("observed").set(filter_stats["observed_false_positive_rate"])
+        patient_filter_memory_bytes.set(known_documents.filter.memory_bytes())
+
+registry.register_collector(collect_component_metrics)
+
 @api_router.get("/metrics")
 async def get_metrics():
-    """Basic metrics endpoint"""
+    """Prometheus text exposition of request, cache, filter, pool, rate limit and spool metrics"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+@api_router.get("/metrics/summary")
+async def get_metrics_summary():
+    """Component statistics as JSON"""
+    return {
+        "api": health_monitor.get_api_metrics(),
+        "database_pool": pool_stats.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "patient_cache": patient_cache.stats(),
+        "patient_filter": known_documents.stats(),
+        "day_snapshot": day_snapshot.stats(),
+        "service_log_writer": service_log_writer.stats(),
+        "service_log_spool": service_log_spool.stats(),
+        "timestamp": time.time()
+    }
+
+@api_router.get("/admin/slow-queries", dependencies=[Depends(require_api_key)])
+async def get_slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Recent MongoDB commands over settings.slow_query_threshold_ms (filters redacted)"""
+    return {
+        "commands": command_monitor.stats(),
+        "slow_queries": command_monitor.get_slow_queries(limit),
+        "timestamp": time.time()
+    }
+
+@api_router.get("/admin/indexes", dependencies=[Depends(require_api_key)])
+async def get_index_report():
+    """Index usage ($indexStats), drift against the manifest, unused and redundant indexes"""
+    from database import get_database
     return {
-        "requests_per_minute": {ip: len(times) for ip, times in request_counts.items()},
-        "active_connections": len(request_counts),
+        "manifest_hash": manifest_hash(),
+        "collections": await index_report(await get_database()),
         "timestamp": time.time()
     }
 
@@ -0,0 +1,196 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from pydantic import ValidationError
+from models.patient import PatientCreate
+from utils.cache import patient_cache
+from utils.bloom import known_documents
+from utils.validation import validate_documento, normalize_documento
+from services.day_snapshot import day_snapshot
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+from datetime import datetime
+import asyncio
+import csv
+import json
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows validated and written per bulk_write
+IMPORT_CHUNK_SIZE = 2000
+# Per-row errors returned in the report (the total is always counted)
+MAX_REPORTED_ERRORS = 1000
+
+# Flat CSV columns; NDJSON rows may use the same flat keys or a nested "turno"
+PATIENT_FIELDS = ("documento", "nombre", "apellido")
+TURNO_FIELDS = ("medico", "hora", "piso", "fecha", "especialidad", "consultorio")
+
+def iter_agenda_rows(stream: TextIO, format: str) -> Iterator[Tuple[int, object]]:
+    """(row number, raw row) from a CSV (with header) or NDJSON text stream"""
+    if format == "csv":
+        # Data rows start on line 2, after the header
+        for number, row in enumerate(csv.DictReader(stream), start=2):
+            yield number, row
+        return
+
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+def parse_agenda_row(row: object) -> Dict:
+    """Validate one agenda row into patient fields; raises ValueError with the reason"""
+    if isinstance(row, Exception):
+        raise ValueError(f"JSON inválido: {row}")
+    if not isinstance(row, dict):
+        raise ValueError("La fila debe ser un objeto")
+
+    turno = row.get("turno")
+    if not isinstance(turno, dict):
+        turno = {field: row.get(field) for field in TURNO_FIELDS}
+    data = {field: row.get(field) for field in PATIENT_FIELDS}
+    # Empty CSV cells are missing optional values
+    data["turno"] = {key: value for key, value in turno.items() if value not in (None, "")}
+
+    if not validate_documento(str(data["documento"] or "")):
+        raise ValueError("Número de documento inválido")
+    data["documento"] = normalize_documento(str(data["documento"]))
+
+    try:
+        patient = PatientCreate(**data)
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+        ))
+    return patient.model_dump()
+
+class AgendaImporter:
+    """
+    Loads an agenda as unordered bulk upserts keyed on documento.
+
+    Rows are parsed and validated in chunks in a worker thread while the
+    previous chunk is being written, invalid rows and write errors are
+    reported per row and never abort the import.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.collection = db.patients
+        self.chunk_size = chunk_size
+
+    def _prepare_chunk(self, rows: Iterator[Tuple[int, object]]) -> Tuple[List[Tuple[int, Dict]], List[Dict], bool]:
+        """Read and validate the next chunk: (valid rows, errors, exhausted)"""
+        chunk = list(islice(rows, self.chunk_size))
+        valid: Dict[str, Tuple[int, Dict]] = {}
+        errors = []
+        for number, row in chunk:
+            try:
+                patient = parse_agenda_row(row)
+            except ValueError as e:
+                errors.append({"row": number, "error": str(e)})
+                continue
+            if patient["documento"] in valid:
+                errors.append({
+                    "row": valid[patient["documento"]][0],
+                    "documento": patient["documento"],
+                    "error": f"Documento repetido, se usa la fila {number}"
+                })
+            valid[patient["documento"]] = (number, patient)
+        return list(valid.values()), errors, len(chunk) < self.chunk_size
+
+    async def _write_chunk(self, patients: List[Tuple[int, Dict]]) -> Tuple[Dict[str, int], List[Dict]]:
+        """Upsert one validated chunk"""
+        if not patients:
+            return {"inserted": 0, "updated": 0}, []
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"documento": patient["documento"]},
+                {
+                    # A new agenda replaces the turno (and its confirmation) and revives soft-deleted patients
+                    "$set": {
+                        "nombre": patient["nombre"],
+                        "apellido": patient["apellido"],
+                        "turno": patient["turno"],
+                        "updated_at": now,
+                        "deleted": False
+                    },
+                    "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}
+                },
+                upsert=True
+            )
+            for _, patient in patients
+        ]
+
+        errors = []
+        failed = set()
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                number, patient = patients[write_error["index"]]
+                failed.add(write_error["index"])
+                errors.append({"row": number, "documento": patient["documento"], "error": write_error.get("errmsg")})
+
+        for index, (_, patient) in enumerate(patients):
+            if index in failed:
+                continue
+            known_documents.add(patient["documento"])
+            patient_cache.delete(patient["documento"])
+            day_snapshot.discard(patient["documento"])
+            day_snapshot.apply(patient)
+
+        return {"inserted": details.get("nUpserted", 0), "updated": details.get("nMatched", 0)}, errors
+
+    async def import_rows(self, rows: Iterator[Tuple[int, object]]) -> Dict:
+        """Import every row, returning counts and per-row errors"""
+        start_time = time.perf_counter()
+        report = {"rows": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+
+        def record_errors(errors: List[Dict]):
+            report["failed"] += len(errors)
+            room = MAX_REPORTED_ERRORS - len(report["errors"])
+            if room > 0:
+                report["errors"].extend(errors[:room])
+
+        patients, errors, exhausted = await asyncio.to_thread(self._prepare_chunk, rows)
+        while True:
+            report["rows"] += len(patients) + len(errors)
+            record_errors(errors)
+            if exhausted:
+                counts, write_errors = await self._write_chunk(patients)
+                next_chunk: Optional[tuple] = None
+            else:
+                # Validate the next chunk while this one is written
+                (counts, write_errors), next_chunk = await asyncio.gather(
+                    self._write_chunk(patients),
+                    asyncio.to_thread(self._prepare_chunk, rows)
+                )
+            report["inserted"] += counts["inserted"]
+            report["updated"] += counts["updated"]
+            record_errors(write_errors)
+
+            if next_chunk is None:
+                break
+            patients, errors, exhausted = next_chunk
+
+        elapsed = time.perf_counter() - start_time
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["rows_per_second"] = round(report["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+        logger.info(
+            f"Agenda import: {report['rows']} rows, {report['inserted']} inserted, "
+            f"{report['updated']} updated, {report['failed']} failed in {elapsed:.2f}s"
+        )
+        return report
+
+    async def import_stream(self, stream: TextIO, format: str) -> Dict:
+        """Import a CSV or NDJSON agenda from a text stream"""
+        return await self.import_rows(iter_agenda_rows(stream, format))
@@ -0,0 +1,193 @@
+from models.patient import PatientResponse, Appointment
+from typing import Optional, Dict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import time
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Day snapshot mode is opt-in (settings.day_snapshot_*)
+DAY_SNAPSHOT_ENABLED = settings.day_snapshot_enabled
+DAY_SNAPSHOT_TIMEZONE = settings.day_snapshot_timezone
+DAY_SNAPSHOT_REFRESH_SECONDS = settings.day_snapshot_refresh_seconds
+
+# Refreshes re-read this far behind the updated_at watermark, for clock skew
+# between workers and updates committed out of updated_at order
+REFRESH_OVERLAP_SECONDS = 60
+
+SNAPSHOT_PROJECTION = {
+    "_id": 0,
+    "documento": 1,
+    "nombre": 1,
+    "apellido": 1,
+    "turno": 1,
+    "updated_at": 1
+}
+
+class PatientRecord:
+    """Compact in-memory record of a patient with a turno today"""
+
+    __slots__ = (
+        "documento", "nombre", "apellido", "medico", "hora", "piso", "fecha",
+        "especialidad", "consultorio", "confirmado", "fecha_confirmacion", "updated_at"
+    )
+
+    def __init__(self, doc: dict):
+        turno = doc.get("turno") or {}
+        self.documento = doc["documento"]
+        self.nombre = doc.get("nombre")
+        self.apellido = doc.get("apellido")
+        self.medico = turno.get("medico")
+        self.hora = turno.get("hora")
+        self.piso = turno.get("piso")
+        self.fecha = turno.get("fecha")
+        self.especialidad = turno.get("especialidad")
+        self.consultorio = turno.get("consultorio")
+        self.confirmado = turno.get("confirmado", False)
+        self.fecha_confirmacion = turno.get("fecha_confirmacion")
+        self.updated_at = doc.get("updated_at")
+
+    def to_response(self) -> PatientResponse:
+        """Build the response model without re-running validation"""
+        turno = Appointment.model_construct(
+            medico=self.medico,
+            hora=self.hora,
+            piso=self.piso,
+            fecha=self.fecha,
+            especialidad=self.especialidad,
+            consultorio=self.consultorio,
+            confirmado=self.confirmado,
+            fecha_confirmacion=self.fecha_confirmacion
+        )
+        return PatientResponse.model_construct(
+            documento=self.documento,
+            nombre=self.nombre,
+            apellido=self.apellido,
+            turno=turno
+        )
+
+class DaySnapshot:
+    """In-process index of today's turnos keyed by documento"""
+
+    def __init__(self, timezone: str = DAY_SNAPSHOT_TIMEZONE):
+        self.timezone = ZoneInfo(timezone)
+        self.records: Dict[str, PatientRecord] = {}
+        self.day: Optional[str] = None
+        # Highest updated_at seen so far, used for incremental refreshes
+        self.watermark: Optional[datetime] = None
+        self.last_refresh: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ready(self) -> bool:
+        """Whether the snapshot holds today's turnos"""
+        return self.day is not None and self.day == self.today()
+
+    def today(self) -> str:
+        """Today's date in turno.fecha format"""
+        return datetime.now(self.timezone).date().isoformat()
+
+    def _advance_watermark(self, updated_at: Optional[datetime]):
+        if updated_at and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+
+    def get(self, documento: str) -> Optional[PatientResponse]:
+        """Get a patient from the snapshot, None if not indexed"""
+        if not self.ready:
+            return None
+
+        record = self.records.get(documento)
+        if record is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return record.to_response()
+
+    async def load(self, collection):
+        """Load every patient whose turno is today"""
+        try:
+            start_time = time.time()
+            day = self.today()
+            records: Dict[str, PatientRecord] = {}
+            self.watermark = None
+
+            async for doc in collection.find({"turno.fecha": day}, SNAPSHOT_PROJECTION):
+                records[doc["documento"]] = PatientRecord(doc)
+                self._advance_watermark(doc.get("updated_at"))
+
+            self.records = records
+            self.day = day
+            self.last_refresh = time.time()
+            logger.info(
+                f"Day snapshot loaded for {day}: {len(records)} turnos in "
+                f"{(self.last_refresh - start_time) * 1000:.1f}ms"
+            )
+
+        except Exception as e:
+            logger.error(f"Error loading day snapshot: {e}")
+
+    async def refresh(self, collection):
+        """Pick up patients changed since the last load, or reload on a new day"""
+        if not self.ready or self.watermark is None:
+            await self.load(collection)
+            return
+
+        try:
+            day = self.day
+            changed = 0
+            since = self.watermark - timedelta(seconds=REFRESH_OVERLAP_SECONDS)
+
+            # Not filtered by fecha so turnos moved away from today are dropped too
+            async for doc in collection.find({"updated_at": {"$gte": since}}, SNAPSHOT_PROJECTION):
+                turno = doc.get("turno") or {}
+                self._advance_watermark(doc.get("updated_at"))
+                if turno.get("fecha") == day:
+                    record = self.records.get(doc["documento"])
+                    if record is not None and record.updated_at == doc.get("updated_at"):
+                        # Already seen, re-read by the overlap
+                        continue
+                    self.records[doc["documento"]] = PatientRecord(doc)
+                elif self.records.pop(doc["documento"], None) is None:
+                    continue
+                changed += 1
+
+            self.last_refresh = time.time()
+            if changed:
+                logger.info(f"Day snapshot refreshed: {changed} changed patients")
+
+        except Exception as e:
+            logger.error(f"Error refreshing day snapshot: {e}")
+
+    def apply(self, doc: dict):
+        """Write-through a patient document created or changed by the API"""
+        if not self.ready:
+            return
+        turno = doc.get("turno") or {}
+        if turno.get("fecha") == self.day:
+            self.records[doc["documento"]] = PatientRecord(doc)
+
+    def discard(self, documento: str):
+        """Drop a patient so lookups fall back to the database until the next refresh"""
+        self.records.pop(documento, None)
+
+    def stats(self) -> Dict:
+        """Get snapshot statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": DAY_SNAPSHOT_ENABLED,
+            "day": self.day,
+            "ready": self.ready,
+            "turnos": len(self.records),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "last_refresh": self.last_refresh
+        }
+
+# Global snapshot instance (only populated when DAY_SNAPSHOT_ENABLED)
+day_snapshot = DaySnapshot()
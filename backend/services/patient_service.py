@@ -1,11 +1,50 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pydantic import ValidationError
 from models.patient import Patient, PatientResponse, AppointmentConfirmation
-from typing import Optional, Tuple, List
+from utils.cache import patient_cache
+from utils.bloom import known_documents
+from services.day_snapshot import day_snapshot
+from typing import Dict, Optional, Tuple, List
 from datetime import datetime
+import base64
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Keyset pagination order, served by the (created_at, documento) index
+PAGINATION_SORT = [("created_at", 1), ("documento", 1)]
+
+def encode_cursor(patient: dict) -> str:
+    """Opaque cursor pointing just after a patient in PAGINATION_SORT order"""
+    created_at = patient.get("created_at")
+    payload = {
+        "c": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "d": patient["documento"]
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    """Filter for the patients after a cursor; raises ValueError if it is malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        documento = payload["d"]
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] is not None else None
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    
+    if created_at is None:
+        # Patients without created_at sort first
+        return {"$or": [
+            {"created_at": None, "documento": {"$gt": documento}},
+            {"created_at": {"$type": "date"}}
+        ]}
+    return {"$or": [
+        {"created_at": {"$gt": created_at}},
+        {"created_at": created_at, "documento": {"$gt": documento}}
+    ]}
+
 class PatientService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
@@ -16,6 +55,20 @@ class PatientService:
         Buscar paciente por número de documento con optimización de consulta
         """
         try:
+            # Today's turnos are served from the in-process day snapshot
+            snapshot_patient = day_snapshot.get(documento)
+            if snapshot_patient is not None:
+                return snapshot_patient
+            
+            # Serve repeated scans of the same DNI from the read-through cache
+            cached_patient = patient_cache.get(documento)
+            if cached_patient is not None:
+                return cached_patient
+            
+            # Unknown documentos are answered without a database round-trip
+            if not known_documents.might_contain(documento):
+                return None
+            
             # Use index on documento field for faster lookup
             patient_data = await self.collection.find_one(
                 {"documento": documento},
@@ -23,53 +76,93 @@ class PatientService:
             )
             
             if patient_data:
-                return PatientResponse(**patient_data)
+                patient = PatientResponse(**patient_data)
+                patient_cache.set(documento, patient)
+                return patient
+            
+            known_documents.record_false_positive(documento)
             return None
             
         except Exception as e:
             logger.error(f"Error finding patient by document {documento}: {str(e)}")
             return None
 
-    async def confirm_appointment(self, documento: str) -> bool:
+    async def find_many_by_document(self, documentos: List[str]) -> Dict[str, Optional[PatientResponse]]:
+        """
+        Buscar varios pacientes por documento: snapshot del día y caché primero,
+        el resto con una única consulta $in
+        """
+        results: Dict[str, Optional[PatientResponse]] = {}
+        pending = []
+        for documento in dict.fromkeys(documentos):
+            patient = day_snapshot.get(documento) or patient_cache.get(documento)
+            if patient is not None:
+                results[documento] = patient
+            elif known_documents.might_contain(documento):
+                pending.append(documento)
+            else:
+                results[documento] = None
+        
+        if pending:
+            cursor = self.collection.find({"documento": {"$in": pending}}, {"_id": 0})
+            async for patient_data in cursor:
+                documento = patient_data.get("documento")
+                try:
+                    patient = PatientResponse(**patient_data)
+                except ValidationError as e:
+                    # Same answer as find_by_document: not found / no appointment
+                    logger.error(f"Invalid patient record for document {documento}: {e}")
+                    results[documento] = None
+                    continue
+                patient_cache.set(patient.documento, patient)
+                results[patient.documento] = patient
+            
+            for documento in pending:
+                if documento not in results:
+                    results[documento] = None
+                    known_documents.record_false_positive(documento)
+        
+        return results
+
+    async def confirm_appointment(self, documento: str) -> Optional[PatientResponse]:
         """
-        Confirmar turno de un paciente con validación adicional
+        Confirmar turno de un paciente en una sola operación atómica
         """
         try:
-            # First check if patient exists and has an appointment
-            existing_patient = await self.collection.find_one(
+            # Conditional update in one round-trip: only patients with an appointment match
+            confirmed_at = datetime.utcnow()
+            patient_data = await self.collection.find_one_and_update(
                 {
                     "documento": documento,
                     "turno.medico": {"$exists": True, "$ne": None}
-                }
-            )
-            
-            if not existing_patient:
-                logger.warning(f"Cannot confirm appointment - patient not found or no appointment: {documento}")
-                return False
-            
-            # Update the appointment confirmation
-            result = await self.collection.update_one(
-                {"documento": documento},
+                },
                 {
                     "$set": {
                         "turno.confirmado": True,
-                        "turno.fecha_confirmacion": datetime.utcnow(),
-                        "updated_at": datetime.utcnow()
+                        "turno.fecha_confirmacion": confirmed_at,
+                        "updated_at": confirmed_at
                     }
-                }
+                },
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
             )
             
-            success = result.modified_count > 0
-            if success:
-                logger.info(f"Appointment confirmed successfully for document: {documento}")
-            else:
-                logger.warning(f"No appointment was modified for document: {documento}")
-                
-            return success
+            if not patient_data:
+                patient_cache.delete(documento)
+                logger.warning(f"Cannot confirm appointment - patient not found or no appointment: {documento}")
+                return None
+            
+            # Refresh read paths with the post-image instead of evicting
+            patient = PatientResponse(**patient_data)
+            patient_cache.set(documento, patient)
+            day_snapshot.apply(patient_data)
+            
+            logger.info(f"Appointment confirmed successfully for document: {documento}")
+            return patient
             
         except Exception as e:
             logger.error(f"Error confirming appointment for document {documento}: {str(e)}")
-            return False
+            return None
 
     async def create_patient(self, patient_data: dict) -> Optional[Patient]:
         """
@@ -86,6 +179,8 @@ class PatientService:
             
             # Insert with error handling for unique constraint
             await self.collection.insert_one(patient.dict())
+            known_documents.add(patient.documento)
+            day_snapshot.apply(patient.dict())
             logger.info(f"Patient created successfully: {patient.documento}")
             return patient
             
@@ -95,17 +190,17 @@ class PatientService:
 
     async def get_all_patients_paginated(self, skip: int = 0, limit: int = 50) -> Tuple[List[dict], int]:
         """
-        Obtener todos los pacientes con paginación optimizada
+        Obtener todos los pacientes con paginación por página (skip/limit)
         """
         try:
-            # Get total count efficiently
-            total = await self.collection.count_documents({})
+            # Unfiltered total comes from collection metadata instead of counting every document
+            total = await self.count_patients()
             
             # Get paginated results with projection to exclude _id
             patients = await self.collection.find(
                 {},
                 {"_id": 0}
-            ).skip(skip).limit(limit).to_list(length=limit)
+            ).sort(PAGINATION_SORT).skip(skip).limit(limit).to_list(length=limit)
             
             return patients, total
             
@@ -113,6 +208,32 @@ class PatientService:
             logger.error(f"Error getting paginated patients: {str(e)}")
             return [], 0
 
+    async def get_patients_after_cursor(self, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str]]:
+        """
+        Obtener pacientes con paginación por cursor (keyset): cada página es un
+        rango del índice (created_at, documento), sin importar la profundidad.
+        Devuelve los pacientes y el cursor de la página siguiente (None al final).
+        Lanza ValueError si el cursor es inválido.
+        """
+        query = decode_cursor(cursor) if cursor else {}
+        
+        # One extra document tells whether there is a next page
+        patients = await self.collection.find(
+            query,
+            {"_id": 0}
+        ).sort(PAGINATION_SORT).limit(limit + 1).to_list(length=limit + 1)
+        
+        if len(patients) <= limit:
+            return patients, None
+        patients = patients[:limit]
+        return patients, encode_cursor(patients[-1])
+
+    async def count_patients(self) -> int:
+        """
+        Total aproximado de pacientes desde los metadatos de la colección
+        """
+        return await self.collection.estimated_document_count()
+
     async def get_all_patients(self) -> list:
         """
         Obtener todos los pacientes (legacy method - consider using paginated version)
@@ -134,7 +255,7 @@ class PatientService:
         Obtener turnos confirmados con optimización de consulta
         """
         try:
-            # Use compound index on documento and turno.confirmado
+            # Served by the turno.confirmado index
             confirmed = await self.collection.find(
                 {"turno.confirmado": True},
                 {"_id": 0}
@@ -180,6 +301,9 @@ class PatientService:
                 {"$set": update_data}
             )
             
+            patient_cache.delete(documento)
+            day_snapshot.discard(documento)
+            
             success = result.modified_count > 0
             if success:
                 logger.info(f"Patient updated successfully: {documento}")
@@ -207,6 +331,8 @@ class PatientService:
                 }
             )
             
+            patient_cache.delete(documento)
+            
             success = result.modified_count > 0
             if success:
                 logger.info(f"Patient soft deleted: {documento}")
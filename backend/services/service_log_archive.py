@@ -0,0 +1,252 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pathlib import Path
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+import asyncio
+import os
+import socket
+import time
+import uuid
+import logging
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import dataset as ds
+
+from config import settings
+from services.service_log_timeseries import (
+    TIMESERIES_ENABLED, SERVICE_EVENTS_COLLECTION, SERVICE_STATE_COLLECTION, LATEST_VERSION_STAGES
+)
+from services.service_stats_rollup import ROLLUP_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# Archived days, one document per UTC day ({_id: "YYYY-MM-DD", rows, archived_at})
+ARCHIVE_MARKERS_COLLECTION = "service_logs_archive"
+ARCHIVE_INTERVAL_SECONDS = 6 * 3600
+
+# Lease in the migrations collection: one process archives and deletes at a
+# time ({_id, owner, expires_at}); a dead holder's lease lapses
+ARCHIVE_LEASE_ID = "service_logs_archive_lease"
+ARCHIVE_LEASE_SECONDS = 2 * ARCHIVE_INTERVAL_SECONDS
+ARCHIVE_COMPRESSION = "zstd"
+
+# Hive layout dia=YYYY-MM-DD/secretaria=xx/part-0.parquet: readers skip whole
+# files on date and secretaria, and row groups on the timestamp statistics
+ARCHIVE_PARTITIONING = ds.partitioning(
+    pa.schema([("dia", pa.string()), ("secretaria", pa.string())]),
+    flavor="hive"
+)
+ARCHIVE_COLUMNS = ["id", "documento", "piso", "estado", "timestamp", "created_at", "updated_at", "deleted"]
+
+class ServiceLogArchive:
+    """Date-partitioned, zstd-compressed Parquet files of service logs past retention"""
+
+    def __init__(self, directory: str = settings.service_logs_archive_dir):
+        self.directory = Path(directory)
+
+    def _partition_path(self, dia: str, secretaria: str) -> Path:
+        return self.directory / f"dia={dia}" / f"secretaria={secretaria}" / "part-0.parquet"
+
+    def write_day(self, dia: str, services: List[dict]) -> int:
+        """
+        Write one day of services, merged with what an earlier (interrupted)
+        run already archived; the latest version of each id wins.
+        """
+        frame = pd.DataFrame(services)
+        for column in ARCHIVE_COLUMNS:
+            if column not in frame:
+                frame[column] = None
+        frame["updated_at"] = frame["updated_at"].fillna(frame["timestamp"])
+        frame["deleted"] = frame["deleted"].eq(True)
+
+        rows = 0
+        for secretaria, group in frame.groupby("secretaria"):
+            path = self._partition_path(dia, secretaria)
+            group = group[ARCHIVE_COLUMNS]
+            if path.exists():
+                group = pd.concat([pd.read_parquet(path), group], ignore_index=True)
+            group = group.sort_values("updated_at").drop_duplicates("id", keep="last").sort_values("timestamp")
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+            group.to_parquet(tmp_path, engine="pyarrow", compression=ARCHIVE_COMPRESSION, index=False)
+            os.replace(tmp_path, path)
+            rows += len(group)
+        return rows
+
+    def read_counts(self, start_dia: str, end_dia: str, secretaria: Optional[str] = None) -> pd.DataFrame:
+        """Non-deleted services per dia/secretaria/estado, reading only matching partitions"""
+        if not self.directory.exists():
+            return pd.DataFrame(columns=["dia", "secretaria", "estado", "count"])
+
+        filters = [("dia", ">=", start_dia), ("dia", "<=", end_dia), ("deleted", "==", False)]
+        if secretaria:
+            filters.append(("secretaria", "==", secretaria))
+        frame = pd.read_parquet(
+            self.directory,
+            engine="pyarrow",
+            columns=["dia", "secretaria", "estado"],
+            filters=filters,
+            partitioning=ARCHIVE_PARTITIONING
+        )
+        return frame.groupby(["dia", "secretaria", "estado"], observed=True).size().reset_index(name="count")
+
+async def archived_until(db: AsyncIOMotorDatabase) -> Optional[str]:
+    """Last archived day, if any"""
+    markers = await db[ARCHIVE_MARKERS_COLLECTION].find({}, {"_id": 1}).sort("_id", -1).limit(1).to_list(length=1)
+    return markers[0]["_id"] if markers else None
+
+async def archive_expired_logs(
+    db: AsyncIOMotorDatabase,
+    archive: Optional[ServiceLogArchive] = None,
+    now: Optional[datetime] = None
+) -> Dict:
+    """
+    Archive every whole UTC day older than the retention window, oldest first.
+
+    A day is deleted from MongoDB only after its marker is written; with
+    archiving there is no TTL, so this is the only deletion of live logs.
+    In time-series storage the day's versions are deleted from service_events
+    (deletes by timestamp need MongoDB 7.0) and its services from service_state.
+    """
+    archive = archive or ServiceLogArchive()
+    now = now or datetime.utcnow()
+    start_time = time.time()
+    if TIMESERIES_ENABLED:
+        source, stages = db[SERVICE_EVENTS_COLLECTION], LATEST_VERSION_STAGES
+    else:
+        source, stages = db.service_logs, []
+    markers = db[ARCHIVE_MARKERS_COLLECTION]
+    cutoff = datetime.combine((now - timedelta(days=settings.service_logs_retention_days)).date(), datetime.min.time())
+
+    oldest = await source.find({"timestamp": {"$lt": cutoff}}, {"_id": 0, "timestamp": 1}).sort("timestamp", 1).limit(1).to_list(length=1)
+    report = {"days": 0, "rows": 0, "deleted": 0}
+    if not oldest:
+        return report
+
+    day = datetime.combine(oldest[0]["timestamp"].date(), datetime.min.time())
+    while day < cutoff:
+        dia, next_day = day.strftime("%Y-%m-%d"), day + timedelta(days=1)
+        day_filter = {"timestamp": {"$gte": day, "$lt": next_day}}
+
+        services = await source.aggregate(
+            [{"$match": day_filter}, *stages, {"$project": {"_id": 0}}],
+            allowDiskUse=True
+        ).to_list(length=None)
+        if services:
+            rows = await asyncio.to_thread(archive.write_day, dia, services)
+            await markers.update_one(
+                {"_id": dia},
+                {"$set": {"rows": rows, "archived_at": datetime.utcnow()}},
+                upsert=True
+            )
+            report["days"] += 1
+            report["rows"] += len(services)
+            try:
+                result = await source.delete_many(day_filter)
+                if TIMESERIES_ENABLED:
+                    await db[SERVICE_STATE_COLLECTION].delete_many(day_filter)
+            except OperationFailure as e:
+                # Archived and marked: the next run archives the day again and retries
+                logger.error(f"Error deleting archived service logs of {dia} from {source.name}: {e}")
+                break
+            report["deleted"] += result.deleted_count
+        day = next_day
+
+    logger.info(
+        f"Archived {report['rows']} service logs from {report['days']} days "
+        f"({report['deleted']} deleted from MongoDB) in {time.time() - start_time:.2f}s"
+    )
+    return report
+
+def archive_owner() -> str:
+    """Lease owner id of this process"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+async def acquire_archive_lease(db: AsyncIOMotorDatabase, owner: str, now: Optional[datetime] = None) -> bool:
+    """Take or renew the archive lease; False while another process holds it"""
+    now = now or datetime.utcnow()
+    try:
+        await db.migrations.update_one(
+            {"_id": ARCHIVE_LEASE_ID, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ARCHIVE_LEASE_SECONDS)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The lease exists and is held by someone else
+        return False
+
+async def release_archive_lease(db: AsyncIOMotorDatabase, owner: str):
+    """Give up the archive lease if this owner holds it"""
+    await db.migrations.delete_many({"_id": ARCHIVE_LEASE_ID, "owner": owner})
+
+async def archive_loop(db: AsyncIOMotorDatabase):
+    """Periodically archive service logs past the retention window, in one process only"""
+    owner = archive_owner()
+    try:
+        while True:
+            try:
+                if await acquire_archive_lease(db, owner):
+                    await archive_expired_logs(db)
+            except Exception as e:
+                logger.error(f"Error archiving service logs: {e}")
+            await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+    finally:
+        try:
+            await release_archive_lease(db, owner)
+        except Exception as e:
+            # The lease lapses after ARCHIVE_LEASE_SECONDS anyway
+            logger.warning(f"Error releasing the service logs archive lease: {e}")
+
+async def get_historical_stats(
+    db: AsyncIOMotorDatabase,
+    start: date,
+    end: date,
+    secretaria: Optional[str] = None,
+    archive: Optional[ServiceLogArchive] = None
+) -> Dict:
+    """
+    get_service_stats-style totals for any date range: archived days are
+    scanned from Parquet, later days are read from the service_stats_daily rollups
+    """
+    archive = archive or ServiceLogArchive()
+    start_dia, end_dia = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    last_archived = await archived_until(db)
+
+    rows = []
+    if last_archived and start_dia <= last_archived:
+        counts = await asyncio.to_thread(archive.read_counts, start_dia, min(end_dia, last_archived), secretaria)
+        rows.extend(counts.to_dict("records"))
+
+    live_start = start_dia
+    if last_archived:
+        live_start = max(start_dia, (date.fromisoformat(last_archived) + timedelta(days=1)).strftime("%Y-%m-%d"))
+    if live_start <= end_dia:
+        query = {"dia": {"$gte": live_start, "$lte": end_dia}, "count": {"$gt": 0}}
+        if secretaria:
+            query["secretaria"] = secretaria
+        rows.extend(await db[ROLLUP_COLLECTION].find(
+            query, {"_id": 0, "dia": 1, "secretaria": 1, "estado": 1, "count": 1}
+        ).to_list(length=None))
+
+    total = 0
+    por_secretaria: Dict[str, int] = {}
+    por_estado: Dict[str, int] = {}
+    por_dia: Dict[str, int] = {}
+    for row in rows:
+        count = int(row["count"])
+        total += count
+        por_secretaria[row["secretaria"]] = por_secretaria.get(row["secretaria"], 0) + count
+        por_estado[row["estado"]] = por_estado.get(row["estado"], 0) + count
+        por_dia[row["dia"]] = por_dia.get(row["dia"], 0) + count
+
+    return {
+        "total_gestiones": total,
+        "por_secretaria": por_secretaria,
+        "por_estado": por_estado,
+        "por_dia": dict(sorted(por_dia.items())),
+        "archived_until": last_archived
+    }
@@ -1,102 +1,107 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.service import ServiceLog, ServiceLogCreate, ServiceStats
-from typing import Optional, Dict, List
-from datetime import datetime, timedelta
+from services.service_log_writer import (
+    OUTCOME_COMMITTED, OUTCOME_QUEUED, OUTCOME_SPOOLED, ServiceLogQueueFull, service_log_writer
+)
+from services.service_log_spool import service_log_spool
+from services.service_stats_rollup import ServiceStatsRollup, rollup_key
+from services.service_log_timeseries import (
+    TIMESERIES_ENABLED, TimeSeriesServiceLogStore, event_version, latest_versions
+)
+from utils.cache import cached
+from pymongo import ReturnDocument
+from pymongo.errors import ConnectionFailure
+from typing import AsyncIterator, Optional, Dict, List, Tuple
+from datetime import datetime
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Reception dashboards poll stats constantly: serve fresh for STATS_CACHE_TTL seconds,
+# then stale for up to STATS_STALE_TTL more while one refresh runs in the background
+STATS_CACHE_TTL = 10
+STATS_STALE_TTL = 60
+
+# Documents fetched per round trip when streaming exports
+EXPORT_BATCH_SIZE = 1000
+
 class ServiceLogService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.collection = db.service_logs
+        self.rollup = ServiceStatsRollup(db)
 
-    async def log_service_request(self, log_data: ServiceLogCreate) -> Optional[ServiceLog]:
+    async def log_service_request(self, log_data: ServiceLogCreate, wait_for_commit: bool = False) -> Optional[Tuple[ServiceLog, str]]:
         """
         Registrar una solicitud de servicio con validación mejorada
+        
+        Con el writer en ejecución el log se encola y se inserta por lotes;
+        wait_for_commit espera a que el lote quede escrito.
+        Devuelve el log y dónde quedó (OUTCOME_QUEUED, OUTCOME_COMMITTED u
+        OUTCOME_SPOOLED). Con la cola llena lanza ServiceLogQueueFull.
         """
         try:
             service_log = ServiceLog(**log_data.dict())
             
-            # Insert with duplicate detection (if needed)
-            await self.collection.insert_one(service_log.dict())
-            logger.info(f"Service request logged: {service_log.documento} -> {service_log.secretaria}")
-            return service_log
+            if service_log_writer.running:
+                commit = await service_log_writer.enqueue(service_log.dict())
+                outcome = await commit if wait_for_commit else OUTCOME_QUEUED
+            else:
+                document = service_log.dict()
+                try:
+                    await self.collection.insert_one(document)
+                    await self.rollup.record_inserted([document])
+                    outcome = OUTCOME_COMMITTED
+                except ConnectionFailure as e:
+                    # Keep the request on disk until the database is back
+                    if not service_log_spool.running:
+                        raise
+                    logger.warning(f"Database unreachable, spooling service request: {e}")
+                    service_log_spool.database_unavailable = True
+                    await service_log_spool.append([document])
+                    outcome = OUTCOME_SPOOLED
+            logger.info(f"Service request logged: {service_log.documento} -> {service_log.secretaria} ({outcome})")
+            return service_log, outcome
             
+        except ServiceLogQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Error logging service request: {str(e)}")
             return None
 
+    async def _find_services(self, query: Dict, limit: int, projection: Optional[Dict] = None) -> List[Dict]:
+        """Active services matching query, newest first"""
+        return await self.collection.find(
+            {**query, "deleted": False},
+            projection or {"_id": 0}  # Exclude MongoDB _id
+        ).sort("timestamp", -1).limit(limit).to_list(length=limit)
+
+    @cached(ttl=STATS_CACHE_TTL, stale_ttl=STATS_STALE_TTL, key_func=lambda self, days=7: f"days:{days}")
     async def get_service_stats(self, days: int = 7) -> ServiceStats:
         """
-        Obtener estadísticas de servicios optimizadas con agregaciones
+        Obtener estadísticas de servicios desde los contadores materializados
+        
+        Los totales salen de service_stats_daily (días calendario UTC completos),
+        solo las gestiones recientes se leen de service_logs.
+        Los errores de la base de datos se propagan.
         """
         try:
-            # Calculate date range
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
+            total_gestiones, por_secretaria, por_dia = await self.rollup.get_totals(days)
             
-            # Get total count efficiently
-            total_gestiones = await self.collection.count_documents({
-                "timestamp": {"$gte": start_date},
-                "deleted": {"$ne": True}  # Exclude soft deleted
-            })
-            
-            # Aggregation pipeline for statistics
-            pipeline = [
-                {
-                    "$match": {
-                        "timestamp": {"$gte": start_date},
-                        "deleted": {"$ne": True}
-                    }
-                },
-                {
-                    "$facet": {
-                        # Group by secretaria
-                        "por_secretaria": [
-                            {"$group": {"_id": "$secretaria", "count": {"$sum": 1}}}
-                        ],
-                        # Group by day
-                        "por_dia": [
-                            {
-                                "$group": {
-                                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
-                                    "count": {"$sum": 1}
-                                }
-                            },
-                            {"$sort": {"_id": 1}}
-                        ],
-                        # Get recent services
-                        "gestiones_recientes": [
-                            {"$sort": {"timestamp": -1}},
-                            {"$limit": 10},
-                            {
-                                "$project": {
-                                    "_id": 0,
-                                    "documento": 1,
-                                    "secretaria": 1,
-                                    "piso": 1,
-                                    "timestamp": 1,
-                                    "estado": 1
-                                }
-                            }
-                        ]
-                    }
+            # Get recent services using the timestamp index
+            gestiones_recientes = await self._find_services(
+                {},
+                limit=10,
+                projection={
+                    "_id": 0,
+                    "documento": 1,
+                    "secretaria": 1,
+                    "piso": 1,
+                    "timestamp": 1,
+                    "estado": 1
                 }
-            ]
-            
-            # Execute aggregation
-            result = await self.collection.aggregate(pipeline).to_list(length=1)
-            
-            if result:
-                stats_data = result[0]
-                por_secretaria = {item["_id"]: item["count"] for item in stats_data["por_secretaria"]}
-                por_dia = {item["_id"]: item["count"] for item in stats_data["por_dia"]}
-                gestiones_recientes = stats_data["gestiones_recientes"]
-            else:
-                por_secretaria = {}
-                por_dia = {}
-                gestiones_recientes = []
+            )
             
             return ServiceStats(
                 total_gestiones=total_gestiones,
@@ -106,42 +111,36 @@ class ServiceLogService:
             )
             
         except Exception as e:
+            # Raised, not zeroed: @cached must not store the failure, it keeps
+            # serving the previous stats while stale
             logger.error(f"Error getting service stats: {str(e)}")
-            return ServiceStats(
-                total_gestiones=0,
-                por_secretaria={},
-                por_dia={},
-                gestiones_recientes=[]
-            )
+            raise
 
     async def update_service_status(self, service_id: str, estado: str) -> bool:
         """
         Actualizar el estado de un servicio con validación
         """
         try:
-            # Validate that the service exists first
-            existing_service = await self.collection.find_one({"id": service_id, "deleted": {"$ne": True}})
-            if not existing_service:
-                logger.warning(f"Service not found for status update: {service_id}")
-                return False
-            
-            result = await self.collection.update_one(
-                {"id": service_id, "deleted": {"$ne": True}},
+            # Single round-trip; the pre-image tells the rollups which bucket to move
+            previous = await self.collection.find_one_and_update(
+                {"id": service_id, "deleted": False},
                 {
                     "$set": {
                         "estado": estado,
                         "updated_at": datetime.utcnow()
                     }
-                }
+                },
+                projection={"_id": 0, "timestamp": 1, "secretaria": 1, "estado": 1},
+                return_document=ReturnDocument.BEFORE
             )
             
-            success = result.modified_count > 0
-            if success:
-                logger.info(f"Service status updated: {service_id} -> {estado}")
-            else:
-                logger.warning(f"No service status was updated: {service_id}")
-                
-            return success
+            if not previous:
+                logger.warning(f"Service not found for status update: {service_id}")
+                return False
+            
+            await self.rollup.record_status_change(previous, estado)
+            logger.info(f"Service status updated: {service_id} -> {estado}")
+            return True
             
         except Exception as e:
             logger.error(f"Error updating service status: {str(e)}")
@@ -153,20 +152,14 @@ class ServiceLogService:
         """
         try:
             # Build query filters
-            query_filter = {"deleted": {"$ne": True}}
+            query_filter = {}
             
             if secretaria:
                 query_filter["secretaria"] = secretaria
             if estado:
                 query_filter["estado"] = estado
             
-            # Get services with pagination and sorting
-            services = await self.collection.find(
-                query_filter,
-                {"_id": 0}  # Exclude MongoDB _id
-            ).sort("timestamp", -1).limit(limit).to_list(length=limit)
-            
-            return services
+            return await self._find_services(query_filter, limit=limit)
             
         except Exception as e:
             logger.error(f"Error getting recent services: {str(e)}")
@@ -177,23 +170,25 @@ class ServiceLogService:
         Eliminar un servicio (soft delete)
         """
         try:
-            result = await self.collection.update_one(
-                {"id": service_id, "deleted": {"$ne": True}},
+            previous = await self.collection.find_one_and_update(
+                {"id": service_id, "deleted": False},
                 {
                     "$set": {
                         "deleted": True,
                         "deleted_at": datetime.utcnow()
                     }
-                }
+                },
+                projection={"_id": 0, "timestamp": 1, "secretaria": 1, "estado": 1},
+                return_document=ReturnDocument.BEFORE
             )
             
-            success = result.modified_count > 0
-            if success:
-                logger.info(f"Service soft deleted: {service_id}")
-            else:
+            if not previous:
                 logger.warning(f"No service was deleted: {service_id}")
-                
-            return success
+                return False
+            
+            await self.rollup.record_deleted(previous)
+            logger.info(f"Service soft deleted: {service_id}")
+            return True
             
         except Exception as e:
             logger.error(f"Error deleting service {service_id}: {str(e)}")
@@ -205,7 +200,7 @@ class ServiceLogService:
         """
         try:
             service = await self.collection.find_one(
-                {"id": service_id, "deleted": {"$ne": True}},
+                {"id": service_id, "deleted": False},
                 {"_id": 0}
             )
             return service
@@ -219,15 +214,7 @@ class ServiceLogService:
         Obtener todos los servicios de un paciente específico
         """
         try:
-            services = await self.collection.find(
-                {
-                    "documento": documento,
-                    "deleted": {"$ne": True}
-                },
-                {"_id": 0}
-            ).sort("timestamp", -1).to_list(length=100)
-            
-            return services
+            return await self._find_services({"documento": documento}, limit=100)
             
         except Exception as e:
             logger.error(f"Error getting services by document {documento}: {str(e)}")
@@ -238,23 +225,47 @@ class ServiceLogService:
         Obtener servicios en un rango de fechas
         """
         try:
-            services = await self.collection.find(
+            return await self._find_services(
                 {
                     "timestamp": {
                         "$gte": start_date,
                         "$lte": end_date
-                    },
-                    "deleted": {"$ne": True}
+                    }
                 },
-                {"_id": 0}
-            ).sort("timestamp", -1).to_list(length=1000)
-            
-            return services
+                limit=1000
+            )
             
         except Exception as e:
             logger.error(f"Error getting services by date range: {str(e)}")
             return []
 
+    async def iter_services(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        secretaria: Optional[str] = None,
+        estado: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Recorrer servicios en un rango de fechas, en orden cronológico, sin
+        límite de cantidad; el cursor trae EXPORT_BATCH_SIZE documentos por vez
+        """
+        query = {
+            "timestamp": {
+                "$gte": start_date,
+                "$lte": end_date
+            },
+            "deleted": False
+        }
+        if secretaria:
+            query["secretaria"] = secretaria
+        if estado:
+            query["estado"] = estado
+        
+        cursor = self.collection.find(query, {"_id": 0}).sort("timestamp", 1).batch_size(EXPORT_BATCH_SIZE)
+        async for service in cursor:
+            yield service
+
     async def get_pending_services_count(self) -> int:
         """
         Obtener cantidad de servicios pendientes
@@ -262,7 +273,7 @@ class ServiceLogService:
         try:
             count = await self.collection.count_documents({
                 "estado": "pendiente",
-                "deleted": {"$ne": True}
+                "deleted": False
             })
             return count
             
@@ -275,10 +286,29 @@ class ServiceLogService:
         Actualizar el estado de múltiples servicios
         """
         try:
-            result = await self.collection.update_many(
+            # Pre-read the services that will change, for the rollup deltas
+            previous: Dict[str, List[str]] = {}
+            deltas: Dict[tuple, int] = {}
+            async for service in self.collection.find(
                 {
                     "id": {"$in": service_ids},
-                    "deleted": {"$ne": True}
+                    "estado": {"$ne": new_estado},
+                    "deleted": False
+                },
+                {"_id": 0, "id": 1, "timestamp": 1, "secretaria": 1, "estado": 1}
+            ):
+                previous.setdefault(service.get("estado"), []).append(service["id"])
+                for key, delta in ((rollup_key(service), -1), (rollup_key(service, new_estado), 1)):
+                    deltas[key] = deltas.get(key, 0) + delta
+            if not previous:
+                return 0
+            
+            # One update_many; services changed since the pre-read are left alone
+            result = await self.collection.update_many(
+                {
+                    "id": {"$in": [service_id for ids in previous.values() for service_id in ids]},
+                    "$or": [{"estado": estado, "id": {"$in": ids}} for estado, ids in previous.items()],
+                    "deleted": False
                 },
                 {
                     "$set": {
@@ -287,11 +317,241 @@ class ServiceLogService:
                     }
                 }
             )
-            
             updated_count = result.modified_count
+            expected_count = sum(len(ids) for ids in previous.values())
+            if updated_count != expected_count:
+                # Counters can be rebuilt from service_logs (ServiceStatsRollup.rebuild)
+                logger.warning(
+                    f"Bulk status update changed {updated_count} of {expected_count} services, "
+                    f"service stats rollups may be off until rebuilt"
+                )
+            
+            # All counter moves in one bulk write
+            await self.rollup.apply(deltas)
+            
             logger.info(f"Bulk status update: {updated_count} services updated to {new_estado}")
             return updated_count
             
         except Exception as e:
             logger.error(f"Error in bulk status update: {str(e)}")
-            return 0
\ No newline at end of file
+            return 0
+
+class TimeSeriesServiceLogService(ServiceLogService):
+    """
+    ServiceLogService over the time-series layout (settings.service_logs_storage
+    == "timeseries"): pending services are read and changed in service_state,
+    every change appends a new version to service_events, and history reads
+    keep the latest version of each service.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(db)
+        self.collection = TimeSeriesServiceLogStore(db)
+        self.events = self.collection.events
+        self.state = self.collection.state
+
+    async def _iter_history(self, query: Dict, ascending: bool = False, estado: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Latest versions of resolved services matching query, in timestamp order"""
+        cursor = self.events.find(query, {"_id": 0}).sort("timestamp", 1 if ascending else -1).batch_size(EXPORT_BATCH_SIZE)
+        # Every version of a service carries its request timestamp, so a
+        # service's versions are complete once the timestamp changes
+        group: List[Dict] = []
+        async for version in cursor:
+            if group and version["timestamp"] != group[0]["timestamp"]:
+                for service in self._visible(group, estado):
+                    yield service
+                group = []
+            group.append(version)
+        for service in self._visible(group, estado):
+            yield service
+
+    @staticmethod
+    def _visible(versions: List[Dict], estado: Optional[str]) -> List[Dict]:
+        # Pending services are served from service_state
+        return [
+            service for service in latest_versions(versions)
+            if not service.get("deleted") and service.get("estado") != "pendiente"
+            and (estado is None or service.get("estado") == estado)
+        ]
+
+    async def _find_services(self, query: Dict, limit: int, projection: Optional[Dict] = None) -> List[Dict]:
+        estado = query.get("estado")
+        query = {key: value for key, value in query.items() if key != "estado"}
+
+        services = []
+        if estado in (None, "pendiente"):
+            services = await self.state.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list(length=limit)
+        if estado != "pendiente":
+            history = []
+            async for service in self._iter_history(query, estado=estado):
+                history.append(service)
+                if len(history) >= limit:
+                    break
+            # A service moving out of service_state can briefly be in both
+            services = sorted(
+                latest_versions(services + history), key=lambda service: service["timestamp"], reverse=True
+            )[:limit]
+
+        fields = [field for field, include in (projection or {}).items() if include and field != "_id"]
+        if fields:
+            return [{field: service[field] for field in fields if field in service} for service in services]
+        return services
+
+    async def iter_services(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        secretaria: Optional[str] = None,
+        estado: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        query = {
+            "timestamp": {
+                "$gte": start_date,
+                "$lte": end_date
+            }
+        }
+        if secretaria:
+            query["secretaria"] = secretaria
+
+        streams = []
+        if estado in (None, "pendiente"):
+            streams.append(self.state.find(query, {"_id": 0}).sort("timestamp", 1).batch_size(EXPORT_BATCH_SIZE))
+        if estado != "pendiente":
+            streams.append(self._iter_history(query, ascending=True, estado=estado))
+
+        # Merge both chronological streams
+        iterators = [stream.__aiter__() for stream in streams]
+        heads = {}
+        for index, iterator in enumerate(iterators):
+            try:
+                heads[index] = await iterator.__anext__()
+            except StopAsyncIteration:
+                pass
+        while heads:
+            index = min(heads, key=lambda i: heads[i]["timestamp"])
+            yield heads[index]
+            try:
+                heads[index] = await iterators[index].__anext__()
+            except StopAsyncIteration:
+                del heads[index]
+
+    async def _latest_version(self, service_id: str) -> Optional[Dict]:
+        versions = await self.events.find({"id": service_id}, {"_id": 0}).sort("updated_at", -1).limit(1).to_list(length=1)
+        return versions[0] if versions and not versions[0].get("deleted") else None
+
+    async def _append_version(self, version: Dict, claimed: Optional[Dict] = None):
+        """Append a version; a service claimed from service_state goes back if that fails"""
+        try:
+            await self.events.insert_one(version)
+        except Exception:
+            if claimed:
+                await self.state.insert_one(claimed)
+            raise
+
+    async def _change_status(self, service_id: str, estado: str, deltas: Dict) -> Optional[Dict]:
+        """Move one service to estado, adding its rollup deltas; returns the previous state"""
+        now = datetime.utcnow()
+        if estado == "pendiente":
+            previous = await self.state.find_one_and_update(
+                {"id": service_id},
+                {"$set": {"updated_at": now}},
+                projection={"_id": 0}
+            )
+            if previous:
+                return previous
+        else:
+            # Claim the pending service so concurrent updates move it only once
+            previous = await self.state.find_one_and_delete({"id": service_id}, projection={"_id": 0})
+            if previous:
+                await self._append_version(event_version(previous, estado=estado, updated_at=now), claimed=previous)
+
+        if not previous:
+            previous = await self._latest_version(service_id)
+            if not previous or previous.get("estado") == estado:
+                return previous
+            version = event_version(previous, estado=estado, updated_at=now)
+            if estado == "pendiente":
+                # Reopened: back to the working set
+                await self.state.insert_one(dict(version))
+            await self._append_version(version)
+
+        if previous.get("estado") != estado:
+            for key, delta in ((rollup_key(previous), -1), (rollup_key(previous, estado), 1)):
+                deltas[key] = deltas.get(key, 0) + delta
+        return previous
+
+    async def update_service_status(self, service_id: str, estado: str) -> bool:
+        try:
+            deltas: Dict[tuple, int] = {}
+            previous = await self._change_status(service_id, estado, deltas)
+            if not previous:
+                logger.warning(f"Service not found for status update: {service_id}")
+                return False
+
+            await self.rollup.apply(deltas)
+            logger.info(f"Service status updated: {service_id} -> {estado}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error updating service status: {str(e)}")
+            return False
+
+    async def bulk_update_status(self, service_ids: List[str], new_estado: str) -> int:
+        try:
+            deltas: Dict[tuple, int] = {}
+            previous = await asyncio.gather(*(
+                self._change_status(service_id, new_estado, deltas) for service_id in set(service_ids)
+            ))
+            updated_count = sum(1 for service in previous if service and service.get("estado") != new_estado)
+
+            # All counter moves in one bulk write
+            await self.rollup.apply(deltas)
+
+            logger.info(f"Bulk status update: {updated_count} services updated to {new_estado}")
+            return updated_count
+
+        except Exception as e:
+            logger.error(f"Error in bulk status update: {str(e)}")
+            return 0
+
+    async def delete_service(self, service_id: str) -> bool:
+        try:
+            now = datetime.utcnow()
+            claimed = await self.state.find_one_and_delete({"id": service_id}, projection={"_id": 0})
+            previous = claimed or await self._latest_version(service_id)
+            if not previous:
+                logger.warning(f"No service was deleted: {service_id}")
+                return False
+
+            await self._append_version(
+                event_version(previous, deleted=True, deleted_at=now, updated_at=now),
+                claimed=claimed
+            )
+            await self.rollup.record_deleted(previous)
+            logger.info(f"Service soft deleted: {service_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deleting service {service_id}: {str(e)}")
+            return False
+
+    async def get_service_by_id(self, service_id: str) -> Optional[Dict]:
+        try:
+            return await self.state.find_one({"id": service_id}, {"_id": 0}) or await self._latest_version(service_id)
+
+        except Exception as e:
+            logger.error(f"Error getting service by ID {service_id}: {str(e)}")
+            return None
+
+    async def get_pending_services_count(self) -> int:
+        try:
+            # service_state holds exactly the pending, non-deleted services
+            return await self.state.count_documents({})
+
+        except Exception as e:
+            logger.error(f"Error getting pending services count: {str(e)}")
+            return 0
+
+def create_service_log_service(db: AsyncIOMotorDatabase) -> ServiceLogService:
+    """ServiceLogService for the configured settings.service_logs_storage"""
+    return TimeSeriesServiceLogService(db) if TIMESERIES_ENABLED else ServiceLogService(db)
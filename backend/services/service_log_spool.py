@@ -0,0 +1,305 @@
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+from pathlib import Path
+from typing import Optional, Dict, List
+import asyncio
+import fcntl
+import itertools
+import os
+import time
+import uuid
+import logging
+
+from config import settings
+from database import is_database_healthy
+from services.service_stats_rollup import ServiceStatsRollup
+
+logger = logging.getLogger(__name__)
+
+# On-disk spool used while MongoDB is unreachable (settings.service_log_spool_dir, spool_*)
+SERVICE_LOG_SPOOL_DIR = Path(settings.service_log_spool_dir)
+SPOOL_SEGMENT_MAX_BYTES = settings.spool_segment_max_bytes
+SPOOL_FSYNC_INTERVAL_MS = settings.spool_fsync_interval_ms
+SPOOL_DRAIN_INTERVAL_SECONDS = settings.spool_drain_interval_seconds
+SPOOL_REPLAY_BATCH_SIZE = 500
+
+# Each worker process spools to its own worker-N subdirectory, claimed with an
+# exclusive flock on its lock file; a free slot holds a dead worker's segments,
+# which the next worker to claim it replays
+SPOOL_SLOT_PREFIX = "worker-"
+SPOOL_LOCK_FILE = ".lock"
+
+DUPLICATE_KEY_ERROR = 11000
+
+class ServiceLogSpool:
+    """Append-only segment log that buffers service logs while MongoDB is down"""
+
+    def __init__(
+        self,
+        directory: Path = SERVICE_LOG_SPOOL_DIR,
+        segment_max_bytes: int = SPOOL_SEGMENT_MAX_BYTES,
+        fsync_interval_ms: float = SPOOL_FSYNC_INTERVAL_MS,
+        drain_interval: float = SPOOL_DRAIN_INTERVAL_SECONDS
+    ):
+        self.root = Path(directory)
+        # The claimed worker slot, set by start()
+        self.directory = self.root
+        self._slot_lock = None
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.drain_interval = drain_interval
+        self.collection = None
+        # Set when a write fails because the database is unreachable,
+        # cleared by the drainer once the database answers pings again
+        self.database_unavailable = False
+        self._segment_seq = 0
+        self._active_file = None
+        self._active_records = 0
+        self._buffer: List[str] = []
+        self._waiters: List[asyncio.Future] = []
+        self._pending_event: Optional[asyncio.Event] = None
+        self._io_lock: Optional[asyncio.Lock] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+        self.depth = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.duplicates = 0
+        self.last_replay_rate = 0.0
+        self.last_replay_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the spool accepts new logs"""
+        return self._running
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"segment-{seq:08d}.ndjson"
+
+    def _sealed_segments(self) -> List[Path]:
+        """Segments no longer being written to, oldest first"""
+        return sorted(
+            path for path in self.directory.glob("segment-*.ndjson")
+            if path != self._segment_path(self._segment_seq)
+        )
+
+    def _open_new_segment(self):
+        """Close the active segment (if any) and start the next one"""
+        if self._active_file:
+            self._active_file.close()
+        self._segment_seq += 1
+        self._active_file = open(self._segment_path(self._segment_seq), "a", encoding="utf-8")
+        self._active_records = 0
+
+    def _adopt_segments(self, directory: Path):
+        """Move another directory's segments into the claimed slot, replayed before its own"""
+        for path in directory.glob("segment-*.ndjson"):
+            try:
+                os.rename(path, self.directory / f"segment-00000000-{uuid.uuid4().hex}.ndjson")
+            except FileNotFoundError:
+                # Adopted by another worker
+                pass
+
+    def _claim_slot(self):
+        """Lock the first worker slot no other process holds and spool there"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for n in itertools.count():
+            slot = self.root / f"{SPOOL_SLOT_PREFIX}{n}"
+            slot.mkdir(exist_ok=True)
+            lock = open(slot / SPOOL_LOCK_FILE, "a")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                continue
+            self.directory, self._slot_lock = slot, lock
+            break
+
+        # Segments spooled before worker slots existed, and those of slots left
+        # behind by workers that are gone (e.g. fewer workers after a restart)
+        self._adopt_segments(self.root)
+        for slot in self.root.glob(f"{SPOOL_SLOT_PREFIX}*"):
+            if slot == self.directory or not slot.is_dir():
+                continue
+            with open(slot / SPOOL_LOCK_FILE, "a") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._adopt_segments(slot)
+
+    def start(self, collection):
+        """Claim a spool directory and start the fsync and drain tasks"""
+        self.collection = collection
+        self._claim_slot()
+
+        # Records left over from a previous run are replayed like any other segment
+        existing = sorted(self.directory.glob("segment-*.ndjson"))
+        for path in existing:
+            with open(path, "r", encoding="utf-8") as f:
+                self.depth += sum(1 for line in f if line.strip())
+        if existing:
+            self._segment_seq = int(existing[-1].stem.split("-")[1])
+
+        self._open_new_segment()
+        self._pending_event = asyncio.Event()
+        self._io_lock = asyncio.Lock()
+        self._running = True
+        self._tasks = [
+            asyncio.create_task(self._fsync_loop()),
+            asyncio.create_task(self._drain_loop())
+        ]
+        logger.info(f"Service log spool started at {self.directory} ({self.depth} records pending)")
+
+    async def append(self, documents: List[dict]):
+        """Durably append documents; returns once they are fsynced to disk"""
+        if not self._running:
+            raise RuntimeError("Service log spool is not running")
+
+        for document in documents:
+            # A fixed _id makes the replay idempotent: re-inserting raises a duplicate key
+            document.setdefault("_id", ObjectId())
+            self._buffer.append(json_util.dumps(document) + "\n")
+
+        written = asyncio.get_running_loop().create_future()
+        self._waiters.append(written)
+        self._pending_event.set()
+        await written
+
+    def _write_and_sync(self, lines: List[str]):
+        """Blocking write of a group of lines followed by a single fsync"""
+        if self._active_file.tell() >= self.segment_max_bytes:
+            self._open_new_segment()
+        self._active_file.write("".join(lines))
+        self._active_file.flush()
+        os.fsync(self._active_file.fileno())
+        self._active_records += len(lines)
+
+    async def _write_pending(self):
+        lines, self._buffer = self._buffer, []
+        waiters, self._waiters = self._waiters, []
+        if not lines:
+            for waiter in waiters:
+                waiter.done() or waiter.set_result(None)
+            return
+
+        try:
+            async with self._io_lock:
+                await asyncio.to_thread(self._write_and_sync, lines)
+            self.depth += len(lines)
+            self.spooled += len(lines)
+            for waiter in waiters:
+                waiter.done() or waiter.set_result(None)
+        except Exception as e:
+            logger.error(f"Error writing service log spool: {e}")
+            for waiter in waiters:
+                waiter.done() or waiter.set_exception(e)
+
+    async def _fsync_loop(self):
+        """Group appends arriving within fsync_interval into one write + fsync"""
+        while self._running:
+            await self._pending_event.wait()
+            await asyncio.sleep(self.fsync_interval)
+            self._pending_event.clear()
+            await self._write_pending()
+
+    async def _replay_segment(self, path: Path) -> int:
+        """Insert every record of a sealed segment, then delete it"""
+        with open(path, "r", encoding="utf-8") as f:
+            documents = [json_util.loads(line) for line in f if line.strip()]
+
+        for offset in range(0, len(documents), SPOOL_REPLAY_BATCH_SIZE):
+            batch = documents[offset:offset + SPOOL_REPLAY_BATCH_SIZE]
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                other_errors = [error for error in errors if error.get("code") != DUPLICATE_KEY_ERROR]
+                if other_errors:
+                    raise
+                # Inserted by an earlier, interrupted replay, or by the original
+                # insert whose reply was lost
+                self.duplicates += len(errors)
+
+            # Duplicates included: the rollup ledger knows which were already counted
+            await ServiceStatsRollup(self.collection.database).record_replayed(batch)
+
+        path.unlink()
+        return len(documents)
+
+    async def drain(self) -> int:
+        """Replay spooled logs into MongoDB if the database is healthy"""
+        if self.depth == 0 and not self.database_unavailable:
+            return 0
+        if not await is_database_healthy():
+            self.database_unavailable = True
+            return 0
+
+        start_time = time.time()
+        replayed = 0
+        try:
+            # Seal the active segment so everything spooled so far can be replayed
+            async with self._io_lock:
+                if self._active_records:
+                    await asyncio.to_thread(self._open_new_segment)
+
+            for path in self._sealed_segments():
+                count = await self._replay_segment(path)
+                replayed += count
+                self.depth = max(0, self.depth - count)
+                self.replayed += count
+
+            self.database_unavailable = False
+
+        except Exception as e:
+            logger.error(f"Error replaying service log spool: {e}")
+
+        if replayed:
+            elapsed = time.time() - start_time
+            self.last_replay_rate = replayed / elapsed if elapsed > 0 else float(replayed)
+            self.last_replay_at = time.time()
+            logger.info(f"Replayed {replayed} spooled service logs ({self.last_replay_rate:.0f} logs/s)")
+        return replayed
+
+    async def _drain_loop(self):
+        while True:
+            await asyncio.sleep(self.drain_interval)
+            await self.drain()
+
+    async def stop(self):
+        """Flush buffered appends to disk and stop the background tasks"""
+        if not self._running:
+            return
+        self._running = False
+        fsync_task, drain_task = self._tasks
+        drain_task.cancel()
+        # Let the fsync loop finish its current group, then write anything left
+        self._pending_event.set()
+        await asyncio.gather(fsync_task, drain_task, return_exceptions=True)
+        await self._write_pending()
+        if self._active_file:
+            self._active_file.close()
+            self._active_file = None
+        if self._slot_lock:
+            # Leftover segments are replayed by the next worker claiming the slot
+            self._slot_lock.close()
+            self._slot_lock = None
+        logger.info(f"Service log spool stopped ({self.depth} records pending)")
+
+    def stats(self) -> Dict:
+        """Get spool statistics"""
+        return {
+            "running": self._running,
+            "database_unavailable": self.database_unavailable,
+            "depth": self.depth,
+            "directory": str(self.directory),
+            "segments": len(list(self.directory.glob("segment-*.ndjson"))) if self.directory.exists() else 0,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "duplicates_skipped": self.duplicates,
+            "last_replay_rate_per_second": round(self.last_replay_rate, 2),
+            "last_replay_at": self.last_replay_at
+        }
+
+# Global spool instance, started in the application lifespan
+service_log_spool = ServiceLogSpool()
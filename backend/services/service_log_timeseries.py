@@ -0,0 +1,187 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+from typing import AsyncIterator, Dict, Iterable, List
+from datetime import datetime
+import logging
+
+from config import settings, get_service_logs_ttl_seconds
+
+logger = logging.getLogger(__name__)
+
+# settings.service_logs_storage == "timeseries" layout:
+# - service_events: time-series collection (timeField timestamp, metaField
+#   secretaria) with one immutable version of a service per change; the
+#   latest version (by updated_at) is the service's current state
+# - service_state: regular collection holding only the pending services,
+#   the mutable working set read by reception screens
+SERVICE_EVENTS_COLLECTION = "service_events"
+SERVICE_STATE_COLLECTION = "service_state"
+TIMESERIES_ENABLED = settings.service_logs_storage == "timeseries"
+DUPLICATE_KEY_ERROR = 11000
+
+# Versions of one service share its request timestamp, so they land in the
+# same bucket and expire together
+TIMESERIES_OPTIONS = {"timeField": "timestamp", "metaField": "secretaria", "granularity": "minutes"}
+
+# Aggregation stages reducing service_events to the current version of each service
+LATEST_VERSION_STAGES = [
+    {"$sort": {"id": 1, "updated_at": 1}},
+    {"$group": {"_id": "$id", "service": {"$last": "$$ROOT"}}},
+    {"$replaceRoot": {"newRoot": "$service"}}
+]
+
+def event_version(document: dict, **changes) -> dict:
+    """Copy of a service document to append to service_events"""
+    version = {key: value for key, value in document.items() if key != "_id"}
+    version.update(changes)
+    return version
+
+async def ensure_timeseries_collections(
+    db: AsyncIOMotorDatabase,
+    events_name: str = SERVICE_EVENTS_COLLECTION
+):
+    """
+    Create the service_events time-series collection, or align its retention.
+    With archiving there is no expiry: the archive job deletes archived days.
+    """
+    ttl = get_service_logs_ttl_seconds()
+    existing = {
+        info["name"]: info.get("options", {})
+        async for info in db.list_collections(filter={"name": events_name})
+    }
+    if events_name not in existing:
+        expiry = {"expireAfterSeconds": ttl} if ttl else {}
+        await db.create_collection(events_name, timeseries=TIMESERIES_OPTIONS, **expiry)
+        logger.info(f"✅ Created time-series collection {events_name}")
+        return
+
+    options = existing[events_name]
+    if "timeseries" not in options:
+        raise RuntimeError(f"{events_name} exists but is not a time-series collection")
+    if options.get("expireAfterSeconds") != ttl:
+        await db.command({"collMod": events_name, "expireAfterSeconds": ttl or "off"})
+        logger.info(f"✅ {events_name} expiry set to {f'{ttl // 86400} days' if ttl else 'off'}")
+
+class TimeSeriesServiceLogStore:
+    """
+    insert_many/insert_one target for new service logs in time-series mode,
+    used by the write-behind writer and the spool in place of service_logs.
+
+    Retries (spool replays of a batch whose reply was lost) are idempotent:
+    the first version of a service is appended to service_events unless that
+    (id, updated_at) version is already there, and only then is the service
+    added to service_state, if it is still pending. A service already in
+    service_state is not an error.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        events_name: str = SERVICE_EVENTS_COLLECTION,
+        state_name: str = SERVICE_STATE_COLLECTION
+    ):
+        self.database = db
+        self.events = db[events_name]
+        self.state = db[state_name]
+
+    async def _stored_versions(self, documents: List[dict]) -> Dict[str, List[dict]]:
+        """Versions already in service_events for the documents' ids"""
+        versions: Dict[str, List[dict]] = {}
+        async for version in self.events.find(
+            {"id": {"$in": [document["id"] for document in documents]}},
+            {"_id": 0, "id": 1, "estado": 1, "deleted": 1, "updated_at": 1}
+        ):
+            versions.setdefault(version["id"], []).append(version)
+        return versions
+
+    @staticmethod
+    def _remap(error: BulkWriteError, positions: List[int]) -> BulkWriteError:
+        """Report write errors at the positions of the caller's documents"""
+        details = dict(error.details)
+        details["writeErrors"] = [
+            {**write_error, "index": positions[write_error["index"]]}
+            for write_error in error.details.get("writeErrors", [])
+        ]
+        return BulkWriteError(details)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = False):
+        documents = list(documents)
+        stored = await self._stored_versions(documents)
+
+        new_positions = [
+            index for index, document in enumerate(documents)
+            if not any(version.get("updated_at") == document.get("updated_at") for version in stored.get(document["id"], []))
+        ]
+        if new_positions:
+            try:
+                await self.events.insert_many([event_version(documents[index]) for index in new_positions], ordered=False)
+            except BulkWriteError as e:
+                raise self._remap(e, new_positions)
+
+        # A retried log may have been resolved since its first attempt
+        pending_positions = []
+        for index, document in enumerate(documents):
+            versions = stored.get(document["id"])
+            latest = latest_versions(versions)[0] if versions else document
+            if latest.get("estado") == "pendiente" and not latest.get("deleted"):
+                pending_positions.append(index)
+        if not pending_positions:
+            return
+        try:
+            await self.state.insert_many([event_version(documents[index]) for index in pending_positions], ordered=False)
+        except BulkWriteError as e:
+            # Already pending from an earlier attempt
+            errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY_ERROR]
+            if errors:
+                raise self._remap(BulkWriteError({**e.details, "writeErrors": errors}), pending_positions)
+
+    async def insert_one(self, document: dict):
+        await self.insert_many([document])
+
+async def migrate_service_logs(
+    db: AsyncIOMotorDatabase,
+    batch_size: int = 5000,
+    source_name: str = "service_logs",
+    events_name: str = SERVICE_EVENTS_COLLECTION,
+    state_name: str = SERVICE_STATE_COLLECTION
+) -> AsyncIterator[Dict[str, int]]:
+    """
+    Copy service_logs into service_events/service_state in timestamp order,
+    yielding running counts after every batch. service_logs is left intact.
+    """
+    await ensure_timeseries_collections(db, events_name)
+    events, state = db[events_name], db[state_name]
+    counts = {"copied": 0, "pending": 0}
+
+    async def flush(batch: List[dict]):
+        pending = [
+            document for document in batch
+            if document.get("estado") == "pendiente" and not document.get("deleted")
+        ]
+        await events.insert_many([event_version(document) for document in batch], ordered=False)
+        if pending:
+            await state.insert_many([event_version(document) for document in pending], ordered=False)
+        counts["copied"] += len(batch)
+        counts["pending"] += len(pending)
+
+    batch = []
+    async for document in db[source_name].find({}, {"_id": 0}).sort("timestamp", 1).batch_size(batch_size):
+        # Versions are ordered by updated_at; very old logs may not have one
+        document.setdefault("updated_at", document.get("created_at", document["timestamp"]))
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+            yield dict(counts)
+    if batch:
+        await flush(batch)
+    yield dict(counts)
+
+def latest_versions(versions: Iterable[dict]) -> List[dict]:
+    """Keep the newest version (by updated_at) of every service id, in first-seen order"""
+    latest: Dict[str, dict] = {}
+    for version in versions:
+        current = latest.get(version["id"])
+        if current is None or (version.get("updated_at") or datetime.min) > (current.get("updated_at") or datetime.min):
+            latest[version["id"]] = version
+    return list(latest.values())
@@ -0,0 +1,240 @@
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from typing import Optional, Dict, List, Tuple
+import asyncio
+import math
+import time
+import logging
+
+from config import settings
+from services.service_log_spool import service_log_spool
+from services.service_stats_rollup import ServiceStatsRollup
+
+logger = logging.getLogger(__name__)
+
+# Write-behind tuning (settings.service_log_*)
+SERVICE_LOG_BATCH_SIZE = settings.service_log_batch_size
+SERVICE_LOG_FLUSH_INTERVAL_MS = settings.service_log_flush_interval_ms
+SERVICE_LOG_QUEUE_SIZE = settings.service_log_queue_size
+SERVICE_LOG_ENQUEUE_TIMEOUT = settings.service_log_enqueue_timeout
+
+# Where a service log ended up, reported back to the caller
+OUTCOME_QUEUED = "queued"
+OUTCOME_COMMITTED = "committed"
+OUTCOME_SPOOLED = "spooled"
+
+class ServiceLogQueueFull(Exception):
+    """The write-behind queue stayed full for the whole enqueue timeout"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Service log queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class ServiceLogWriter:
+    """Write-behind queue that coalesces service logs into insert_many batches"""
+
+    def __init__(
+        self,
+        batch_size: int = SERVICE_LOG_BATCH_SIZE,
+        flush_interval_ms: float = SERVICE_LOG_FLUSH_INTERVAL_MS,
+        max_queue: int = SERVICE_LOG_QUEUE_SIZE,
+        enqueue_timeout: float = SERVICE_LOG_ENQUEUE_TIMEOUT
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.collection = None
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = True
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.spooled = 0
+        self.batches = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether logs are being accepted into the queue and a flusher is alive"""
+        return not self._closed and self._task is not None and not self._task.done()
+
+    def _start_task(self):
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: asyncio.Task):
+        """Restart the flusher if it died while logs are still being accepted"""
+        if self._closed or task.cancelled():
+            return
+        logger.error(f"Service log writer stopped unexpectedly: {task.exception()!r}, restarting")
+        self.restarts += 1
+        self._start_task()
+
+    def start(self, collection):
+        """Start the background flusher for the given collection"""
+        self.collection = collection
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closed = False
+        self._start_task()
+        logger.info(f"Service log writer started (batch={self.batch_size}, interval={self.flush_interval * 1000:.0f}ms)")
+
+    async def enqueue(self, document: dict) -> asyncio.Future:
+        """
+        Queue a document for insertion and return a future resolved with
+        OUTCOME_COMMITTED or OUTCOME_SPOOLED once it is durable.
+        Waits (backpressure) while the queue is full, up to enqueue_timeout,
+        then raises ServiceLogQueueFull.
+        """
+        if self._closed:
+            raise RuntimeError("Service log writer is not running")
+
+        commit = asyncio.get_running_loop().create_future()
+        # Failures are logged by the flusher; don't warn when nobody awaits the future
+        commit.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        try:
+            await asyncio.wait_for(self.queue.put((document, commit)), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ServiceLogQueueFull(max(1, math.ceil(self.enqueue_timeout)))
+        self.enqueued += 1
+        return commit
+
+    def _drain(self, batch: List[Tuple[dict, asyncio.Future]]) -> bool:
+        """Move queued items into the batch; returns True when the stop marker was seen"""
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                stopping = True
+                batch = []
+            else:
+                batch = [item]
+
+            stopping = self._drain(batch) or stopping
+            if not stopping and len(batch) < self.batch_size:
+                # Give concurrent kiosks a few milliseconds to join the batch
+                await asyncio.sleep(self.flush_interval)
+                stopping = self._drain(batch)
+
+            if batch:
+                await self._flush_or_fail(batch)
+
+        # Flush anything enqueued after the stop marker
+        batch = []
+        while not self.queue.empty():
+            self._drain(batch)
+            if batch:
+                await self._flush_or_fail(batch)
+                batch = []
+
+    async def _flush_or_fail(self, batch: List[Tuple[dict, asyncio.Future]]):
+        """Flush a batch; on an unexpected error, fail its pending futures before the task dies"""
+        try:
+            await self._flush(batch)
+        except Exception as e:
+            for _, commit in batch:
+                commit.done() or commit.set_exception(e)
+            raise
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        """Insert a batch with a single unordered insert_many"""
+        documents = [document for document, _ in batch]
+        failed_indexes: Dict[int, str] = {}
+        start_time = time.time()
+
+        try:
+            if service_log_spool.running and service_log_spool.database_unavailable:
+                await self._spool(batch)
+                return
+            await self.collection.insert_many(documents, ordered=False)
+        except ConnectionFailure as e:
+            if service_log_spool.running:
+                logger.warning(f"Database unreachable, spooling {len(batch)} service logs: {e}")
+                service_log_spool.database_unavailable = True
+                await self._spool(batch)
+                return
+            failed_indexes = {index: str(e) for index in range(len(batch))}
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed_indexes[error["index"]] = error.get("errmsg", "write error")
+        except Exception as e:
+            failed_indexes = {index: str(e) for index in range(len(batch))}
+
+        for index, (document, commit) in enumerate(batch):
+            if commit.done():
+                continue
+            if index in failed_indexes:
+                commit.set_exception(RuntimeError(failed_indexes[index]))
+            else:
+                commit.set_result(OUTCOME_COMMITTED)
+
+        self.batches += 1
+        self.failed += len(failed_indexes)
+        self.written += len(batch) - len(failed_indexes)
+
+        await ServiceStatsRollup(self.collection.database).record_inserted(
+            document for index, document in enumerate(documents) if index not in failed_indexes
+        )
+
+        if failed_indexes:
+            logger.error(f"Service log batch: {len(failed_indexes)}/{len(batch)} inserts failed: {next(iter(failed_indexes.values()))}")
+        else:
+            logger.debug(f"Service log batch of {len(batch)} flushed in {(time.time() - start_time) * 1000:.1f}ms")
+
+    async def _spool(self, batch: List[Tuple[dict, asyncio.Future]]):
+        """Hand a batch to the on-disk spool; its futures resolve once it is fsynced"""
+        try:
+            await service_log_spool.append([document for document, _ in batch])
+        except Exception as e:
+            logger.error(f"Error spooling {len(batch)} service logs: {e}")
+            for _, commit in batch:
+                commit.done() or commit.set_exception(e)
+            self.failed += len(batch)
+            return
+
+        for _, commit in batch:
+            commit.done() or commit.set_result(OUTCOME_SPOOLED)
+        self.spooled += len(batch)
+
+    async def stop(self):
+        """Stop accepting logs and flush everything still queued"""
+        if self._closed:
+            return
+        self._closed = True
+        await self.queue.put(None)
+        # A failed final flush was already logged and reported to its callers
+        await asyncio.gather(self._task, return_exceptions=True)
+        logger.info(f"Service log writer stopped ({self.written} written, {self.failed} failed)")
+
+    def stats(self) -> Dict:
+        """Get writer statistics"""
+        return {
+            "running": self.running,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": self.max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "spooled": self.spooled,
+            "batches": self.batches,
+            "rejected_queue_full": self.rejected,
+            "restarts": self.restarts,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0
+        }
+
+# Global writer instance, started in the application lifespan
+service_log_writer = ServiceLogWriter()
@@ -0,0 +1,165 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Dict, List, Optional, Tuple, Iterable
+from collections import Counter
+from datetime import datetime, timedelta
+import time
+import logging
+
+from services.service_log_timeseries import TIMESERIES_ENABLED, SERVICE_EVENTS_COLLECTION, LATEST_VERSION_STAGES
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "service_stats_daily"
+
+# Ids of the spooled service logs already counted by a replay ({_id: id, counted_at})
+SPOOL_LEDGER_COLLECTION = "service_stats_spool_ledger"
+DUPLICATE_KEY_ERROR = 11000
+
+# (dia, secretaria, estado) -> count delta
+RollupKey = Tuple[str, str, str]
+
+def rollup_key(document: dict, estado: str = None) -> RollupKey:
+    """Rollup bucket of a service log; dia matches $dateToString on timestamp (UTC)"""
+    return (
+        document["timestamp"].strftime("%Y-%m-%d"),
+        document["secretaria"],
+        estado or document.get("estado", "pendiente")
+    )
+
+class ServiceStatsRollup:
+    """Per-day x per-secretaria x per-estado counters maintained with $inc"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db[ROLLUP_COLLECTION]
+
+    async def apply(self, deltas: Dict[RollupKey, int]):
+        """Apply counter deltas with one unordered bulk upsert"""
+        operations = [
+            UpdateOne(
+                {"dia": dia, "secretaria": secretaria, "estado": estado},
+                {"$inc": {"count": delta}},
+                upsert=True
+            )
+            for (dia, secretaria, estado), delta in deltas.items()
+            if delta
+        ]
+        if not operations:
+            return
+
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # Counters can be rebuilt from service_logs, never fail the write path
+            logger.error(f"Error updating service stats rollups: {e}")
+
+    async def record_inserted(self, documents: Iterable[dict]):
+        """Count newly inserted service logs"""
+        await self.apply(Counter(rollup_key(document) for document in documents))
+
+    async def record_replayed(self, documents: List[dict]):
+        """
+        Count spooled service logs exactly once. A spooled log was never
+        counted by the writer, but it may already be in MongoDB (the insert
+        committed and its reply was lost) or counted by an earlier, interrupted
+        replay; claiming its id in the ledger tells these apart.
+        """
+        ledger = self.db[SPOOL_LEDGER_COLLECTION]
+        now = datetime.utcnow()
+        claimed = set(range(len(documents)))
+        try:
+            await ledger.insert_many(
+                [{"_id": document["id"], "counted_at": now} for document in documents],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            claimed -= {error["index"] for error in errors}
+
+        await self.record_inserted(document for index, document in enumerate(documents) if index in claimed)
+
+    async def record_status_change(self, document: dict, new_estado: str, count: int = 1):
+        """Move count logs of the document's bucket from its estado to new_estado"""
+        if document.get("estado") == new_estado or not count:
+            return
+        await self.apply({
+            rollup_key(document): -count,
+            rollup_key(document, new_estado): count
+        })
+
+    async def record_deleted(self, document: dict):
+        """Remove a soft-deleted service log from the counters"""
+        await self.apply({rollup_key(document): -1})
+
+    async def get_totals(self, days: int, now: Optional[datetime] = None) -> Tuple[int, Dict[str, int], Dict[str, int]]:
+        """Total, per-secretaria and per-day counts for the last `days` UTC calendar days, today included"""
+        now = now or datetime.utcnow()
+        start_day = (now - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
+        total = 0
+        por_secretaria: Dict[str, int] = {}
+        por_dia: Dict[str, int] = {}
+        async for row in self.collection.find(
+            {"dia": {"$gte": start_day}, "count": {"$gt": 0}},
+            {"_id": 0, "dia": 1, "secretaria": 1, "count": 1}
+        ):
+            total += row["count"]
+            por_secretaria[row["secretaria"]] = por_secretaria.get(row["secretaria"], 0) + row["count"]
+            por_dia[row["dia"]] = por_dia.get(row["dia"], 0) + row["count"]
+
+        return total, por_secretaria, dict(sorted(por_dia.items()))
+
+    def _source(self):
+        """Raw logs to count from, and the stages giving one document per service"""
+        if TIMESERIES_ENABLED:
+            return self.db[SERVICE_EVENTS_COLLECTION], LATEST_VERSION_STAGES
+        return self.db.service_logs, []
+
+    async def rebuild(self) -> int:
+        """Recompute every counter from the raw service_logs (backfill)"""
+        start_time = time.time()
+        source, stages = self._source()
+        pipeline = stages + [
+            {"$match": {"deleted": False}},
+            {
+                "$group": {
+                    "_id": {
+                        "dia": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                        "secretaria": "$secretaria",
+                        "estado": "$estado"
+                    },
+                    "count": {"$sum": 1}
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "dia": "$_id.dia",
+                    "secretaria": "$_id.secretaria",
+                    "estado": "$_id.estado",
+                    "count": 1
+                }
+            },
+            # $out replaces the rollup collection atomically and keeps its indexes
+            {"$out": ROLLUP_COLLECTION}
+        ]
+        await source.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+        buckets = await self.collection.count_documents({})
+        logger.info(f"Service stats rollups rebuilt: {buckets} buckets in {time.time() - start_time:.2f}s")
+        return buckets
+
+    async def ensure_backfilled(self):
+        """Backfill rollups on first start when logs exist but counters do not"""
+        try:
+            source, _ = self._source()
+            if await self.collection.estimated_document_count() == 0 and \
+                    await source.find_one({}, {"_id": 1}) is not None:
+                logger.info(f"Service stats rollups empty, backfilling from {source.name}...")
+                await self.rebuild()
+        except Exception as e:
+            logger.error(f"Error backfilling service stats rollups: {e}")
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# Backend modules import each other as top-level modules (from config import settings)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
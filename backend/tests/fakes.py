@@ -0,0 +1,237 @@
+"""
+In-memory stand-ins for the Motor collections used by the services, covering
+only the query and update operators the code under test sends
+"""
+import copy
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+def _get(document: dict, path: str) -> Any:
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def _set(document: dict, path: str, value: Any):
+    *parents, field = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[field] = value
+
+def _apply(document: dict, update: Dict):
+    for path, value in update.get("$set", {}).items():
+        _set(document, path, value)
+    for field, amount in update.get("$inc", {}).items():
+        document[field] = document.get(field, 0) + amount
+
+def _matches_value(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for operator, operand in condition.items():
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$nin" and value in operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$exists" and (value is not None) != operand:
+                return False
+            if operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if operator == "$gt" and not value > operand:
+                    return False
+                if operator == "$gte" and not value >= operand:
+                    return False
+                if operator == "$lt" and not value < operand:
+                    return False
+                if operator == "$lte" and not value <= operand:
+                    return False
+        return True
+    return value == condition
+
+def matches(document: dict, query: Dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, clause) for clause in condition):
+                return False
+        elif not _matches_value(_get(document, key), condition):
+            return False
+    return True
+
+def project(document: dict, projection: Optional[Dict]) -> dict:
+    document = copy.deepcopy(document)
+    if not projection:
+        return document
+    included = [key for key, flag in projection.items() if flag and key != "_id"]
+    if included:
+        result = {key: document[key] for key in included if key in document}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    for key, flag in projection.items():
+        if not flag:
+            document.pop(key, None)
+    return document
+
+class FakeCursor:
+    def __init__(self, documents: List[dict]):
+        self.documents = documents
+
+    def sort(self, key, direction: int = 1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self.documents.sort(
+                key=lambda document: (_get(document, field) is not None, _get(document, field)),
+                reverse=order < 0
+            )
+        return self
+
+    def skip(self, count: int):
+        self.documents = self.documents[count:]
+        return self
+
+    def limit(self, count: int):
+        if count:
+            self.documents = self.documents[:count]
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    async def to_list(self, length: Optional[int] = None):
+        return self.documents if length is None else self.documents[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self.documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakeCollection:
+    def __init__(self, database: "FakeDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.documents: List[dict] = []
+        self.indexes: Dict[str, Dict] = {"_id_": {"name": "_id_", "key": {"_id": 1}}}
+        self.unique_fields = ["_id"]
+        # Raised (once) by the next insert_many after it is applied, e.g. a lost reply
+        self.fail_after_insert: Optional[Exception] = None
+
+    def _check_unique(self, document: dict, candidates: List[dict]):
+        for field in self.unique_fields:
+            value = document.get(field)
+            if value is not None and any(other.get(field) == value for other in candidates):
+                raise DuplicateKeyError(f"E11000 duplicate key error {field}: {value}", 11000)
+
+    async def insert_one(self, document: dict):
+        document.setdefault("_id", len(self.documents) + 1)
+        self._check_unique(document, self.documents)
+        self.documents.append(copy.deepcopy(document))
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True):
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                await self.insert_one(document)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(documents) - len(errors)})
+        if self.fail_after_insert is not None:
+            error, self.fail_after_insert = self.fail_after_insert, None
+            raise error
+        return SimpleNamespace(inserted_ids=[document["_id"] for document in documents])
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None):
+        return FakeCursor([
+            project(document, projection) for document in self.documents if matches(document, query or {})
+        ])
+
+    async def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None):
+        found = await self.find(query, projection).to_list(length=1)
+        return found[0] if found else None
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        for document in self.documents:
+            if matches(document, query):
+                _apply(document, update)
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            document = {key: value for key, value in query.items() if not isinstance(value, dict) and not key.startswith("$")}
+            document.update(update.get("$set", {}))
+            document.update(update.get("$setOnInsert", {}))
+            document.update(update.get("$inc", {}))
+            await self.insert_one(document)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=document["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query: Dict, update: Dict):
+        matched = [document for document in self.documents if matches(document, query)]
+        for document in matched:
+            _apply(document, update)
+        return SimpleNamespace(matched_count=len(matched), modified_count=len(matched), upserted_id=None)
+
+    async def find_one_and_update(self, query: Dict, update: Dict, projection: Optional[Dict] = None, return_document: bool = False):
+        for document in self.documents:
+            if matches(document, query):
+                before = project(document, projection)
+                _apply(document, update)
+                return project(document, projection) if return_document else before
+        return None
+
+    async def bulk_write(self, operations: List, ordered: bool = True):
+        # UpdateOne only
+        for operation in operations:
+            await self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+        return SimpleNamespace(bulk_api_result={})
+
+    async def delete_many(self, query: Dict):
+        kept = [document for document in self.documents if not matches(document, query)]
+        deleted = len(self.documents) - len(kept)
+        self.documents = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def estimated_document_count(self) -> int:
+        return len(self.documents)
+
+    def aggregate(self, pipeline: List[Dict], **kwargs):
+        documents = [copy.deepcopy(document) for document in self.documents]
+        for stage in pipeline:
+            if "$match" in stage:
+                documents = [document for document in documents if matches(document, stage["$match"])]
+            elif "$project" in stage:
+                documents = [project(document, stage["$project"]) for document in documents]
+            else:
+                raise NotImplementedError(f"Unsupported stage {stage}")
+        return FakeCursor(documents)
+
+    def list_indexes(self):
+        return FakeCursor([copy.deepcopy(index) for index in self.indexes.values()])
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self, name)
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,30 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from config import settings
+
+ADMIN_KEY = "s3cret-admin"
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_keys", ADMIN_KEY)
+    # No lifespan: the endpoints must answer 401 before touching the database
+    return TestClient(server.app)
+
+@pytest.mark.parametrize("method, path", [
+    ("get", "/api/admin/slow-queries"),
+    ("get", "/api/admin/indexes"),
+    ("post", "/api/patients/import")
+])
+def test_admin_endpoints_require_a_configured_key(client, method, path):
+    assert getattr(client, method)(path).status_code == 401
+    response = getattr(client, method)(path, headers={"X-API-Key": "totem-key-456"})
+    assert response.status_code == 401
+    assert response.json()["detail"]["code"] == "INVALID_API_KEY"
+
+def test_admin_key_opens_the_slow_query_log(client):
+    response = client.get("/api/admin/slow-queries", headers={"X-API-Key": ADMIN_KEY})
+
+    assert response.status_code == 200
+    assert "slow_queries" in response.json()
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from datetime import datetime
+
+from services import patient_service as patient_service_module
+from services.patient_service import PatientService
+from tests.fakes import FakeDatabase
+from utils.bloom import BloomFilter, DocumentFilter
+
+def patient(documento: str) -> dict:
+    return {
+        "documento": documento,
+        "nombre": "Ana",
+        "apellido": "Gómez",
+        "turno": {"medico": "Dr. García", "hora": "10:30", "piso": "Primer Piso"},
+        "created_at": datetime.utcnow()
+    }
+
+def test_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    documentos = [str(20000000 + i) for i in range(1000)]
+    for documento in documentos:
+        bloom.add(documento)
+    assert all(documento in bloom for documento in documentos)
+
+def test_false_positive_rate_close_to_target():
+    bloom = BloomFilter(5000, 0.01)
+    for i in range(5000):
+        bloom.add(str(20000000 + i))
+    false_positives = sum(str(40000000 + i) in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.03
+
+def test_document_filter_rebuild_from_collection():
+    db = FakeDatabase()
+    asyncio.run(db.patients.insert_many([{"documento": "12345678"}, {"documento": "87654321"}]))
+    document_filter = DocumentFilter(min_capacity=100)
+
+    assert document_filter.might_contain("99999999")
+    asyncio.run(document_filter.rebuild(db.patients))
+
+    assert document_filter.ready
+    assert document_filter.might_contain("12345678")
+    assert not document_filter.might_contain("99999999")
+    assert document_filter.stats()["definite_misses"] == 1
+
+def test_sync_picks_up_patients_inserted_outside_the_process():
+    db = FakeDatabase()
+    asyncio.run(db.patients.insert_one(patient("12345678")))
+    document_filter = DocumentFilter(min_capacity=100)
+    asyncio.run(document_filter.rebuild(db.patients))
+
+    # Another worker or an import script inserts a patient
+    asyncio.run(db.patients.insert_one(patient("55555555")))
+    assert not document_filter.might_contain("55555555")
+
+    asyncio.run(document_filter.sync(db.patients))
+    assert document_filter.might_contain("55555555")
+
+def test_stale_filter_does_not_trust_misses():
+    db = FakeDatabase()
+    document_filter = DocumentFilter(min_capacity=100, max_staleness=5)
+    asyncio.run(document_filter.rebuild(db.patients))
+    assert not document_filter.might_contain("55555555")
+
+    document_filter.last_sync = time.time() - 60
+    assert document_filter.might_contain("55555555")
+    assert document_filter.stale_misses == 1
+
+def test_lookup_finds_external_patient_once_the_filter_is_stale(monkeypatch):
+    db = FakeDatabase()
+    document_filter = DocumentFilter(min_capacity=100, max_staleness=5)
+    asyncio.run(document_filter.rebuild(db.patients))
+    monkeypatch.setattr(patient_service_module, "known_documents", document_filter)
+    asyncio.run(db.patients.insert_one(patient("66666666")))
+    service = PatientService(db)
+
+    assert asyncio.run(service.find_by_document("66666666")) is None
+
+    document_filter.last_sync = time.time() - 60
+    found = asyncio.run(service.find_by_document("66666666"))
+    assert found is not None and found.documento == "66666666"
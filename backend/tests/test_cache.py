@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+from models.patient import PatientResponse
+from services.service_log_service import ServiceLogService
+from tests.fakes import FakeDatabase
+from utils import cache as cache_module
+from utils.cache import SimpleCache, cached, default_sizeof
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = SimpleCache(default_ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+def test_expired_entries_are_misses(monkeypatch):
+    cache = SimpleCache(default_ttl=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("a", 1)
+
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+    assert cache.expirations == 1
+
+def test_overwrite_keeps_size_accounting():
+    cache = SimpleCache(default_ttl=60, sizeof=lambda key, value: len(value))
+    cache.set("a", "x" * 10)
+    cache.set("a", "x" * 4)
+    cache.delete("a")
+    assert cache.size_bytes == 0
+
+def test_byte_budget_evicts_oldest():
+    cache = SimpleCache(default_ttl=60, max_bytes=10, sizeof=lambda key, value: len(value))
+    cache.set("a", "x" * 6)
+    cache.set("b", "x" * 6)
+    assert cache.get("a") is None
+    assert cache.size_bytes == 6
+
+def test_cached_single_flight(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", SimpleCache(default_ttl=60))
+    calls = []
+
+    @cached(ttl=10)
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def run():
+        return await asyncio.gather(*(compute(21) for _ in range(5)))
+
+    assert asyncio.run(run()) == [42] * 5
+    assert calls == [21]
+
+def test_failed_refresh_keeps_serving_the_stale_value(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", SimpleCache(default_ttl=60))
+    results = [1, RuntimeError("database down")]
+
+    @cached(ttl=10, stale_ttl=60)
+    async def stats():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def run():
+        first = await stats()
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 15)
+        stale = await stats()
+        # Let the background refresh fail
+        await asyncio.sleep(0.01)
+        return first, stale, await stats()
+
+    assert asyncio.run(run()) == (1, 1, 1)
+
+def test_service_stats_errors_are_not_cached(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", SimpleCache(default_ttl=60))
+    service = ServiceLogService(FakeDatabase())
+
+    async def failing_totals(days):
+        raise RuntimeError("Event loop is closed")
+
+    service.rollup.get_totals = failing_totals
+
+    async def run():
+        try:
+            await service.get_service_stats(7)
+        except RuntimeError:
+            pass
+        return len(cache_module.cache.cache)
+
+    assert asyncio.run(run()) == 0
+
+def test_entry_size_counts_nested_payload():
+    payload = {"turnos": [{"medico": str(i) * 1000} for i in range(10)]}
+    # 10 distinct 1000-character strings dominate the payload
+    assert 10 * 1000 < default_sizeof("key", payload) < 10 * 1000 * 2
+
+    patient = PatientResponse(
+        documento="12345678",
+        nombre="n" * 500,
+        apellido="Gómez",
+        turno={"medico": "Dr. García", "hora": "10:30", "piso": "Primer Piso"}
+    )
+    assert default_sizeof("12345678", patient) > 500
+
+def test_cache_size_mb_reflects_nested_values():
+    cache = SimpleCache(default_ttl=60)
+    cache.set("big", {"rows": [f"{i:04d}" * 256 for i in range(1024)]})
+    assert cache.stats()["cache_size_mb"] >= 1.0
@@ -0,0 +1,35 @@
+import json
+from types import SimpleNamespace
+
+from utils.command_monitor import CommandMonitor, redact
+
+def run_command(monitor: CommandMonitor, command: dict, duration_ms: float, request_id: int = 1):
+    command_name = next(iter(command))
+    started = SimpleNamespace(command_name=command_name, command=command, connection_id=("db", 27017), request_id=request_id)
+    monitor.started(started)
+    monitor.succeeded(SimpleNamespace(connection_id=("db", 27017), request_id=request_id, duration_micros=int(duration_ms * 1000)))
+
+def test_redact_keeps_field_names_and_operators_only():
+    assert redact({"documento": "30111222", "timestamp": {"$gte": 1}, "$or": [{"estado": "pendiente"}]}) == {
+        "documento": "?", "timestamp": {"$gte": "?"}, "$or": [{"estado": "?"}]
+    }
+
+def test_slow_query_log_holds_no_values():
+    monitor = CommandMonitor(threshold_ms=100, log_size=10)
+    run_command(monitor, {"find": "patients", "filter": {"documento": "30111222"}}, duration_ms=5, request_id=1)
+    run_command(monitor, {
+        "findAndModify": "patients",
+        "query": {"documento": "30111222", "turno.medico": {"$exists": True}},
+        "update": {"$set": {"nombre": "Ana Gómez"}}
+    }, duration_ms=250, request_id=2)
+    run_command(monitor, {"hello": 1}, duration_ms=500, request_id=3)
+
+    slow = monitor.get_slow_queries()
+    assert [(entry["command"], entry["collection"]) for entry in slow] == [("findAndModify", "patients")]
+    assert slow[0]["shape"] == {
+        "filter": {"documento": "?", "turno.medico": {"$exists": "?"}},
+        "update": {"$set": {"nombre": "?"}}
+    }
+    serialized = json.dumps(slow)
+    assert "30111222" not in serialized and "Ana Gómez" not in serialized
+    assert monitor.stats()["in_flight"] == 0
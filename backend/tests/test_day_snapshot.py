@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from services.day_snapshot import DaySnapshot
+from tests.fakes import FakeDatabase
+
+TODAY = "2026-03-02"
+TOMORROW = "2026-03-03"
+NOW = datetime(2026, 3, 2, 12)
+
+def patient(documento: str, fecha: str = TODAY, updated_at: datetime = NOW, **turno) -> dict:
+    return {
+        "documento": documento,
+        "nombre": "Ana",
+        "apellido": "Gómez",
+        "turno": {"medico": "Dr. García", "hora": "10:30", "piso": "Primer Piso", "fecha": fecha, **turno},
+        "updated_at": updated_at
+    }
+
+def snapshot_on(day: str) -> DaySnapshot:
+    snapshot = DaySnapshot(timezone="UTC")
+    snapshot.today = lambda: day
+    return snapshot
+
+def test_load_indexes_only_todays_turnos():
+    db = FakeDatabase()
+    db.patients.documents = [patient("1"), patient("2", fecha=TOMORROW)]
+    snapshot = snapshot_on(TODAY)
+
+    asyncio.run(snapshot.load(db.patients))
+
+    assert snapshot.ready
+    assert snapshot.get("1").turno.medico == "Dr. García"
+    assert snapshot.get("2") is None
+    assert snapshot.watermark == NOW
+
+def test_refresh_picks_up_changes_and_moved_turnos():
+    db = FakeDatabase()
+    db.patients.documents = [patient("1"), patient("2")]
+    snapshot = snapshot_on(TODAY)
+    asyncio.run(snapshot.load(db.patients))
+
+    later = NOW + timedelta(minutes=5)
+    db.patients.documents = [
+        patient("1", updated_at=later, confirmado=True),
+        patient("2", fecha=TOMORROW, updated_at=later),
+        patient("3", updated_at=later)
+    ]
+    asyncio.run(snapshot.refresh(db.patients))
+
+    assert snapshot.get("1").turno.confirmado
+    assert snapshot.get("2") is None
+    assert snapshot.get("3") is not None
+    assert snapshot.watermark == later
+
+def test_refresh_rereads_behind_the_watermark():
+    db = FakeDatabase()
+    db.patients.documents = [patient("1")]
+    snapshot = snapshot_on(TODAY)
+    asyncio.run(snapshot.load(db.patients))
+
+    # Committed after the load by a worker whose clock is 20s behind
+    db.patients.documents.append(patient("2", updated_at=NOW - timedelta(seconds=20)))
+    asyncio.run(snapshot.refresh(db.patients))
+
+    assert snapshot.get("2") is not None
+
+def test_apply_writes_through_todays_turnos_only():
+    db = FakeDatabase()
+    snapshot = snapshot_on(TODAY)
+    asyncio.run(snapshot.load(db.patients))
+
+    snapshot.apply(patient("1", confirmado=True))
+    snapshot.apply(patient("2", fecha=TOMORROW))
+
+    assert snapshot.get("1").turno.confirmado
+    assert snapshot.get("2") is None
+
+def test_midnight_rollover_reloads_the_new_day():
+    db = FakeDatabase()
+    db.patients.documents = [patient("1"), patient("2", fecha=TOMORROW)]
+    snapshot = snapshot_on(TODAY)
+    asyncio.run(snapshot.load(db.patients))
+
+    snapshot.today = lambda: TOMORROW
+    assert not snapshot.ready
+    assert snapshot.get("1") is None
+
+    asyncio.run(snapshot.refresh(db.patients))
+    assert snapshot.day == TOMORROW
+    assert snapshot.get("1") is None
+    assert snapshot.get("2") is not None
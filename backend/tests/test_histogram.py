@@ -0,0 +1,38 @@
+import pytest
+
+from utils.histogram import Histogram, SlidingHistogram, bucket_index, bucket_value
+
+@pytest.mark.parametrize("value", [0, 7, 31, 32, 1000, 123456, 10 ** 8])
+def test_bucket_relative_error(value):
+    assert bucket_value(bucket_index(value)) == pytest.approx(value, rel=0.04, abs=1)
+
+def test_bucket_index_is_monotonic():
+    indexes = [bucket_index(value) for value in range(0, 5000)]
+    assert indexes == sorted(indexes)
+
+def test_quantiles():
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    summary = histogram.summary()
+
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == pytest.approx(50, rel=0.04)
+    assert summary["p99_ms"] == pytest.approx(99, rel=0.04)
+
+def test_merge_and_subtract_round_trip():
+    a, b = Histogram(), Histogram()
+    a.record(0.01)
+    b.record(0.02)
+    a.merge(b)
+    a.subtract(b)
+    assert a.count == 1 and len(a.counts) == 1
+
+def test_sliding_windows_expire_old_samples():
+    histogram = SlidingHistogram(slot_seconds=10, windows={"1m": 60, "5m": 300})
+    histogram.record(0.1, now=1000)
+
+    assert histogram.window("1m", now=1030).count == 1
+    assert histogram.window("1m", now=1080).count == 0
+    assert histogram.window("5m", now=1080).count == 1
+    assert histogram.lifetime.count == 1
@@ -0,0 +1,47 @@
+import asyncio
+
+from config import settings
+from indexes import INDEX_MANIFEST, diff_indexes, manifest_hash
+from tests.fakes import FakeDatabase
+
+WANTED = {
+    "documento_1": ([("documento", 1)], {"unique": True}),
+    "timestamp_1": ([("timestamp", 1)], {"expireAfterSeconds": 3600}),
+    "estado_1": ([("estado", 1)], {})
+}
+
+def test_manifest_hash_is_stable():
+    assert manifest_hash() == manifest_hash(INDEX_MANIFEST)
+    assert manifest_hash(WANTED) != manifest_hash({**WANTED, "extra_1": ([("extra", 1)], {})})
+
+def test_diff_reports_missing_changed_renamed_and_unmanaged():
+    collection = FakeDatabase().patients
+    collection.indexes.update({
+        # Same keys, different options
+        "documento_1": {"name": "documento_1", "key": {"documento": 1.0}},
+        # Same spec under another name
+        "ttl": {"name": "ttl", "key": {"timestamp": 1}, "expireAfterSeconds": 3600.0},
+        "legacy_1": {"name": "legacy_1", "key": {"legacy": 1}}
+    })
+
+    diff = asyncio.run(diff_indexes(collection, WANTED))
+
+    assert diff == {
+        "missing": ["estado_1"],
+        "changed": ["documento_1"],
+        "renamed": ["timestamp_1"],
+        "unmanaged": ["legacy_1"]
+    }
+
+def test_diff_of_provisioned_collection_is_empty():
+    collection = FakeDatabase().patients
+    for name, (keys, options) in WANTED.items():
+        collection.indexes[name] = {"name": name, "key": dict(keys), **options}
+
+    diff = asyncio.run(diff_indexes(collection, WANTED))
+    assert not any(diff.values())
+
+def test_archived_service_logs_have_no_ttl():
+    # With archiving only the archive job deletes service logs
+    has_ttl = "expireAfterSeconds" in INDEX_MANIFEST["service_logs"]["timestamp_1"][1]
+    assert has_ttl != settings.service_logs_archive_enabled
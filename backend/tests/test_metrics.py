@@ -0,0 +1,22 @@
+import time
+
+import server
+from utils.bloom import BloomFilter
+
+def test_metrics_export_filter_and_spool_replay(monkeypatch):
+    documento_filter = BloomFilter(capacity=1000)
+    documento_filter.add("30111222")
+    monkeypatch.setattr(server.known_documents, "filter", documento_filter)
+    monkeypatch.setattr(server.known_documents, "last_sync", time.time())
+    monkeypatch.setattr(server.known_documents, "definite_misses", 3)
+    monkeypatch.setattr(server.known_documents, "false_positives", 1)
+    monkeypatch.setattr(server.service_log_spool, "replayed", 42)
+    monkeypatch.setattr(server.service_log_spool, "last_replay_rate", 1234.5)
+
+    lines = server.registry.render().splitlines()
+
+    assert 'patient_filter_false_positive_rate{kind="observed"} 0.25' in lines
+    assert any(line.startswith('patient_filter_false_positive_rate{kind="estimated"} ') for line in lines)
+    assert f"patient_filter_memory_bytes {documento_filter.memory_bytes()}" in lines
+    assert "service_log_spool_replayed_total 42" in lines
+    assert "service_log_spool_replay_rate 1234.5" in lines
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from services.patient_service import PatientService
+from tests.fakes import FakeDatabase
+from utils.cache import patient_cache
+
+DOCUMENTO = "30444555"
+
+@pytest.fixture
+def service():
+    patient_cache.clear()
+    db = FakeDatabase()
+    asyncio.run(db.patients.insert_one({
+        "documento": DOCUMENTO,
+        "nombre": "Ana",
+        "apellido": "Gómez",
+        "turno": {"medico": "Dr. García", "hora": "10:30", "piso": "Primer Piso", "confirmado": False}
+    }))
+    service = PatientService(db)
+
+    # Count the database round-trips of find_by_document
+    service.reads = 0
+    find_one = db.patients.find_one
+    async def counted_find_one(*args, **kwargs):
+        service.reads += 1
+        return await find_one(*args, **kwargs)
+    db.patients.find_one = counted_find_one
+
+    yield service
+    patient_cache.clear()
+
+def test_repeat_lookup_is_served_from_the_cache(service):
+    first = asyncio.run(service.find_by_document(DOCUMENTO))
+    second = asyncio.run(service.find_by_document(DOCUMENTO))
+
+    assert first == second
+    assert service.reads == 1
+    assert patient_cache.get(DOCUMENTO) == first
+
+def test_confirm_refreshes_the_cached_patient(service):
+    asyncio.run(service.find_by_document(DOCUMENTO))
+    asyncio.run(service.confirm_appointment(DOCUMENTO))
+
+    patient = asyncio.run(service.find_by_document(DOCUMENTO))
+    assert patient.turno.confirmado
+    assert service.reads == 1
+
+def test_update_evicts_the_cached_patient(service):
+    asyncio.run(service.find_by_document(DOCUMENTO))
+    asyncio.run(service.update_patient(DOCUMENTO, {"nombre": "Luisa"}))
+
+    assert patient_cache.get(DOCUMENTO) is None
+    assert asyncio.run(service.find_by_document(DOCUMENTO)).nombre == "Luisa"
+    assert service.reads == 2
+
+def test_delete_evicts_the_cached_patient(service):
+    asyncio.run(service.find_by_document(DOCUMENTO))
+    asyncio.run(service.delete_patient(DOCUMENTO))
+
+    assert patient_cache.get(DOCUMENTO) is None
@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime
+
+from services.patient_service import PatientService
+from tests.fakes import FakeDatabase
+from utils.cache import patient_cache
+
+def patient(documento: str, **changes) -> dict:
+    document = {
+        "documento": documento,
+        "nombre": "Ana",
+        "apellido": "Gómez",
+        "turno": {"medico": "Dr. García", "hora": "10:30", "piso": "Primer Piso", "confirmado": False}
+    }
+    document.update(changes)
+    return document
+
+def test_repeated_confirmation_moves_fecha_confirmacion():
+    db = FakeDatabase()
+    first_confirmation = datetime(2026, 3, 2, 9)
+    turno = {"medico": "Dr. García", "hora": "10:30", "piso": "Primer Piso", "confirmado": True, "fecha_confirmacion": first_confirmation}
+    asyncio.run(db.patients.insert_one(patient("30333444", turno=turno)))
+
+    confirmed = asyncio.run(PatientService(db).confirm_appointment("30333444"))
+    patient_cache.clear()
+
+    assert confirmed.turno.confirmado
+    assert confirmed.turno.fecha_confirmacion > first_confirmation
+    assert db.patients.documents[0]["turno"]["fecha_confirmacion"] == confirmed.turno.fecha_confirmacion
+
+def test_patient_without_turno_is_not_confirmed():
+    db = FakeDatabase()
+    asyncio.run(db.patients.insert_one(patient("30333555", turno=None)))
+
+    assert asyncio.run(PatientService(db).confirm_appointment("30333555")) is None
+    assert db.patients.documents[0]["turno"] is None
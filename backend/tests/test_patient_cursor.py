@@ -0,0 +1,25 @@
+from datetime import datetime
+
+import pytest
+
+from services.patient_service import decode_cursor, encode_cursor
+from tests.fakes import matches
+
+def test_cursor_round_trip_selects_following_patients():
+    created_at = datetime(2026, 5, 1, 8, 30)
+    query = decode_cursor(encode_cursor({"documento": "200", "created_at": created_at}))
+
+    assert matches({"documento": "300", "created_at": created_at}, query)
+    assert matches({"documento": "100", "created_at": datetime(2026, 5, 2)}, query)
+    assert not matches({"documento": "200", "created_at": created_at}, query)
+    assert not matches({"documento": "100", "created_at": created_at}, query)
+
+def test_cursor_without_created_at():
+    query = decode_cursor(encode_cursor({"documento": "200"}))
+    assert matches({"documento": "300", "created_at": None}, query)
+    assert matches({"documento": "100", "created_at": datetime(2026, 5, 1)}, query)
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", "eyJkIjoiMSJ9"])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,45 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import patients as patients_routes
+from services.patient_service import PatientService
+from tests.fakes import FakeDatabase
+
+def patient(documento: str, **changes) -> dict:
+    document = {
+        "documento": documento,
+        "nombre": "Ana",
+        "apellido": "Gómez",
+        "turno": {"medico": "Dr. García", "hora": "10:30", "piso": "Primer Piso"}
+    }
+    document.update(changes)
+    return document
+
+def test_malformed_record_does_not_fail_the_batch():
+    db = FakeDatabase()
+    asyncio.run(db.patients.insert_many([
+        patient("30111222"),
+        # Without turno, and with a turno missing required fields
+        {"documento": "30111333", "nombre": "Luis", "apellido": "Paz"},
+        patient("30111444", turno={"medico": "Dr. García"})
+    ]))
+    app = FastAPI()
+    app.include_router(patients_routes.router)
+    app.dependency_overrides[patients_routes.get_patient_service] = lambda: PatientService(db)
+
+    response = TestClient(app).post(
+        "/api/patients/lookup", json={"documentos": ["30111222", "30111333", "30111444", "30111555"]}
+    )
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["data"]] == ["found", "not_found", "not_found", "not_found"]
+
+def test_batch_matches_single_lookup_for_invalid_records():
+    db = FakeDatabase()
+    asyncio.run(db.patients.insert_one({"documento": "30222333", "nombre": "Luis", "apellido": "Paz"}))
+    service = PatientService(db)
+
+    assert asyncio.run(service.find_by_document("30222333")) is None
+    assert asyncio.run(service.find_many_by_document(["30222333"])) == {"30222333": None}
@@ -0,0 +1,47 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from middleware.pipeline import RequestPipelineMiddleware
+from middleware.security import SECURITY_HEADERS
+from utils.rate_limit import RateLimiter
+
+def client(burst: int = 10) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(
+        RequestPipelineMiddleware,
+        rate_limiter=RateLimiter(endpoint_limits={"/api/limited": {"per_minute": 60, "burst": 1}}, default_per_minute=60, default_burst=burst)
+    )
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    @app.get("/api/limited")
+    async def limited():
+        return {"status": "ok"}
+
+    return TestClient(app)
+
+def test_response_carries_security_rate_limit_and_timing_headers():
+    response = client().get("/api/ping")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+    for name, value in SECURITY_HEADERS.items():
+        assert response.headers[name] == value
+    assert response.headers["x-ratelimit-remaining"] == "9"
+    assert float(response.headers["x-process-time"]) >= 0
+
+def test_route_budget_rejects_with_retry_after():
+    test_client = client()
+    assert test_client.get("/api/limited").status_code == 200
+
+    response = test_client.get("/api/limited")
+    assert response.status_code == 429
+    assert response.json()["detail"]["code"] == "RATE_LIMIT_EXCEEDED"
+    assert response.headers["retry-after"] == "1"
+    # Rejections go through the same send path
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert "x-process-time" in response.headers
+    # Other routes keep their own budget
+    assert test_client.get("/api/ping").status_code == 200
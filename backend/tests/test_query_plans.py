@@ -0,0 +1,189 @@
+"""
+Explain every ServiceLogService query shape against a real MongoDB and assert
+it is answered by an index scan, the hot active-log shapes by the partial
+indexes. Skipped when MONGO_URL is not reachable.
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from config import settings
+from indexes import ACTIVE_SERVICE_LOGS, INDEX_MANIFEST, provision_collection
+from services.service_log_service import ServiceLogService
+
+PLANS_DB_NAME = f"{settings.db_name}_query_plans"
+
+# Partial indexes on active (deleted: False) logs
+ACTIVE_INDEXES = {
+    name for name, (_, options) in INDEX_MANIFEST["service_logs"].items()
+    if options.get("partialFilterExpression") == ACTIVE_SERVICE_LOGS
+}
+
+def mongo_reachable() -> bool:
+    client = MongoClient(settings.mongo_url, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+pytestmark = pytest.mark.skipif(not mongo_reachable(), reason=f"MongoDB not reachable at {settings.mongo_url}")
+
+class RecordedCursor:
+    """Cursor stand-in that records sort/limit and returns no documents"""
+
+    def __init__(self, query: dict):
+        self.query = query
+
+    def sort(self, key, direction=None):
+        self.query["sort"] = dict(key) if isinstance(key, list) else {key: direction}
+        return self
+
+    def limit(self, limit: int):
+        self.query["limit"] = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    async def to_list(self, length=None):
+        return []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+class RecordingCollection:
+    """Captures the explainable command for every query ServiceLogService sends"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.commands = []
+
+    def _record(self, label: str, command: dict) -> dict:
+        self.commands.append((label, command))
+        return command
+
+    def find(self, filter=None, projection=None):
+        return RecordedCursor(self._record("find", {"find": self.name, "filter": filter or {}}))
+
+    async def find_one(self, filter=None, projection=None):
+        self._record("find_one", {"find": self.name, "filter": filter or {}, "limit": 1})
+        return None
+
+    async def find_one_and_update(self, filter, update, **kwargs):
+        self._record("find_one_and_update", {"findAndModify": self.name, "query": filter, "update": update})
+        return None
+
+    async def count_documents(self, filter):
+        self._record("count_documents", {"count": self.name, "query": filter})
+        return 0
+
+    async def update_many(self, filter, update):
+        self._record("update_many", {"update": self.name, "updates": [{"q": filter, "u": update, "multi": True}]})
+
+def command_filter(command: dict) -> dict:
+    return command.get("filter", command.get("query", command.get("updates", [{}])[0].get("q", {})))
+
+def index_scans(plan) -> list:
+    """Names of the indexes scanned anywhere in a (classic or slot based) plan tree"""
+    names = []
+    if isinstance(plan, dict):
+        if plan.get("stage") in ("IXSCAN", "COUNT_SCAN", "DISTINCT_SCAN"):
+            names.append(plan.get("indexName"))
+        if plan.get("stage") == "COLLSCAN":
+            names.append("COLLSCAN")
+        for value in plan.values():
+            names.extend(index_scans(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            names.extend(index_scans(item))
+    return names
+
+def seed_logs(count: int = 2000) -> list:
+    """Mostly deleted logs, so the planner has a reason to prefer the partial indexes"""
+    now = datetime.utcnow()
+    return [
+        {
+            "id": f"service-{i:05d}",
+            "documento": str(12345678 + i % 50),
+            "secretaria": ["pb", "pp", "2p", "3p"][i % 4],
+            "piso": "Planta Baja",
+            "timestamp": now - timedelta(minutes=i),
+            "estado": ["pendiente", "atendido", "cancelado"][i % 3],
+            "deleted": i % 10 != 0
+        }
+        for i in range(count)
+    ]
+
+async def exercise(service: ServiceLogService):
+    """Run every ServiceLogService query shape once"""
+    now = datetime.utcnow()
+    await ServiceLogService.get_service_stats.__wrapped__(service, days=1)
+    await service.get_recent_services()
+    await service.get_recent_services(secretaria="pb")
+    await service.get_recent_services(estado="pendiente")
+    await service.get_recent_services(secretaria="pb", estado="pendiente")
+    await service.get_service_by_id("service-001")
+    await service.get_services_by_document("12345678")
+    await service.get_services_by_date_range(now - timedelta(days=1), now)
+    async for _ in service.iter_services(now - timedelta(days=1), now, secretaria="pb", estado="atendido"):
+        pass
+    await service.get_pending_services_count()
+    await service.update_service_status("service-001", "atendido")
+    await service.delete_service("service-001")
+    await service.bulk_update_status(["service-001", "service-002"], "atendido")
+
+async def explain_all() -> list:
+    client = AsyncIOMotorClient(settings.mongo_url, serverSelectionTimeoutMS=2000)
+    db = client[PLANS_DB_NAME]
+    try:
+        await db.service_logs.drop()
+        result = await provision_collection(db, "service_logs", INDEX_MANIFEST["service_logs"])
+        assert not result["errors"], result["errors"]
+        await db.service_logs.insert_many(seed_logs())
+
+        service = ServiceLogService(db)
+        recorder = service.collection = RecordingCollection(db.service_logs.name)
+        await exercise(service)
+
+        plans = []
+        for label, command in recorder.commands:
+            explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+            plans.append((label, command_filter(command), index_scans(explain["queryPlanner"]["winningPlan"])))
+        return plans
+    finally:
+        await client.drop_database(PLANS_DB_NAME)
+        client.close()
+
+@pytest.fixture(scope="module")
+def plans() -> list:
+    return asyncio.run(explain_all())
+
+def test_every_query_uses_an_index(plans):
+    failures = [
+        f"{label} {json.dumps(filter, default=str)}: {scans or 'no index scan'}"
+        for label, filter, scans in plans
+        if not scans or "COLLSCAN" in scans
+    ]
+    assert not failures, "\n".join(failures)
+
+def test_active_log_queries_use_partial_indexes(plans):
+    # Lookups by service id are served by the unique id_1 index instead
+    hot = [(label, filter, scans) for label, filter, scans in plans if filter.get("deleted") is False and "id" not in filter]
+    assert hot
+    failures = [
+        f"{label} {json.dumps(filter, default=str)}: {scans}"
+        for label, filter, scans in hot
+        if not scans or not set(scans) <= ACTIVE_INDEXES
+    ]
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,32 @@
+from utils.rate_limit import GCRALimiter, RateLimiter
+
+def test_burst_then_reject():
+    limiter = GCRALimiter(per_minute=60, burst=3)
+    results = [limiter.allow("kiosk", now=100.0) for _ in range(4)]
+
+    assert [allowed for allowed, _, _ in results] == [True, True, True, False]
+    assert [remaining for _, remaining, _ in results[:3]] == [2, 1, 0]
+    assert results[3][2] == 1.0
+
+def test_refills_at_the_configured_rate():
+    limiter = GCRALimiter(per_minute=60, burst=1)
+    assert limiter.allow("kiosk", now=100.0)[0]
+    assert not limiter.allow("kiosk", now=100.5)[0]
+    assert limiter.allow("kiosk", now=101.0)[0]
+
+def test_clients_are_independent_and_idle_ones_evicted():
+    limiter = GCRALimiter(per_minute=60, burst=1)
+    assert limiter.allow("a", now=100.0)[0]
+    assert limiter.allow("b", now=100.0)[0]
+    limiter.allow("c", now=200.0)
+    assert "a" not in limiter.tats and "b" not in limiter.tats
+
+def test_longest_prefix_budget_wins():
+    limiter = RateLimiter(
+        {"/api/services": {"per_minute": 10, "burst": 1}, "/api/services/stats": {"per_minute": 5, "burst": 1}},
+        default_per_minute=100,
+        default_burst=10
+    )
+    assert limiter.limiter_for("/api/services/stats")[0] == "/api/services/stats"
+    assert limiter.limiter_for("/api/services/log")[0] == "/api/services"
+    assert limiter.limiter_for("/api/health")[0] == "default"
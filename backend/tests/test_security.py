@@ -0,0 +1,34 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from config import settings
+from middleware.security import require_api_key, validate_api_key
+
+def client() -> TestClient:
+    app = FastAPI()
+
+    @app.post("/admin", dependencies=[Depends(require_api_key)])
+    async def admin():
+        return {"status": "success"}
+
+    return TestClient(app)
+
+def test_only_configured_admin_keys_are_accepted(monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_keys", "s3cret-admin, second-admin")
+
+    assert validate_api_key("s3cret-admin")
+    assert validate_api_key("second-admin")
+    assert not validate_api_key("totem-key-456")
+    assert not validate_api_key("admin-key-123")
+
+def test_no_configured_keys_rejects_everything(monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_keys", None)
+    assert not validate_api_key("admin-key-123")
+    assert not validate_api_key("")
+
+def test_require_api_key(monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_keys", "s3cret-admin")
+
+    assert client().post("/admin", headers={"X-API-Key": "totem-key-456"}).status_code == 401
+    assert client().post("/admin").status_code == 401
+    assert client().post("/admin", headers={"X-API-Key": "s3cret-admin"}).status_code == 200
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import services as services_routes
+from services.service_log_service import ServiceLogService
+from tests.fakes import FakeDatabase
+
+START = datetime(2026, 3, 2, 8)
+
+def client_with_logs(count: int = 1500) -> TestClient:
+    db = FakeDatabase()
+    db.service_logs.documents = [
+        {
+            "id": f"service-{i:05d}",
+            "documento": "12345678",
+            "secretaria": "pb" if i % 2 else "2p",
+            "piso": "Planta Baja",
+            "estado": "pendiente",
+            "timestamp": START + timedelta(seconds=i),
+            "deleted": i % 100 == 0
+        }
+        for i in range(count)
+    ]
+    app = FastAPI()
+    app.include_router(services_routes.router)
+    app.dependency_overrides[services_routes.get_service_log_service] = lambda: ServiceLogService(db)
+    return TestClient(app)
+
+PARAMS = {"start_date": "2026-03-02T00:00:00", "end_date": "2026-03-03T00:00:00"}
+
+def test_ndjson_export_streams_every_active_log_in_order():
+    response = client_with_logs().get("/api/services/export", params=PARAMS)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "content-encoding" not in response.headers
+    services = [json.loads(line) for line in response.text.splitlines()]
+    # More than the old 1000-row cap, soft-deleted logs excluded
+    assert len(services) == 1485
+    assert [service["timestamp"] for service in services] == sorted(service["timestamp"] for service in services)
+
+def test_csv_export_filters_by_secretaria():
+    response = client_with_logs().get("/api/services/export", params={**PARAMS, "format": "csv", "secretaria": "PB"})
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert list(rows[0]) == services_routes.EXPORT_FIELDS
+    assert len(rows) == 750
+    assert {row["secretaria"] for row in rows} == {"pb"}
+
+def test_gzip_export_is_compressed_on_the_fly():
+    plain = client_with_logs().get("/api/services/export", params=PARAMS)
+    compressed = client_with_logs().get("/api/services/export", params={**PARAMS, "gzip": "true"}, headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.status_code == 200
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert int(compressed.num_bytes_downloaded) < len(plain.content)
+    # The client decodes Content-Encoding transparently
+    assert compressed.text == plain.text
+
+def test_export_rejects_an_inverted_date_range():
+    response = client_with_logs(0).get(
+        "/api/services/export", params={"start_date": "2026-03-03T00:00:00", "end_date": "2026-03-02T00:00:00"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["code"] == "INVALID_DATE_RANGE"
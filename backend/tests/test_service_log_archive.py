@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from services.service_log_archive import (
+    ARCHIVE_MARKERS_COLLECTION, ServiceLogArchive, acquire_archive_lease, archive_expired_logs, release_archive_lease
+)
+from tests.fakes import FakeDatabase
+
+def service(id, secretaria, estado="atendido", deleted=False, updated_at=None, hour=9):
+    timestamp = datetime(2026, 1, 10, hour)
+    return {
+        "id": id,
+        "documento": "12345678",
+        "secretaria": secretaria,
+        "piso": "Planta Baja",
+        "estado": estado,
+        "timestamp": timestamp,
+        "created_at": timestamp,
+        "updated_at": updated_at or timestamp,
+        "deleted": deleted
+    }
+
+def test_write_day_partitions_and_counts(tmp_path):
+    archive = ServiceLogArchive(str(tmp_path))
+    rows = archive.write_day("2026-01-10", [
+        service("a", "pb"), service("b", "pb", estado="cancelado"), service("c", "2p"), service("d", "2p", deleted=True)
+    ])
+
+    assert rows == 4
+    assert (tmp_path / "dia=2026-01-10" / "secretaria=pb" / "part-0.parquet").exists()
+    counts = {
+        (row["secretaria"], row["estado"]): row["count"]
+        for row in archive.read_counts("2026-01-10", "2026-01-10").to_dict("records")
+    }
+    assert counts == {("pb", "atendido"): 1, ("pb", "cancelado"): 1, ("2p", "atendido"): 1}
+
+def test_rewriting_a_day_keeps_the_latest_version(tmp_path):
+    archive = ServiceLogArchive(str(tmp_path))
+    archive.write_day("2026-01-10", [service("a", "pb", estado="pendiente")])
+    later = datetime(2026, 1, 10, 9) + timedelta(minutes=5)
+    rows = archive.write_day("2026-01-10", [service("a", "pb", updated_at=later), service("b", "pb")])
+
+    assert rows == 2
+    counts = archive.read_counts("2026-01-10", "2026-01-10").to_dict("records")
+    assert counts == [{"dia": "2026-01-10", "secretaria": "pb", "estado": "atendido", "count": 2}]
+
+def test_read_counts_prunes_by_date_and_secretaria(tmp_path):
+    archive = ServiceLogArchive(str(tmp_path))
+    archive.write_day("2026-01-10", [service("a", "pb"), service("b", "2p")])
+
+    assert archive.read_counts("2026-01-11", "2026-01-12").empty
+    counts = archive.read_counts("2026-01-01", "2026-01-31", secretaria="2p").to_dict("records")
+    assert [row["secretaria"] for row in counts] == ["2p"]
+
+def test_read_counts_without_archive(tmp_path):
+    assert ServiceLogArchive(str(tmp_path / "missing")).read_counts("2026-01-01", "2026-01-31").empty
+
+def test_expired_days_are_deleted_after_their_marker(tmp_path):
+    async def run():
+        db = FakeDatabase()
+        db.service_logs.documents = [service("a", "pb"), service("b", "2p")]
+        recent = service("c", "pb")
+        recent["timestamp"] = datetime(2026, 4, 1, 9)
+        db.service_logs.documents.append(recent)
+
+        markers_at_delete = []
+        delete_many = db.service_logs.delete_many
+        async def record_delete(query):
+            markers_at_delete.append(len(db[ARCHIVE_MARKERS_COLLECTION].documents))
+            return await delete_many(query)
+        db.service_logs.delete_many = record_delete
+
+        report = await archive_expired_logs(db, ServiceLogArchive(str(tmp_path)), now=datetime(2026, 4, 20))
+        return db, report, markers_at_delete
+
+    db, report, markers_at_delete = asyncio.run(run())
+    assert report == {"days": 1, "rows": 2, "deleted": 2}
+    assert markers_at_delete == [1]
+    assert [document["id"] for document in db.service_logs.documents] == ["c"]
+
+def test_one_process_holds_the_archive_lease():
+    async def run():
+        db = FakeDatabase()
+        now = datetime(2026, 4, 20)
+        first = await acquire_archive_lease(db, "host:1", now=now)
+        second = await acquire_archive_lease(db, "host:2", now=now)
+        renewed = await acquire_archive_lease(db, "host:1", now=now + timedelta(hours=6))
+        # The holder died: its lease lapses
+        taken_over = await acquire_archive_lease(db, "host:2", now=now + timedelta(days=1))
+        await release_archive_lease(db, "host:2")
+        released = await acquire_archive_lease(db, "host:3", now=now + timedelta(days=1))
+        return first, second, renewed, taken_over, released
+
+    assert asyncio.run(run()) == (True, False, True, True, True)
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime
+
+from services.service_log_service import ServiceLogService
+from tests.fakes import FakeDatabase
+
+def service_log(id: str, secretaria: str, estado: str = "pendiente", deleted: bool = False) -> dict:
+    return {
+        "id": id, "documento": "12345678", "secretaria": secretaria, "piso": "Planta Baja",
+        "estado": estado, "timestamp": datetime(2026, 3, 2, 9), "deleted": deleted
+    }
+
+def counters(db: FakeDatabase) -> dict:
+    return {(row["secretaria"], row["estado"]): row["count"] for row in db.service_stats_daily.documents}
+
+def test_bulk_update_status_is_one_update_with_exact_rollup_deltas():
+    db = FakeDatabase()
+    db.service_logs.documents = [
+        service_log("a", "pb"), service_log("b", "pb", estado="cancelado"), service_log("c", "2p"),
+        service_log("d", "pb", estado="atendido"), service_log("e", "pb", deleted=True)
+    ]
+    updates = []
+    update_many = db.service_logs.update_many
+    async def recorded_update_many(query, update):
+        updates.append(query)
+        return await update_many(query, update)
+    db.service_logs.update_many = recorded_update_many
+
+    updated = asyncio.run(ServiceLogService(db).bulk_update_status(["a", "b", "c", "d", "e"], "atendido"))
+
+    assert updated == 3
+    assert len(updates) == 1
+    assert [document["estado"] for document in db.service_logs.documents] == ["atendido"] * 4 + ["pendiente"]
+    assert counters(db) == {("pb", "pendiente"): -1, ("pb", "cancelado"): -1, ("pb", "atendido"): 2, ("2p", "pendiente"): -1, ("2p", "atendido"): 1}
+
+def test_bulk_update_status_without_changes_writes_nothing():
+    db = FakeDatabase()
+    db.service_logs.documents = [service_log("a", "pb", estado="atendido")]
+
+    assert asyncio.run(ServiceLogService(db).bulk_update_status(["a"], "atendido")) == 0
+    assert db.service_stats_daily.documents == []
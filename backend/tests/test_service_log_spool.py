@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime
+
+from pymongo.errors import ConnectionFailure
+
+from services import service_log_spool as spool_module
+from services import service_log_writer as writer_module
+from services.service_log_spool import ServiceLogSpool
+from services.service_log_writer import OUTCOME_SPOOLED, ServiceLogWriter
+from services.service_stats_rollup import ServiceStatsRollup
+from tests.fakes import FakeDatabase
+
+def service_log(id: str) -> dict:
+    return {"id": id, "secretaria": "pb", "estado": "pendiente", "timestamp": datetime(2026, 3, 2, 9), "deleted": False}
+
+def counted(db: FakeDatabase) -> int:
+    return sum(row["count"] for row in db.service_stats_daily.documents)
+
+async def healthy() -> bool:
+    return True
+
+def test_batch_committed_with_lost_reply_is_counted_once(tmp_path, monkeypatch):
+    async def run():
+        db = FakeDatabase()
+        db.service_logs.unique_fields = ["_id", "id"]
+        spool = ServiceLogSpool(tmp_path, fsync_interval_ms=1, drain_interval=3600)
+        monkeypatch.setattr(writer_module, "service_log_spool", spool)
+        monkeypatch.setattr(spool_module, "is_database_healthy", healthy)
+        spool.start(db.service_logs)
+        writer = ServiceLogWriter(flush_interval_ms=1)
+        writer.start(db.service_logs)
+
+        # The insert is applied, then the connection drops before the reply
+        db.service_logs.fail_after_insert = ConnectionFailure("connection reset")
+        commits = [await writer.enqueue(service_log(id)) for id in "abc"]
+        outcomes = await asyncio.gather(*commits)
+        before_replay = counted(db)
+
+        replayed = await spool.drain()
+        await writer.stop()
+        await spool.stop()
+        return outcomes, before_replay, replayed, spool.duplicates, counted(db), len(db.service_logs.documents)
+
+    outcomes, before_replay, replayed, duplicates, after_replay, stored = asyncio.run(run())
+    assert outcomes == [OUTCOME_SPOOLED] * 3
+    assert before_replay == 0
+    assert (replayed, duplicates) == (3, 3)
+    assert after_replay == 3
+    assert stored == 3
+
+def test_replaying_a_segment_again_does_not_double_count():
+    async def run():
+        db = FakeDatabase()
+        rollup = ServiceStatsRollup(db)
+        batch = [service_log("a"), service_log("b")]
+        await rollup.record_replayed(batch)
+        # Interrupted after counting, the segment is replayed with one more record
+        await rollup.record_replayed(batch + [service_log("c")])
+        return counted(db)
+
+    assert asyncio.run(run()) == 3
+
+def test_each_worker_spools_to_its_own_directory(tmp_path):
+    async def run():
+        db = FakeDatabase()
+        first = ServiceLogSpool(tmp_path, fsync_interval_ms=1, drain_interval=3600)
+        second = ServiceLogSpool(tmp_path, fsync_interval_ms=1, drain_interval=3600)
+        first.start(db.service_logs)
+        second.start(db.service_logs)
+        await first.append([service_log("a")])
+        await second.append([service_log("b")])
+        directories = (first.directory, second.directory)
+        await first.stop()
+        await second.stop()
+        return directories
+
+    first, second = asyncio.run(run())
+    assert first != second
+    assert {first.parent, second.parent} == {tmp_path}
+
+def test_segments_of_a_stopped_worker_are_replayed_by_the_next_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(spool_module, "is_database_healthy", healthy)
+
+    async def run():
+        db = FakeDatabase()
+        running = ServiceLogSpool(tmp_path, fsync_interval_ms=1, drain_interval=3600)
+        stopped = ServiceLogSpool(tmp_path, fsync_interval_ms=1, drain_interval=3600)
+        running.start(db.service_logs)
+        stopped.start(db.service_logs)
+        await stopped.append([service_log("a"), service_log("b")])
+        await stopped.stop()
+        # A segment spooled before worker slots existed
+        (tmp_path / "segment-00000007.ndjson").write_text((stopped.directory / "segment-00000001.ndjson").read_text())
+
+        restarted = ServiceLogSpool(tmp_path, fsync_interval_ms=1, drain_interval=3600)
+        restarted.start(db.service_logs)
+        depth = restarted.depth
+        replayed = await restarted.drain()
+        await restarted.stop()
+        await running.stop()
+        return depth, replayed, sorted(document["id"] for document in db.service_logs.documents)
+
+    depth, replayed, stored = asyncio.run(run())
+    assert (depth, replayed) == (4, 4)
+    assert stored == ["a", "b"]
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from pymongo.errors import ConnectionFailure
+
+from services.service_log_timeseries import TimeSeriesServiceLogStore, event_version
+from tests.fakes import FakeDatabase
+
+def service_log(id: str) -> dict:
+    timestamp = datetime(2026, 3, 2, 9)
+    return {
+        "id": id, "secretaria": "pb", "estado": "pendiente", "deleted": False,
+        "timestamp": timestamp, "updated_at": timestamp
+    }
+
+def store_for(db: FakeDatabase) -> TimeSeriesServiceLogStore:
+    db.service_state.unique_fields = ["_id", "id"]
+    return TimeSeriesServiceLogStore(db)
+
+def versions(db: FakeDatabase, id: str) -> int:
+    return sum(1 for version in db.service_events.documents if version["id"] == id)
+
+def test_replay_after_failed_event_write_appends_the_first_version():
+    async def run():
+        db = FakeDatabase()
+        store = store_for(db)
+        # An earlier attempt reached service_state but not service_events
+        await db.service_state.insert_one(event_version(service_log("a")))
+
+        await store.insert_many([service_log("a"), service_log("b")])
+        return db
+
+    db = asyncio.run(run())
+    assert versions(db, "a") == 1
+    assert versions(db, "b") == 1
+    assert sorted(document["id"] for document in db.service_state.documents) == ["a", "b"]
+
+def test_replay_after_lost_reply_writes_each_version_once():
+    async def run():
+        db = FakeDatabase()
+        store = store_for(db)
+        db.service_events.fail_after_insert = ConnectionFailure("connection reset")
+        with pytest.raises(ConnectionFailure):
+            await store.insert_many([service_log("a"), service_log("b")])
+
+        await store.insert_many([service_log("a"), service_log("b")])
+        return db
+
+    db = asyncio.run(run())
+    assert versions(db, "a") == 1
+    assert versions(db, "b") == 1
+    assert sorted(document["id"] for document in db.service_state.documents) == ["a", "b"]
+
+def test_replay_does_not_restore_a_resolved_service():
+    async def run():
+        db = FakeDatabase()
+        store = store_for(db)
+        # Committed, then resolved before the lost reply's replay
+        await db.service_events.insert_one(event_version(service_log("a")))
+        await db.service_events.insert_one(event_version(service_log("a"), estado="atendido", updated_at=datetime(2026, 3, 2, 10)))
+
+        await store.insert_many([service_log("a")])
+        return db
+
+    db = asyncio.run(run())
+    assert versions(db, "a") == 2
+    assert db.service_state.documents == []
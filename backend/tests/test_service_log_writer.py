@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import services as services_routes
+from services import service_log_service as service_log_service_module
+from services.service_log_service import ServiceLogService
+from services.service_log_writer import (
+    OUTCOME_COMMITTED, OUTCOME_QUEUED, ServiceLogQueueFull, ServiceLogWriter
+)
+from tests.fakes import FakeDatabase
+
+LOG_REQUEST = {"documento": "12345678", "secretaria": "pb", "piso": "Planta Baja"}
+
+def service_log(id: str) -> dict:
+    return {"id": id, "secretaria": "pb", "estado": "pendiente", "timestamp": datetime(2026, 3, 2, 9)}
+
+class FullWriter:
+    running = True
+
+    async def enqueue(self, document):
+        raise ServiceLogQueueFull(2)
+
+def client_for(db) -> TestClient:
+    app = FastAPI()
+    app.include_router(services_routes.router)
+    app.dependency_overrides[services_routes.get_service_log_service] = lambda: ServiceLogService(db)
+    return TestClient(app)
+
+def test_full_queue_answers_503_with_retry_after(monkeypatch):
+    monkeypatch.setattr(service_log_service_module, "service_log_writer", FullWriter())
+
+    response = client_for(FakeDatabase()).post("/api/services/log", json=LOG_REQUEST)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.json()["detail"]["code"] == "SERVICE_LOG_QUEUE_FULL"
+
+def test_inline_insert_reports_committed(monkeypatch):
+    monkeypatch.setattr(service_log_service_module, "service_log_writer", ServiceLogWriter())
+    db = FakeDatabase()
+
+    response = client_for(db).post("/api/services/log", json=LOG_REQUEST)
+
+    assert response.status_code == 200
+    assert response.json()["outcome"] == OUTCOME_COMMITTED
+    assert response.json()["committed"] is True
+    assert len(db.service_logs.documents) == 1
+
+def test_enqueue_times_out_when_full():
+    async def run():
+        writer = ServiceLogWriter(max_queue=1, enqueue_timeout=0.01)
+        writer.queue = asyncio.Queue(maxsize=1)
+        writer._closed = False
+        await writer.enqueue({"id": "a"})
+        try:
+            await writer.enqueue({"id": "b"})
+        except ServiceLogQueueFull as e:
+            return e.retry_after, writer.rejected
+
+    assert asyncio.run(run()) == (1, 1)
+
+def test_flusher_restarts_after_an_unexpected_error():
+    async def run():
+        db = FakeDatabase()
+        writer = ServiceLogWriter(flush_interval_ms=1)
+        writer.start(db.service_logs)
+        flush = writer._flush
+        calls = []
+
+        async def failing_once(batch):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            await flush(batch)
+
+        writer._flush = failing_once
+        first = await writer.enqueue(service_log("a"))
+        try:
+            await first
+        except RuntimeError:
+            pass
+        second = await writer.enqueue(service_log("b"))
+        outcome = await second
+        running = writer.running
+        await writer.stop()
+        counts = [row["count"] for row in db.service_stats_daily.documents]
+        return outcome, running, writer.restarts, [document["id"] for document in db.service_logs.documents], counts
+
+    assert asyncio.run(run()) == (OUTCOME_COMMITTED, True, 1, ["b"], [1])
+
+def test_queued_outcome_without_wait(monkeypatch):
+    async def run():
+        db = FakeDatabase()
+        writer = ServiceLogWriter(flush_interval_ms=1)
+        monkeypatch.setattr(service_log_service_module, "service_log_writer", writer)
+        writer.start(db.service_logs)
+        service_log, outcome = await ServiceLogService(db).log_service_request(
+            service_log_service_module.ServiceLogCreate(**LOG_REQUEST)
+        )
+        await writer.stop()
+        return outcome, len(db.service_logs.documents)
+
+    assert asyncio.run(run()) == (OUTCOME_QUEUED, 1)
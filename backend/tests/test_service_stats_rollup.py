@@ -0,0 +1,20 @@
+import asyncio
+from datetime import datetime
+
+from services.service_stats_rollup import ServiceStatsRollup
+from tests.fakes import FakeDatabase
+
+def test_totals_cover_exactly_the_last_days_including_today():
+    db = FakeDatabase()
+    db.service_stats_daily.documents = [
+        {"dia": dia, "secretaria": "pb", "estado": "atendido", "count": 1}
+        for dia in ("2026-03-01", "2026-03-02", "2026-03-07", "2026-03-08")
+    ]
+
+    total, por_secretaria, por_dia = asyncio.run(
+        ServiceStatsRollup(db).get_totals(days=7, now=datetime(2026, 3, 8, 15))
+    )
+
+    assert total == 3
+    assert por_secretaria == {"pb": 3}
+    assert list(por_dia) == ["2026-03-02", "2026-03-07", "2026-03-08"]
@@ -0,0 +1,210 @@
+from typing import Dict, Optional, Set
+from datetime import datetime, timedelta
+import hashlib
+import math
+import sys
+import time
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Incremental syncs re-read this far behind the created_at watermark, for
+# clock skew between writers and inserts committed out of created_at order
+SYNC_OVERLAP_SECONDS = 60
+
+class BloomFilter:
+    """Fixed-size Bloom filter for string keys"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+
+        # Optimal number of bits and hash functions for the given capacity
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        """Derive the bit positions of an item using double hashing"""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        """Add an item to the filter"""
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        """False means the item was definitely never added"""
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def estimated_false_positive_rate(self) -> float:
+        """Theoretical false positive rate for the current fill level"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def memory_bytes(self) -> int:
+        """Memory used by the bit array"""
+        return sys.getsizeof(self.bits)
+
+class DocumentFilter:
+    """Negative lookup layer over the documentos stored in a collection"""
+
+    def __init__(self, error_rate: float = 0.01, min_capacity: int = 10000, max_staleness: Optional[float] = None):
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        # Misses are only trusted within max_staleness seconds of the last sync
+        self.max_staleness = max_staleness
+        self.filter: Optional[BloomFilter] = None
+        self.last_rebuild: Optional[float] = None
+        self.last_sync: Optional[float] = None
+        # Highest created_at seen so far, used for incremental syncs
+        self.watermark: Optional[datetime] = None
+        # Documentos added while a rebuild is scanning the collection
+        self._pending: Optional[Set[str]] = None
+        self.definite_misses = 0
+        self.stale_misses = 0
+        self.false_positives = 0
+
+    @property
+    def ready(self) -> bool:
+        """Whether the filter has been built and can answer lookups"""
+        return self.filter is not None
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the filter was synced recently enough to trust a miss"""
+        if self.filter is None:
+            return False
+        return self.max_staleness is None or time.time() - self.last_sync <= self.max_staleness
+
+    def _advance_watermark(self, created_at: Optional[datetime]):
+        if isinstance(created_at, datetime) and (self.watermark is None or created_at > self.watermark):
+            self.watermark = created_at
+
+    def might_contain(self, documento: str) -> bool:
+        """False only when the documento is definitely not in the collection"""
+        if self.filter is None or documento in self.filter:
+            return True
+        if not self.fresh:
+            # Syncs stopped (e.g. database errors): patients may exist that the filter never saw
+            self.stale_misses += 1
+            return True
+        self.definite_misses += 1
+        return False
+
+    def add(self, documento: str):
+        """Register a documento that now exists in the collection"""
+        if self._pending is not None:
+            self._pending.add(documento)
+        if self.filter is not None:
+            self.filter.add(documento)
+
+    def record_false_positive(self, documento: str):
+        """Record a lookup that the database did not find, if the filter let it through"""
+        if self.filter is not None and documento in self.filter:
+            self.false_positives += 1
+
+    async def rebuild(self, collection):
+        """Rebuild the filter from every documento in the collection"""
+        try:
+            start_time = time.time()
+            # Fallback watermark when no patient has a created_at
+            started_at = datetime.utcnow()
+            self._pending = set()
+
+            total = await collection.estimated_document_count()
+            new_filter = BloomFilter(max(self.min_capacity, total * 2), self.error_rate)
+            watermark = None
+
+            async for doc in collection.find({}, {"_id": 0, "documento": 1, "created_at": 1}):
+                if doc.get("documento"):
+                    new_filter.add(doc["documento"])
+                created_at = doc.get("created_at")
+                if isinstance(created_at, datetime) and (watermark is None or created_at > watermark):
+                    watermark = created_at
+
+            for documento in self._pending:
+                new_filter.add(documento)
+
+            self.filter = new_filter
+            self.watermark = watermark or started_at
+            self.last_rebuild = time.time()
+            self.last_sync = start_time
+            logger.info(
+                f"Document filter rebuilt: {new_filter.count} documentos in "
+                f"{(self.last_rebuild - start_time) * 1000:.1f}ms"
+            )
+
+        except Exception as e:
+            logger.error(f"Error rebuilding document filter: {e}")
+        finally:
+            self._pending = None
+
+    async def sync(self, collection):
+        """
+        Add documentos created since the last sync (created_at watermark), so
+        patients inserted by other workers, scripts or directly in MongoDB are
+        known within seconds. Patients without created_at wait for a rebuild.
+        """
+        if self.filter is None:
+            await self.rebuild(collection)
+            return
+
+        try:
+            start_time = time.time()
+            added = 0
+            since = self.watermark - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+
+            # Served by the (created_at, documento) index
+            async for doc in collection.find({"created_at": {"$gte": since}}, {"_id": 0, "documento": 1, "created_at": 1}):
+                documento = doc.get("documento")
+                if documento and documento not in self.filter:
+                    self.filter.add(documento)
+                    added += 1
+                self._advance_watermark(doc.get("created_at"))
+
+            self.last_sync = start_time
+            if added:
+                logger.info(f"Document filter synced: {added} new documentos")
+
+        except Exception as e:
+            logger.error(f"Error syncing document filter: {e}")
+
+    def stats(self) -> Dict:
+        """Get filter statistics"""
+        if self.filter is None:
+            return {"ready": False}
+
+        checked_misses = self.definite_misses + self.false_positives
+
+        return {
+            "ready": True,
+            "documentos": self.filter.count,
+            "capacity": self.filter.capacity,
+            "num_bits": self.filter.num_bits,
+            "num_hashes": self.filter.num_hashes,
+            "memory_kb": round(self.filter.memory_bytes() / 1024, 2),
+            "estimated_false_positive_rate": round(self.filter.estimated_false_positive_rate(), 6),
+            "observed_false_positive_rate": round(self.false_positives / checked_misses, 6) if checked_misses else 0.0,
+            "definite_misses": self.definite_misses,
+            "stale_misses": self.stale_misses,
+            "false_positives": self.false_positives,
+            "fresh": self.fresh,
+            "last_rebuild": self.last_rebuild,
+            "last_sync": self.last_sync
+        }
+
+# Global filter over patients.documento (soft-deleted patients are still
+# returned by lookups, so they stay in the filter until the next rebuild).
+# A miss is trusted while the filter missed at most a few syncs.
+known_documents = DocumentFilter(max_staleness=settings.document_filter_sync_seconds * 3)
@@ -1,50 +1,155 @@
-from typing import Any, Optional, Dict
+from typing import Any, Callable, Optional, Dict, List, Tuple
+from collections import OrderedDict
+import asyncio
+import functools
+import heapq
 import json
+import sys
 import time
+import types
 import logging
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+def deep_sizeof(obj: Any) -> int:
+    """
+    Recursive size estimate of an object graph: containers, pydantic models
+    and other objects with __dict__ or __slots__. Shared objects count once.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, (str, bytes, bytearray, int, float, bool, type(None), datetime)):
+            continue
+        if isinstance(current, (type, types.ModuleType, types.FunctionType)):
+            # Shared by every entry, not owned by this one
+            size -= sys.getsizeof(current)
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+def default_sizeof(key: str, value: Any) -> int:
+    """Size estimate of a cache entry (key + everything the value references)"""
+    return sys.getsizeof(key) + deep_sizeof(value)
+
+class CacheEntry:
+    """Single cache entry"""
+    
+    __slots__ = ("value", "expires_at", "created_at", "size")
+    
+    def __init__(self, value: Any, expires_at: float, created_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.created_at = created_at
+        self.size = size
+
 class SimpleCache:
-    """Simple in-memory cache implementation"""
+    """
+    Bounded in-memory cache with LRU eviction and TTL expiry
     
-    def __init__(self, default_ttl: int = 300):  # 5 minutes default
-        self.cache: Dict[str, Dict] = {}
+    Entries live in an OrderedDict in least-recently-used order (O(1) get/set/evict).
+    Expiry times are kept in a min-heap, so expired entries are purged in
+    O(log n) each without scanning the whole cache.
+    """
+    
+    def __init__(
+        self,
+        default_ttl: int = 300,  # 5 minutes default
+        max_entries: int = 10000,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[str, Any], int] = default_sizeof
+    ):
+        self.cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
         self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        # (expires_at, key); entries overwritten or deleted leave stale items behind
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
-    def _is_expired(self, cache_entry: Dict) -> bool:
+    def _is_expired(self, cache_entry: CacheEntry) -> bool:
         """Check if cache entry is expired"""
-        return time.time() > cache_entry["expires_at"]
+        return time.time() > cache_entry.expires_at
+
+    def _remove(self, key: str) -> Optional[CacheEntry]:
+        cache_entry = self.cache.pop(key, None)
+        if cache_entry is not None:
+            self.size_bytes -= cache_entry.size
+        return cache_entry
 
     def _clean_expired(self):
-        """Remove expired entries"""
+        """Remove expired entries from the top of the expiry heap"""
         current_time = time.time()
-        expired_keys = [
-            key for key, value in self.cache.items()
-            if current_time > value["expires_at"]
-        ]
+        removed = 0
+        
+        while self._expiry_heap and self._expiry_heap[0][0] < current_time:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+            cache_entry = self.cache.get(key)
+            # Skip heap items left behind by overwritten or deleted keys
+            if cache_entry is not None and cache_entry.expires_at == expires_at:
+                self._remove(key)
+                removed += 1
         
-        for key in expired_keys:
-            del self.cache[key]
+        self.expirations += removed
+        if removed:
+            logger.debug(f"Cleaned {removed} expired cache entries")
         
-        if expired_keys:
-            logger.debug(f"Cleaned {len(expired_keys)} expired cache entries")
+        # Rebuild the heap when stale items outnumber live entries
+        if len(self._expiry_heap) > 2 * len(self.cache) + 64:
+            self._expiry_heap = [(entry.expires_at, key) for key, entry in self.cache.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _evict(self):
+        """Evict least recently used entries until within the configured bounds"""
+        while self.cache and (
+            len(self.cache) > self.max_entries or
+            (self.max_bytes is not None and self.size_bytes > self.max_bytes)
+        ):
+            key, cache_entry = self.cache.popitem(last=False)
+            self.size_bytes -= cache_entry.size
+            self.evictions += 1
 
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
         try:
-            if key not in self.cache:
+            cache_entry = self.cache.get(key)
+            if cache_entry is None:
+                self.misses += 1
                 return None
             
-            cache_entry = self.cache[key]
-            
             if self._is_expired(cache_entry):
-                del self.cache[key]
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
                 return None
             
+            self.cache.move_to_end(key)
+            self.hits += 1
             logger.debug(f"Cache hit: {key}")
-            return cache_entry["value"]
+            return cache_entry.value
             
         except Exception as e:
             logger.error(f"Cache get error: {e}")
@@ -54,19 +159,19 @@ class SimpleCache:
         """Set value in cache"""
         try:
             ttl = ttl or self.default_ttl
-            expires_at = time.time() + ttl
+            current_time = time.time()
+            expires_at = current_time + ttl
             
-            self.cache[key] = {
-                "value": value,
-                "expires_at": expires_at,
-                "created_at": time.time()
-            }
+            self._remove(key)
+            cache_entry = CacheEntry(value, expires_at, current_time, self.sizeof(key, value))
+            self.cache[key] = cache_entry
+            self.size_bytes += cache_entry.size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
             
             logger.debug(f"Cache set: {key} (TTL: {ttl}s)")
             
-            # Periodically clean expired entries
-            if len(self.cache) % 100 == 0:
-                self._clean_expired()
+            self._clean_expired()
+            self._evict()
                 
             return True
             
@@ -77,8 +182,7 @@ class SimpleCache:
     def delete(self, key: str) -> bool:
         """Delete key from cache"""
         try:
-            if key in self.cache:
-                del self.cache[key]
+            if self._remove(key) is not None:
                 logger.debug(f"Cache delete: {key}")
                 return True
             return False
@@ -92,6 +196,8 @@ class SimpleCache:
         try:
             count = len(self.cache)
             self.cache.clear()
+            self._expiry_heap.clear()
+            self.size_bytes = 0
             logger.info(f"Cache cleared: {count} entries removed")
             return True
             
@@ -102,19 +208,20 @@ class SimpleCache:
     def stats(self) -> Dict:
         """Get cache statistics"""
         try:
-            total_entries = len(self.cache)
-            current_time = time.time()
-            
-            expired_count = sum(
-                1 for entry in self.cache.values()
-                if current_time > entry["expires_at"]
-            )
+            self._clean_expired()
+            lookups = self.hits + self.misses
             
             return {
-                "total_entries": total_entries,
-                "active_entries": total_entries - expired_count,
-                "expired_entries": expired_count,
-                "cache_size_mb": len(str(self.cache)) / 1024 / 1024
+                "total_entries": len(self.cache),
+                "active_entries": len(self.cache),
+                "expired_entries": self.expirations,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "cache_size_mb": round(self.size_bytes / 1024 / 1024, 4),
+                "max_size_mb": round(self.max_bytes / 1024 / 1024, 4) if self.max_bytes else None
             }
             
         except Exception as e:
@@ -124,6 +231,10 @@ class SimpleCache:
 # Global cache instance
 cache = SimpleCache(default_ttl=300)  # 5 minutes default TTL
 
+# Read-through cache for patient lookups, keyed by cleaned documento.
+# Short TTL because patients can also be changed outside the API (seed scripts).
+patient_cache = SimpleCache(default_ttl=120, max_entries=50000)
+
 def cache_key(*args, **kwargs) -> str:
     """Generate cache key from arguments"""
     try:
@@ -134,22 +245,54 @@ def cache_key(*args, **kwargs) -> str:
     except Exception:
         return str(hash(str(args) + str(sorted(kwargs.items()))))
 
-def cached(ttl: int = 300):
-    """Decorator for caching function results"""
+def cached(ttl: int = 300, stale_ttl: int = 0, key_func: Optional[Callable[..., str]] = None):
+    """
+    Decorator for caching function results
+    
+    - Concurrent misses for the same key share a single in-flight call.
+    - With stale_ttl, an expired value is still served for up to stale_ttl
+      seconds while one background call refreshes it.
+    - key_func builds the key from the call arguments (e.g. to skip `self`).
+    """
     def decorator(func):
+        in_flight: Dict[str, asyncio.Task] = {}
+        
+        async def compute(key: str, args, kwargs):
+            try:
+                result = await func(*args, **kwargs)
+                cache.set(key, {"value": result, "fresh_until": time.time() + ttl}, ttl + stale_ttl)
+                return result
+            finally:
+                in_flight.pop(key, None)
+        
+        def log_refresh_error(task: asyncio.Task):
+            if not task.cancelled() and task.exception():
+                logger.error(f"Cache refresh error in {func.__name__}: {task.exception()}")
+        
+        def single_flight(key: str, args, kwargs) -> asyncio.Task:
+            task = in_flight.get(key)
+            if task is None:
+                task = asyncio.create_task(compute(key, args, kwargs))
+                task.add_done_callback(log_refresh_error)
+                in_flight[key] = task
+            return task
+        
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             # Generate cache key
-            key = f"func:{func.__name__}:" + cache_key(*args, **kwargs)
-            
-            # Try to get from cache
-            result = cache.get(key)
-            if result is not None:
-                return result
+            if key_func:
+                key = f"func:{func.__name__}:" + key_func(*args, **kwargs)
+            else:
+                key = f"func:{func.__name__}:" + cache_key(*args, **kwargs)
             
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            cache.set(key, result, ttl)
+            # Try to get from cache, revalidating in the background when stale
+            entry = cache.get(key)
+            if entry is not None:
+                if time.time() >= entry["fresh_until"]:
+                    single_flight(key, args, kwargs)
+                return entry["value"]
             
-            return result
+            # Shield so a cancelled caller does not cancel the shared computation
+            return await asyncio.shield(single_flight(key, args, kwargs))
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,163 @@
+from pymongo import monitoring
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import time
+import logging
+
+from config import settings
+from utils.histogram import SlidingHistogram
+from utils.prometheus import registry
+
+logger = logging.getLogger(__name__)
+
+# Handshake, auth and session housekeeping are not application queries
+IGNORED_COMMANDS = frozenset({
+    "hello", "ismaster", "isMaster", "saslStart", "saslContinue", "authenticate",
+    "getnonce", "endSessions", "killCursors", "buildInfo"
+})
+
+# Where each command keeps the filter worth showing in the slow query log
+FILTER_FIELDS = {
+    "find": lambda command: {"filter": command.get("filter"), "sort": command.get("sort")},
+    "count": lambda command: {"filter": command.get("query")},
+    "distinct": lambda command: {"key": command.get("key"), "filter": command.get("query")},
+    "findAndModify": lambda command: {"filter": command.get("query"), "update": command.get("update")},
+    "aggregate": lambda command: {"pipeline": command.get("pipeline")},
+    "update": lambda command: {"filter": [u.get("q") for u in command.get("updates", [])[:3]]},
+    "delete": lambda command: {"filter": [d.get("q") for d in command.get("deletes", [])[:3]]},
+    "insert": lambda command: {"documents": len(command.get("documents", []))}
+}
+
+mongodb_command_duration_seconds = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by command and collection",
+    ("command", "collection"),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+mongodb_commands_failed_total = registry.counter(
+    "mongodb_commands_failed_total", "MongoDB commands that failed by command and collection", ("command", "collection")
+)
+mongodb_slow_queries_total = registry.counter(
+    "mongodb_slow_queries_total", "MongoDB commands slower than the slow query threshold", ("command", "collection")
+)
+
+def redact(value: Any, depth: int = 0) -> Any:
+    """Keep field names and operators, replace every value with '?'"""
+    if depth > 8:
+        return "..."
+    if isinstance(value, dict):
+        return {key: redact(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item, depth + 1) for item in value[:5]]
+    return "?"
+
+def command_collection(command_name: str, command: Dict) -> str:
+    """Collection targeted by a command, '-' for database level commands"""
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    Per-command latency histograms and a slow query ring buffer fed by driver
+    command events. Callbacks run on the driver's threads, so all state is
+    guarded by a lock; the work per command is a dict pop and a few counters.
+    """
+
+    def __init__(self, threshold_ms: float = settings.slow_query_threshold_ms,
+                 log_size: int = settings.slow_query_log_size):
+        self.threshold = threshold_ms / 1000
+        self.slow_queries: deque = deque(maxlen=log_size)
+        self.histograms: Dict[Tuple[str, str], SlidingHistogram] = {}
+        self.failures = 0
+        self.listeners: List[Callable[[float], None]] = []
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[float], None]):
+        """Call `listener(seconds)` for every completed command (e.g. HealthMonitor.record_db_query)"""
+        self.listeners.append(listener)
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection = command_collection(event.command_name, event.command)
+        # Keep a reference only; the command is redacted if it turns out slow
+        self._pending[(event.connection_id, event.request_id)] = (event.command_name, collection, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        command_name, collection, command = pending
+        duration = event.duration_micros / 1_000_000
+
+        with self._lock:
+            key = (command_name, collection)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = SlidingHistogram()
+            histogram.record(duration)
+            mongodb_command_duration_seconds.labels(command_name, collection).observe(duration)
+            if failed:
+                self.failures += 1
+                mongodb_commands_failed_total.labels(command_name, collection).inc()
+            if duration >= self.threshold:
+                mongodb_slow_queries_total.labels(command_name, collection).inc()
+                self.slow_queries.append(self._slow_entry(command_name, collection, command, duration, failed))
+
+        for listener in self.listeners:
+            try:
+                listener(duration)
+            except Exception as e:
+                logger.error(f"Command monitor listener error: {e}")
+
+    def _slow_entry(self, command_name: str, collection: str, command: Dict, duration: float, failed: bool) -> Dict:
+        extract = FILTER_FIELDS.get(command_name)
+        try:
+            shape = redact({key: value for key, value in extract(command).items() if value is not None}) if extract else None
+        except Exception:
+            shape = None
+        logger.warning(f"Slow MongoDB {command_name} on {collection}: {duration * 1000:.1f}ms {shape}")
+        return {
+            "timestamp": datetime.utcnow().isoformat(),
+            "command": command_name,
+            "collection": collection,
+            "duration_ms": round(duration * 1000, 2),
+            "failed": failed,
+            "shape": shape
+        }
+
+    def get_slow_queries(self, limit: Optional[int] = None) -> List[Dict]:
+        """Most recent slow queries first"""
+        with self._lock:
+            entries = list(self.slow_queries)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def stats(self) -> Dict:
+        """Per command/collection latency summaries over the last 5 minutes"""
+        now = time.time()
+        with self._lock:
+            commands = {
+                f"{command_name} {collection}": histogram.window("5m", now).summary()
+                for (command_name, collection), histogram in self.histograms.items()
+            }
+            return {
+                "slow_query_threshold_ms": round(self.threshold * 1000, 2),
+                "slow_queries_logged": len(self.slow_queries),
+                "failures": self.failures,
+                "in_flight": len(self._pending),
+                "commands": commands
+            }
+
+# Global command monitor, registered on the Motor client in database.py
+command_monitor = CommandMonitor()
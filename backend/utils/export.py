@@ -0,0 +1,56 @@
+from typing import AsyncIterator, Dict, Sequence
+from datetime import datetime
+import csv
+import io
+import json
+import zlib
+
+# Rows are buffered into chunks of about this size before being sent
+CHUNK_SIZE = 64 * 1024
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+async def ndjson_chunks(documents: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    """One JSON document per line"""
+    buffer = []
+    size = 0
+    async for document in documents:
+        line = json.dumps(document, default=_json_default, ensure_ascii=False) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+async def csv_chunks(documents: AsyncIterator[Dict], fields: Sequence[str]) -> AsyncIterator[bytes]:
+    """CSV with a header row; fields missing from a document are left empty"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(fields)
+    async for document in documents:
+        writer.writerow([_csv_value(document.get(field)) for field in fields])
+        if output.tell() >= CHUNK_SIZE:
+            yield output.getvalue().encode("utf-8")
+            output.seek(0)
+            output.truncate()
+    if output.tell():
+        yield output.getvalue().encode("utf-8")
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 5) -> AsyncIterator[bytes]:
+    """Gzip a byte stream on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,164 @@
+from typing import Dict, Optional, Tuple, Iterable
+from collections import deque
+import time
+
+# Log-linear (HDR-style) bucketing of latencies in microseconds: values below
+# SUB_BUCKETS are exact, above that each power of two is split into
+# SUB_BUCKETS / 2 linear buckets, i.e. at most ~3% relative error
+SIGNIFICANT_BITS = 5
+SUB_BUCKETS = 1 << SIGNIFICANT_BITS
+HALF_SUB_BUCKETS = SUB_BUCKETS >> 1
+
+def bucket_index(value_us: int) -> int:
+    """Bucket of a non-negative integer value"""
+    if value_us < SUB_BUCKETS:
+        return value_us
+    shift = value_us.bit_length() - SIGNIFICANT_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF_SUB_BUCKETS + ((value_us >> shift) - HALF_SUB_BUCKETS)
+
+def bucket_value(index: int) -> float:
+    """Midpoint of a bucket, used as the representative value"""
+    if index < SUB_BUCKETS:
+        return float(index)
+    shift = (index - SUB_BUCKETS) // HALF_SUB_BUCKETS + 1
+    mantissa = (index - SUB_BUCKETS) % HALF_SUB_BUCKETS + HALF_SUB_BUCKETS
+    return ((mantissa << shift) + ((mantissa + 1) << shift)) / 2
+
+class Histogram:
+    """Sparse, mergeable latency histogram (bucket index -> count)"""
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, index: int, value: float, n: int = 1):
+        """Add n occurrences of an already bucketed value (seconds)"""
+        self.counts[index] = self.counts.get(index, 0) + n
+        self.count += n
+        self.total += value * n
+
+    def record(self, value: float):
+        """Record a latency in seconds"""
+        self.add(bucket_index(int(value * 1_000_000)), value)
+
+    def merge(self, other: "Histogram"):
+        """Add every count of another histogram"""
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+
+    def subtract(self, other: "Histogram"):
+        """Remove the counts of a histogram previously merged into this one"""
+        for index, n in other.counts.items():
+            remaining = self.counts.get(index, 0) - n
+            if remaining > 0:
+                self.counts[index] = remaining
+            else:
+                self.counts.pop(index, None)
+        self.count -= other.count
+        self.total -= other.total
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[float, float]:
+        """Values (seconds) at the given quantiles with a single pass over the buckets"""
+        result = {q: 0.0 for q in qs}
+        if not self.count:
+            return result
+
+        pending = sorted(result)
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            while pending and cumulative >= pending[0] * self.count:
+                result[pending.pop(0)] = bucket_value(index) / 1_000_000
+            if not pending:
+                break
+        for q in pending:
+            result[q] = bucket_value(max(self.counts)) / 1_000_000
+        return result
+
+    def summary(self) -> Dict[str, float]:
+        """Count, mean and common percentiles in milliseconds"""
+        q = self.quantiles((0.5, 0.95, 0.99))
+        return {
+            "count": self.count,
+            "average_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(q[0.5] * 1000, 2),
+            "p95_ms": round(q[0.95] * 1000, 2),
+            "p99_ms": round(q[0.99] * 1000, 2)
+        }
+
+class _Slot:
+    __slots__ = ("slot_id", "histogram", "windows")
+
+    def __init__(self, slot_id: int, windows: Tuple[int, ...]):
+        self.slot_id = slot_id
+        self.histogram = Histogram()
+        # Windows (in slots) this slot is still counted in, smallest first
+        self.windows = list(windows)
+
+class SlidingHistogram:
+    """
+    Latency histogram over rolling windows (default 1m/5m/1h).
+
+    Samples go into fixed-length time slots and into one running total per
+    window, so recording is O(1) and reading a window never re-merges slots.
+    When a slot ages out of a window its counts are subtracted once.
+    """
+
+    WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+
+    def __init__(self, slot_seconds: int = 10, windows: Optional[Dict[str, int]] = None):
+        self.slot_seconds = slot_seconds
+        self.windows = windows or self.WINDOWS
+        # One extra slot so a window always covers its full duration plus the current partial slot
+        self._window_slots = {name: seconds // slot_seconds + 1 for name, seconds in self.windows.items()}
+        self._slot_windows = tuple(sorted(self._window_slots.values()))
+        self._slot_names = {slots: name for name, slots in self._window_slots.items()}
+        self.totals = {name: Histogram() for name in self.windows}
+        self.slots: deque = deque()
+        self.lifetime = Histogram()
+        self.min = None
+        self.max = None
+
+    def _advance(self, now: float) -> int:
+        """Move to the slot of `now` and expire slots that left each window"""
+        slot_id = int(now // self.slot_seconds)
+        if self.slots and self.slots[-1].slot_id == slot_id:
+            return slot_id
+
+        for slot in self.slots:
+            age = slot_id - slot.slot_id
+            while slot.windows and age >= slot.windows[0]:
+                self.totals[self._slot_names[slot.windows.pop(0)]].subtract(slot.histogram)
+        while self.slots and not self.slots[0].windows:
+            self.slots.popleft()
+
+        self.slots.append(_Slot(slot_id, self._slot_windows))
+        return slot_id
+
+    def record(self, value: float, now: Optional[float] = None):
+        """Record a latency in seconds"""
+        self._advance(time.time() if now is None else now)
+        index = bucket_index(int(value * 1_000_000))
+        self.slots[-1].histogram.add(index, value)
+        for total in self.totals.values():
+            total.add(index, value)
+        self.lifetime.add(index, value)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def window(self, name: str, now: Optional[float] = None) -> Histogram:
+        """Histogram of the samples in a rolling window"""
+        self._advance(time.time() if now is None else now)
+        return self.totals[name]
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """Per-window summaries"""
+        now = time.time() if now is None else now
+        return {name: self.window(name, now).summary() for name in self.windows}
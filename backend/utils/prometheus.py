@@ -0,0 +1,175 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import bisect
+import math
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Child:
+    """One labelled series; caches its rendered lines until its value changes"""
+
+    __slots__ = ("family", "labels", "value", "_version", "_rendered_version", "_text")
+
+    def __init__(self, family: "MetricFamily", labels: Tuple[str, ...]):
+        self.family = family
+        self.labels = labels
+        self.value = 0.0
+        self._version = 0
+        self._rendered_version = -1
+        self._text = ""
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+        self._version += 1
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+        self._version += 1
+
+    def set(self, value: float):
+        if value != self.value:
+            self.value = value
+            self._version += 1
+
+    def _render_lines(self) -> str:
+        return f"{self.family.name}{_label_text(self.family.labelnames, self.labels)} {_format_value(self.value)}\n"
+
+    def render(self) -> str:
+        if self._rendered_version != self._version:
+            self._text = self._render_lines()
+            self._rendered_version = self._version
+        return self._text
+
+class _HistogramChild(_Child):
+    """Cumulative Prometheus histogram with fixed upper bounds"""
+
+    __slots__ = ("bucket_counts", "sum", "count")
+
+    def __init__(self, family: "MetricFamily", labels: Tuple[str, ...]):
+        super().__init__(family, labels)
+        self.bucket_counts = [0] * (len(family.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.family.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self._version += 1
+
+    def _render_lines(self) -> str:
+        name = self.family.name
+        names = self.family.labelnames
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.family.buckets + (math.inf,), self.bucket_counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_label_text(names, self.labels, le)} {cumulative}\n")
+        labels = _label_text(names, self.labels)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}\n")
+        lines.append(f"{name}_count{labels} {self.count}\n")
+        return "".join(lines)
+
+class MetricFamily:
+    """A named metric with a fixed set of label names"""
+
+    def __init__(self, name: str, documentation: str, metric_type: str,
+                 labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.children: Dict[Tuple[str, ...], _Child] = {}
+        self._header = f"# HELP {name} {documentation}\n# TYPE {name} {metric_type}\n"
+        self._lock = threading.Lock()
+        self._unlabelled = None if self.labelnames else self.labels()
+
+    def labels(self, *values: str) -> _Child:
+        """Get (or create) the series for the given label values"""
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            with self._lock:
+                child = self.children.get(key)
+                if child is None:
+                    child_class = _HistogramChild if self.metric_type == "histogram" else _Child
+                    child = self.children[key] = child_class(self, key)
+        return child
+
+    # Shortcuts for metrics without labels
+    def inc(self, amount: float = 1):
+        self._unlabelled.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._unlabelled.dec(amount)
+
+    def set(self, value: float):
+        self._unlabelled.set(value)
+
+    def observe(self, value: float):
+        self._unlabelled.observe(value)
+
+    def render(self) -> str:
+        return self._header + "".join(child.render() for child in list(self.children.values()))
+
+class Registry:
+    """Collection of metric families plus collectors run right before each scrape"""
+
+    def __init__(self):
+        self.families: List[MetricFamily] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        self.families.append(family)
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "counter", labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "gauge", labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Optional[Sequence[float]] = None) -> MetricFamily:
+        return self._register(
+            MetricFamily(name, documentation, "histogram", labelnames, buckets or DEFAULT_LATENCY_BUCKETS)
+        )
+
+    def register_collector(self, collector: Callable[[], None]):
+        """Register a callable that updates gauges from other components at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Text exposition of every metric; unchanged series reuse their cached text"""
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector error: {e}")
+        return "".join(family.render() for family in self.families)
+
+# Global registry exposed at /api/metrics
+registry = Registry()
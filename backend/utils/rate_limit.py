@@ -0,0 +1,115 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import time
+import logging
+
+from config import settings, ENDPOINT_RATE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+class GCRALimiter:
+    """
+    Generic Cell Rate Algorithm limiter: a token bucket of `burst` requests
+    refilled at `per_minute`, stored as one float (theoretical arrival time) per key
+    """
+
+    def __init__(self, per_minute: int, burst: int):
+        self.per_minute = per_minute
+        self.burst = max(1, burst)
+        self.emission_interval = 60.0 / per_minute
+        # How far ahead of now the TAT may run before requests are rejected
+        self.tolerance = self.emission_interval * (self.burst - 1)
+        # Keys in least-recently-used order so idle clients can be evicted from the front
+        self.tats: "OrderedDict[str, float]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def _evict_idle(self, now: float, max_evictions: int = 2):
+        """A key whose TAT is in the past has a full bucket and needs no state"""
+        for _ in range(max_evictions):
+            if not self.tats:
+                return
+            key, tat = next(iter(self.tats.items()))
+            if tat > now:
+                return
+            del self.tats[key]
+            self.evicted += 1
+
+    def allow(self, key: str, now: Optional[float] = None) -> Tuple[bool, int, float]:
+        """
+        Check and consume one request for the key.
+        Returns (allowed, remaining requests in the burst, seconds until retry).
+        """
+        now = time.monotonic() if now is None else now
+        tat = max(self.tats.get(key, now), now)
+        new_tat = tat + self.emission_interval
+        allow_at = new_tat - self.emission_interval - self.tolerance
+
+        if now < allow_at:
+            self.rejected += 1
+            self._evict_idle(now)
+            return False, 0, allow_at - now
+
+        self.tats[key] = new_tat
+        self.tats.move_to_end(key)
+        self.allowed += 1
+        self._evict_idle(now)
+
+        remaining = int((self.tolerance - (new_tat - now - self.emission_interval)) / self.emission_interval)
+        return True, max(0, remaining), 0.0
+
+    def stats(self) -> Dict:
+        """Get limiter statistics"""
+        return {
+            "per_minute": self.per_minute,
+            "burst": self.burst,
+            "tracked_clients": len(self.tats),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evicted_idle": self.evicted
+        }
+
+class RateLimiter:
+    """Per-route GCRA limiters using the budgets in config.ENDPOINT_RATE_LIMITS"""
+
+    def __init__(
+        self,
+        endpoint_limits: Dict[str, Dict[str, int]] = ENDPOINT_RATE_LIMITS,
+        default_per_minute: int = settings.rate_limit_per_minute,
+        default_burst: int = settings.burst_limit
+    ):
+        self.default = GCRALimiter(default_per_minute, default_burst)
+        # Longest prefix first so the most specific route budget wins
+        self.routes = sorted(
+            (
+                (prefix, GCRALimiter(limits["per_minute"], limits["burst"]))
+                for prefix, limits in endpoint_limits.items()
+            ),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+
+    def limiter_for(self, path: str) -> Tuple[str, GCRALimiter]:
+        """Budget that applies to a request path"""
+        for prefix, limiter in self.routes:
+            if path.startswith(prefix):
+                return prefix, limiter
+        return "default", self.default
+
+    def check(self, client_id: str, path: str) -> Tuple[bool, GCRALimiter, int, float]:
+        """Check a request; returns (allowed, limiter, remaining, retry_after)"""
+        _, limiter = self.limiter_for(path)
+        allowed, remaining, retry_after = limiter.allow(client_id)
+        return allowed, limiter, remaining, retry_after
+
+    @property
+    def rejected(self) -> int:
+        """Total rejected requests across all budgets"""
+        return self.default.rejected + sum(limiter.rejected for _, limiter in self.routes)
+
+    def stats(self) -> Dict:
+        """Get statistics for every budget"""
+        stats = {prefix: limiter.stats() for prefix, limiter in self.routes}
+        stats["default"] = self.default.stats()
+        return stats
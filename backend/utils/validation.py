@@ -0,0 +1,19 @@
+import re
+
+NON_DIGITS = re.compile(r'\D')
+
+def normalize_documento(documento: str) -> str:
+    """Remove any non-digit characters from a document number"""
+    return NON_DIGITS.sub('', documento)
+
+def validate_documento(documento: str) -> bool:
+    """Validate document number format"""
+    if not documento:
+        return False
+    
+    # Check length of the digits only (between 7 and 10 digits)
+    clean_doc = normalize_documento(documento)
+    if len(clean_doc) < 7 or len(clean_doc) > 10:
+        return False
+    
+    return True